@@ -0,0 +1,52 @@
+import os
+import sys
+import argparse
+import logging
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from bench import BENCHMARKS, run_suite, load_history, record_run, save_history, compare
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Root QQQ/
+    parser = argparse.ArgumentParser(description="Offline benchmark suite on the bundled CSVs")
+    parser.add_argument("--only", action="append", default=None, choices=list(BENCHMARKS),
+                        help="Run only this benchmark (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Flag a regression when median time exceeds baseline by this fraction")
+    parser.add_argument("--set-baseline", action="store_true", help="Make this run the new baseline")
+    parser.add_argument("--history", default=os.path.join(base_dir, "code", "backtest", "output_bench", "bench_history.json"))
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    baseline = history['baseline']
+    results = run_suite(args.only, repeat=args.repeat)
+
+    print("\n" + "=" * 78)
+    print(f"{'Benchmark':<40}{'median s':>12}{'min s':>12}{'vs base':>12}")
+    ratios = {name: (ratio, regressed) for name, _, _, ratio, regressed in compare(results, baseline, args.threshold)}
+    for name, res in results.items():
+        if 'skipped' in res:
+            print(f"{name:<40}{'skipped (' + res['skipped'] + ')':>36}")
+            continue
+        ratio, regressed = ratios.get(name, (None, False))
+        flag = "" if ratio is None else f"{ratio:>11.2f}x" + (" REGRESSION" if regressed else "")
+        print(f"{name:<40}{res['median_s']:>12.4f}{res['min_s']:>12.4f}{flag}")
+    print("=" * 78 + "\n")
+
+    record_run(history, results, set_baseline=args.set_baseline)
+    save_history(history, args.history)
+    logging.info(f"History saved to {args.history}")
+
+    regressions = [name for name, (_, regressed) in ratios.items() if regressed]
+    if regressions:
+        logging.error(f"Regressions vs baseline ({baseline['git_rev']}): {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
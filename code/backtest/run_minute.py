@@ -0,0 +1,61 @@
+import os
+import sys
+import argparse
+import logging
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from engine import run_minute_backtest
+from events import EventRecorder
+from mock_api import BarType, FILL_TIMINGS
+from minute_store import INTRADAY_MINUTES, read_minute_csv, resample_bars, write_minute_store
+from metrics import calculate_metrics
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Root QQQ/
+    parser = argparse.ArgumentParser(description="Intraday (M1/M5) backtest on a memory-mapped minute store")
+    parser.add_argument("--store", default=os.path.join(base_dir, "data", "minute"),
+                        help="Minute store root (<store>/<bar type>/<symbol>/<year>/*.npy)")
+    parser.add_argument("--bar-type", default="M1", choices=[b.name for b in INTRADAY_MINUTES])
+    parser.add_argument("--import-qqq", default=None, help="1-minute QQQ CSV to write into the store first")
+    parser.add_argument("--import-tqqq", default=None, help="1-minute TQQQ CSV to write into the store first")
+    parser.add_argument("--strategy", default=os.path.join(base_dir, "code", "tqqq.py"))
+    parser.add_argument("--fill-timing", default="close", choices=FILL_TIMINGS)
+    parser.add_argument("--events", default=None,
+                        help="Buffer the strategy's prints/errors and write them to this file at the end instead of logging each")
+    parser.add_argument("--max-chunks", type=int, default=2, help="Yearly chunks mapped at once per symbol")
+    parser.add_argument("--output-dir", default=os.path.join(base_dir, "code", "backtest", "output_minute"))
+    args = parser.parse_args()
+    bar_type = BarType[args.bar_type]
+
+    if args.import_qqq or args.import_tqqq:
+        if not (args.import_qqq and args.import_tqqq):
+            logging.error("--import-qqq and --import-tqqq go together.")
+            return
+        frames = {"US.QQQ": read_minute_csv(args.import_qqq), "US.TQQQ": read_minute_csv(args.import_tqqq)}
+        if INTRADAY_MINUTES[bar_type] > 1:
+            frames = {sym: resample_bars(df, INTRADAY_MINUTES[bar_type]) for sym, df in frames.items()}
+        logging.info(f"Writing {bar_type.name} bars to {args.store}...")
+        write_minute_store(args.store, frames, bar_type)
+
+    events = EventRecorder(capacity=65536, level=logging.INFO, dump_path=args.events) if args.events else None
+    df, ctx = run_minute_backtest(args.store, args.strategy, bar_type=bar_type, max_chunks=args.max_chunks,
+                                  return_context=True, fill_timing=args.fill_timing, events=events)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    df.to_csv(os.path.join(args.output_dir, "minute_backtest_result.csv"))
+    ctx.orders_frame().to_csv(os.path.join(args.output_dir, "minute_orders.csv"), index=False)
+
+    print("\n" + "="*50)
+    print(f"{bar_type.name} run: {ctx.n_bars} bars, {len(df)} days, {ctx.n_orders} orders")
+    for name, value in calculate_metrics(df).items():
+        print(f"  {name:<18} {value:.4f}")
+    print("="*50 + "\n")
+    logging.info(f"Done. Results saved to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import argparse
+import logging
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from engine import load_strategy_class
+from monte_carlo import simulate, summarize
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Root QQQ/
+    parser = argparse.ArgumentParser(description="Block-bootstrap Monte Carlo for V22/V23")
+    parser.add_argument("--paths", type=int, default=1000)
+    parser.add_argument("--bars", type=int, default=None, help="Bars per path (default: history length)")
+    parser.add_argument("--block-size", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=250, help="Paths evaluated per 2-D chunk")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output-dir", default=os.path.join(base_dir, "code", "backtest", "output_mc"))
+    args = parser.parse_args()
+
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+
+    # V23 is evaluated through its own target_weights(); V22 through the batched state machine
+    V23 = load_strategy_class(os.path.join(base_dir, "code", "tqqq_opt.py"))
+    v23 = V23()
+    v23.initialize()
+
+    df_paths = simulate(qqq_path, tqqq_path, n_paths=args.paths, n_bars=args.bars,
+                        block_size=args.block_size, chunk_size=args.chunk_size, seed=args.seed,
+                        target_weight_strategies={"V23": v23})
+    df_summary = summarize(df_paths)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    df_paths.to_csv(os.path.join(args.output_dir, "mc_paths.csv"), index=False)
+    df_summary.to_csv(os.path.join(args.output_dir, "mc_summary.csv"))
+    print(df_summary.T.to_string())
+    logging.info(f"Done. Results saved to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 
 import os
 import sys
+import argparse
 import logging
 import pandas as pd
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 
-from engine import run_backtest, run_benchmark
+from engine import run_backtests
+from mock_api import FILL_TIMINGS
+from benchmarks import DEFAULT_BENCHMARKS
+from profiler import ApiProfiler
+from result_cache import ResultCache, cached_backtests
 from metrics import calculate_metrics
 from reporting import generate_report
 
@@ -15,6 +20,19 @@ from reporting import generate_report
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every mock API call; writes api_profile.json next to backtest_metrics.csv")
+    parser.add_argument("--no-cache", action="store_true", help="Always rerun, ignoring the result cache")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Resume from / save engine state to this file, so appended bars are simulated incrementally")
+    parser.add_argument("--fill-timing", default="close", choices=FILL_TIMINGS,
+                        help="When market orders fill: this bar's close, or the next bar's open/close")
+    parser.add_argument("--start", default=None, help="First date to simulate (only the needed warmup is loaded before it)")
+    parser.add_argument("--end", default=None, help="Last date to simulate (inclusive)")
+    args = parser.parse_args()
+    profiler = ApiProfiler() if args.profile else None
+
     # Paths
     base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__))) # Root QQQ/
     qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
@@ -29,29 +47,23 @@ def main():
         logging.error(f"Input files not found: {qqq_path}, {tqqq_path}")
         return
         
-    # 1. Run Strategy Backtest
+    # 1. Run Strategy and Benchmarks (QQQ Buy & Hold first) in one pass over the loaded data
     logging.info("Running Strategy Backtest (V23.0)...")
-    df_strategy = run_backtest(qqq_path, tqqq_path, strategy_path)
+    runs = {"TQQQ Strategy (V23.0)": (strategy_path, {'vectorized': True, 'checkpoint_path': args.checkpoint,
+                                                      'fill_timing': args.fill_timing})}
+    benchmarks = DEFAULT_BENCHMARKS
+    if profiler is None and not args.no_cache:
+        cache = ResultCache(os.path.join(base_dir, "code", "backtest", "cache"))
+        outcomes = cached_backtests(cache, qqq_path, tqqq_path, runs, benchmarks, start=args.start, end=args.end)
+    else:
+        dfs = run_backtests(qqq_path, tqqq_path, runs, benchmarks, profiler=profiler, start=args.start, end=args.end)
+        outcomes = {label: (df, calculate_metrics(df)) for label, df in dfs.items()}
+    df_strategy, metrics_strat = outcomes["TQQQ Strategy (V23.0)"]
+    df_benchmark, metrics_bench = outcomes["QQQ Benchmark"]
     df_strategy.to_csv(os.path.join(output_dir, "tqqq_backtest_result.csv"))
-    
-    # 2. Run Benchmark Backtest (Buy & Hold QQQ)
-    logging.info("Running Benchmark Backtest (QQQ)...")
-    df_qqq = pd.read_csv(qqq_path)
-    df_qqq.columns = [c.lower() for c in df_qqq.columns]
-    df_qqq['date'] = pd.to_datetime(df_qqq['date'])
-    df_qqq.set_index('date', inplace=True)
-    
-    # Align with strategy dates
-    common_dates = df_strategy.index.intersection(df_qqq.index)
-    df_qqq = df_qqq.loc[common_dates].sort_index()
-    
-    df_benchmark = run_benchmark(df_qqq, initial_capital=100000.0)
     df_benchmark.to_csv(os.path.join(output_dir, "qqq_backtest_result.csv"))
-    
-    # 3. Metrics
-    logging.info("Calculating Metrics...")
-    metrics_strat = calculate_metrics(df_strategy)
-    metrics_bench = calculate_metrics(df_benchmark)
+    pd.DataFrame({label: outcomes[label][0]['total_value'] for label in benchmarks}).to_csv(
+        os.path.join(output_dir, "benchmarks_result.csv"))
     
     results = {
         "TQQQ Strategy (V23.0)": {
@@ -63,12 +75,19 @@ def main():
             "metrics": metrics_bench
         }
     }
+    for label in benchmarks:
+        if label not in results:
+            df, metrics = outcomes[label]
+            results[label] = {"df": df, "metrics": metrics}
     
-    # 4. Generate Report
+    # 2. Generate Report
     logging.info("Generating Report...")
     generate_report(results, output_dir)
+    if profiler is not None:
+        profiler.report()
+        profiler.to_json(os.path.join(output_dir, "api_profile.json"))
     
-    # 5. Summary Text
+    # 3. Summary Text
     logging.info("Generating Summary...")
     strat_ret = metrics_strat['Total Return']
     bench_ret = metrics_bench['Total Return']
@@ -0,0 +1,61 @@
+import os
+import sys
+import argparse
+import logging
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from start_dates import start_date_sensitivity, summarize_starts, summarize_by_year
+from run_sweep import parse_value
+from result_cache import ResultCache
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Root QQQ/
+    parser = argparse.ArgumentParser(description="Run one strategy from every start date and report the spread")
+    parser.add_argument("--strategy", default=os.path.join(base_dir, "code", "tqqq.py"))
+    parser.add_argument("--every", default="M", help="M, Q or Y (first bar of each period) or a bar count N")
+    parser.add_argument("--first", default=None, help="Earliest start date (default: first bar)")
+    parser.add_argument("--min-years", type=float, default=3, help="History each start must still have")
+    parser.add_argument("--param", action="append", default=[], help="name=value override (repeatable)")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--vectorized", action="store_true", help="Use the target-weight fast path when available")
+    parser.add_argument("--kernel", action="store_true",
+                        help="V22 only: run every start in-process through the compiled state-machine kernel")
+    parser.add_argument("--no-cache", action="store_true", help="Rerun every start, ignoring the result cache")
+    parser.add_argument("--output-dir", default=os.path.join(base_dir, "code", "backtest", "output_starts"))
+    args = parser.parse_args()
+
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    every = int(args.every) if args.every.isdigit() else args.every
+    params = {}
+    for item in args.param:
+        name, _, value = item.partition("=")
+        params[name.strip()] = parse_value(value.strip())
+    cache = None if args.no_cache else ResultCache(os.path.join(base_dir, "code", "backtest", "cache"))
+
+    df_starts = start_date_sensitivity(qqq_path, tqqq_path, args.strategy, every=every, first=args.first,
+                                       min_years=args.min_years, params=params, processes=args.processes,
+                                       vectorized=args.vectorized, cache=cache, kernel=args.kernel)
+    summary = summarize_starts(df_starts)
+    by_year = summarize_by_year(df_starts)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    df_starts.to_csv(os.path.join(args.output_dir, "start_dates.csv"), index=False)
+    summary.to_csv(os.path.join(args.output_dir, "start_dates_summary.csv"))
+    by_year.to_csv(os.path.join(args.output_dir, "start_dates_by_year.csv"))
+
+    print("\n" + "="*78)
+    print(f"{len(df_starts)} start dates, {df_starts['start'].iloc[0]} to {df_starts['start'].iloc[-1]}")
+    print(summary.to_string(float_format=lambda v: f"{v:.4f}"))
+    print("\nMedian by start year:")
+    print(by_year.to_string(float_format=lambda v: f"{v:.4f}"))
+    print("="*78 + "\n")
+    logging.info(f"Done. Results saved to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import argparse
+import logging
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from sweep import run_sweep
+from result_cache import ResultCache
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+def parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+def parse_grid(items):
+    # ["vol_factor=1.5,2.0", "high_zone=0.9,0.95"] -> {"vol_factor": [1.5, 2.0], ...}
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        grid[name.strip()] = [parse_value(v.strip()) for v in values.split(",") if v.strip()]
+    return grid
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Root QQQ/
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over the mock backtest engine")
+    parser.add_argument("--strategy", default=os.path.join(base_dir, "code", "tqqq.py"))
+    parser.add_argument("--grid", action="append", default=[],
+                        help="name=v1,v2,... (repeatable), e.g. --grid vol_factor=1.5,2.0,2.5")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--vectorized", action="store_true", help="Use the target-weight fast path when available")
+    parser.add_argument("--no-cache", action="store_true", help="Rerun every combination, ignoring the result cache")
+    parser.add_argument("--output", default=os.path.join(base_dir, "code", "backtest", "output_sweep", "sweep_metrics.csv"))
+    args = parser.parse_args()
+
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    if not os.path.exists(qqq_path) or not os.path.exists(tqqq_path):
+        logging.error(f"Input files not found: {qqq_path}, {tqqq_path}")
+        return
+
+    grid = parse_grid(args.grid)
+    if not grid:
+        logging.error("No --grid given, nothing to sweep.")
+        return
+
+    cache = None if args.no_cache else ResultCache(os.path.join(base_dir, "code", "backtest", "cache"))
+
+    df_metrics = run_sweep(qqq_path, tqqq_path, args.strategy, grid,
+                           processes=args.processes, vectorized=args.vectorized, cache=cache)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    df_metrics.to_csv(args.output, index=False)
+    print(df_metrics.to_string(index=False))
+    logging.info(f"Done. Metrics saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import argparse
+import logging
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from walk_forward import walk_forward
+from metrics import calculate_metrics
+from run_sweep import parse_grid
+from result_cache import ResultCache
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Root QQQ/
+    parser = argparse.ArgumentParser(description="Walk-forward optimization with rolling IS/OOS windows")
+    parser.add_argument("--strategy", default=os.path.join(base_dir, "code", "tqqq.py"))
+    parser.add_argument("--grid", action="append", default=[],
+                        help="name=v1,v2,... (repeatable), e.g. --grid vol_factor=1.5,2.0,2.5")
+    parser.add_argument("--is-years", type=int, default=5)
+    parser.add_argument("--oos-years", type=int, default=1)
+    parser.add_argument("--objective", default="Sharpe Ratio", help="Metric column maximized in-sample")
+    parser.add_argument("--start", default=None, help="First in-sample start date (default: first bar)")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--vectorized", action="store_true", help="Use the target-weight fast path when available")
+    parser.add_argument("--no-cache", action="store_true", help="Rerun every combination, ignoring the result cache")
+    parser.add_argument("--output-dir", default=os.path.join(base_dir, "code", "backtest", "output_wf"))
+    args = parser.parse_args()
+
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    grid = parse_grid(args.grid)
+    if not grid:
+        logging.error("No --grid given, nothing to optimize.")
+        return
+
+    cache = None if args.no_cache else ResultCache(os.path.join(base_dir, "code", "backtest", "cache"))
+
+    df_folds, df_equity = walk_forward(qqq_path, tqqq_path, args.strategy, grid,
+                                       is_years=args.is_years, oos_years=args.oos_years,
+                                       objective=args.objective, first_start=args.start,
+                                       processes=args.processes, vectorized=args.vectorized, cache=cache)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    df_folds.to_csv(os.path.join(args.output_dir, "walk_forward_folds.csv"), index=False)
+    df_equity.to_csv(os.path.join(args.output_dir, "walk_forward_equity.csv"))
+
+    metrics = calculate_metrics(df_equity)
+    print(df_folds.to_string(index=False))
+    print("\n" + "="*50)
+    print("Stitched out-of-sample:")
+    for name, value in metrics.items():
+        print(f"  {name:<18} {value:.4f}")
+    print("="*50 + "\n")
+    logging.info(f"Done. Results saved to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
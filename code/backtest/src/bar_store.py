@@ -0,0 +1,50 @@
+import numpy as np
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class BarStore:
+    """
+    One symbol's bars as contiguous float64 NumPy columns.
+    Lookups are plain integer indexing by bar cursor, no pandas in the hot path.
+    """
+
+    def __init__(self, df, fields=BAR_FIELDS):
+        self.index = df.index
+        self.length = len(df)
+        self.columns = {}
+        for name in fields:
+            if name in df.columns:
+                self.columns[name] = np.ascontiguousarray(df[name].to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return self.length
+
+    def column(self, field):
+        return self.columns.get(field)
+
+    def value(self, field, cursor, select=1):
+        """
+        Value of `field` at bar `cursor - (select - 1)`; None if out of range or NaN.
+        select=1 is the cursor bar itself, select=2 the bar before it, ...
+        """
+        col = self.columns.get(field)
+        if col is None or cursor is None:
+            return None
+        target = cursor - (select - 1)
+        if target < 0 or target >= self.length:
+            return None
+        val = col[target]
+        if val != val:  # NaN
+            return None
+        return float(val)
+
+    def window(self, field, cursor, length):
+        """Up to `length` values ending at `cursor` (inclusive), as an array view."""
+        col = self.columns.get(field)
+        if col is None or cursor is None or cursor < 0:
+            return None
+        start = cursor - length + 1
+        if start < 0:
+            start = 0
+        return col[start:cursor + 1]
@@ -0,0 +1,212 @@
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # Root QQQ/
+QQQ_PATH = os.path.join(BASE_DIR, "input", "QQQ.csv")
+TQQQ_PATH = os.path.join(BASE_DIR, "input", "TQQQ.csv")
+
+# name -> setup(tmp_dir) returning the zero-argument callable to time
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@benchmark("load_and_clean_data")
+def _bench_load(tmp_dir):
+    from data_loader import load_and_clean_data
+    return lambda: load_and_clean_data(QQQ_PATH, TQQQ_PATH)
+
+
+@benchmark("run_backtest[tqqq.py]")
+def _bench_v22(tmp_dir):
+    from engine import run_backtest
+    path = os.path.join(BASE_DIR, "code", "tqqq.py")
+    return lambda: run_backtest(QQQ_PATH, TQQQ_PATH, path)
+
+
+@benchmark("run_backtest[tqqq.py,next_close]")
+def _bench_v22_booked(tmp_dir):
+    # Pending orders every few bars, polled through request_orderid/order_status each bar
+    from engine import run_backtest
+    path = os.path.join(BASE_DIR, "code", "tqqq.py")
+    return lambda: run_backtest(QQQ_PATH, TQQQ_PATH, path, fill_timing='next_close')
+
+
+@benchmark("run_backtest[tqqq_opt.py]")
+def _bench_v23(tmp_dir):
+    from engine import run_backtest
+    path = os.path.join(BASE_DIR, "code", "tqqq_opt.py")
+    return lambda: run_backtest(QQQ_PATH, TQQQ_PATH, path)
+
+
+@benchmark("run_backtest[tqqq_opt.py,vectorized]")
+def _bench_v23_vec(tmp_dir):
+    from engine import run_backtest
+    path = os.path.join(BASE_DIR, "code", "tqqq_opt.py")
+    return lambda: run_backtest(QQQ_PATH, TQQQ_PATH, path, vectorized=True)
+
+
+@benchmark("mock_api.indicators")
+def _bench_indicators(tmp_dir):
+    # Cold full-history ma/rsi/vol series plus the per-bar lookups a strategy makes
+    from data_loader import load_and_clean_data
+    from mock_api import MockContext, Contract, use_context, ma, rsi, vol
+    df_qqq, df_tqqq = load_and_clean_data(QQQ_PATH, TQQQ_PATH)
+    qqq, tqqq = Contract("US.QQQ"), Contract("US.TQQQ")
+
+    def run():
+        ctx = MockContext(df_qqq, df_tqqq)
+        with use_context(ctx):
+            for i in range(len(ctx.dates)):
+                ctx.advance(i)
+                ma(qqq, 200, None, None, 1, None)
+                ma(tqqq, 20, None, None, 1, None)
+                rsi(qqq, 14, None, None, 1, None)
+                vol(qqq, 20)
+    return run
+
+
+@benchmark("BlackScholes")
+def _bench_black_scholes(tmp_dir):
+    leaps = _load_module("backtest_leaps", os.path.join(BASE_DIR, "code", "backtest_leaps.py"))
+    bs = leaps.BlackScholes
+
+    def run():
+        for k in range(200):
+            S = 300.0 + k
+            bs.call_price(S, 300.0, 1.8, 0.0285, 0.22)
+            bs.call_delta(S, 300.0, 1.8, 0.0285, 0.22)
+            bs.find_strike_for_delta(S, 1.8, 0.0285, 0.22, 0.80)
+    return run
+
+
+@benchmark("backtest_leaps.run_backtest")
+def _bench_leaps(tmp_dir):
+    leaps = _load_module("backtest_leaps", os.path.join(BASE_DIR, "code", "backtest_leaps.py"))
+    # Keep report files out of the tree
+    for name in ("OUTPUT_TRADES_CSV", "OUTPUT_DAILY_CSV", "OUTPUT_TRADES_HTML", "OUTPUT_REPORT_HTML"):
+        setattr(leaps, name, os.path.join(tmp_dir, os.path.basename(getattr(leaps, name))))
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            leaps.run_backtest(verbose=False)
+    return run
+
+
+@benchmark("scripts/backtest_tqqq.backtest")
+def _bench_tranche_script(tmp_dir):
+    script = _load_module("backtest_tqqq", os.path.join(BASE_DIR, "scripts", "backtest_tqqq.py"))
+    script.OUTPUT_DIR = tmp_dir
+    script.PLOTS_DIR = os.path.join(tmp_dir, "plots")
+    return lambda: script.backtest()
+
+
+@benchmark("data/refresh_data.process")
+def _bench_refresh(tmp_dir):
+    refresh = _load_module("refresh_data", os.path.join(BASE_DIR, "data", "refresh_data.py"))
+    src = os.path.join(BASE_DIR, "data", "QQQ.csv")
+    dst = os.path.join(tmp_dir, "QQQ_refreshed.csv")
+    return lambda: refresh.process(src, dst)
+
+
+def run_suite(names=None, repeat=5, warmup=1):
+    """
+    Time each benchmark `repeat` times after `warmup` untimed calls.
+    Returns {name: {'median_s', 'min_s', 'runs'}}; benchmarks whose optional
+    dependencies are missing get {'skipped': reason}.
+    """
+    results = {}
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in names or list(BENCHMARKS):
+                try:
+                    fn = BENCHMARKS[name](tmp_dir)
+                except ImportError as e:
+                    results[name] = {'skipped': f"missing dependency: {e.name or e}"}
+                    continue
+                for _ in range(warmup):
+                    fn()
+                times = []
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    fn()
+                    times.append(time.perf_counter() - t0)
+                results[name] = {'median_s': statistics.median(times), 'min_s': min(times), 'runs': repeat}
+    finally:
+        logging.getLogger().setLevel(level)
+    return results
+
+
+def _git_rev():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {'baseline': None, 'runs': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def record_run(history, results, set_baseline=False):
+    """Append a run to `history`; the first run (or set_baseline=True) becomes the baseline."""
+    entry = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'git_rev': _git_rev(),
+        'python': platform.python_version(),
+        'results': results,
+    }
+    history['runs'].append(entry)
+    if set_baseline or history['baseline'] is None:
+        history['baseline'] = entry
+    return entry
+
+
+def save_history(history, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def compare(results, baseline, threshold=0.15):
+    """
+    Rows of (name, baseline median, current median, ratio, regressed) for every
+    benchmark timed in both runs. A regression is median > baseline * (1 + threshold).
+    """
+    rows = []
+    base = baseline['results'] if baseline else {}
+    for name, res in results.items():
+        old = base.get(name, {})
+        if 'median_s' not in res or 'median_s' not in old:
+            continue
+        ratio = res['median_s'] / old['median_s'] if old['median_s'] > 0 else float('nan')
+        rows.append((name, old['median_s'], res['median_s'], ratio, ratio > 1 + threshold))
+    return rows
@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+
+from indicators import rolling_ma
+from mock_api import affordable_qty
+
+# name -> symbol (whole-share buy & hold) or spec dict:
+#   {'kind': 'buy_hold', 'symbol': ...}
+#   {'kind': 'mix', 'weights': {symbol: weight}, 'rebalance': 'M' | 'Q' | 'Y' | every N bars}
+#   {'kind': 'ma_timing', 'symbol': traded, 'signal': symbol whose close/MA decides, 'window': N}
+DEFAULT_BENCHMARKS = {
+    "QQQ Benchmark": "US.QQQ",
+    "TQQQ Buy & Hold": "US.TQQQ",
+    "QQQ/TQQQ 50/50 (Monthly)": {'kind': 'mix', 'weights': {"US.QQQ": 0.5, "US.TQQQ": 0.5}, 'rebalance': 'M'},
+    "QQQ/TQQQ 80/20 (Quarterly)": {'kind': 'mix', 'weights': {"US.QQQ": 0.8, "US.TQQQ": 0.2}, 'rebalance': 'Q'},
+    "QQQ 200MA Timing": {'kind': 'ma_timing', 'symbol': "US.QQQ", 'signal': "US.QQQ", 'window': 200},
+    "TQQQ 200MA Timing": {'kind': 'ma_timing', 'symbol': "US.TQQQ", 'signal': "US.QQQ", 'window': 200},
+}
+
+
+def buy_and_hold(close, initial_capital=100000.0, commission_rate=0.0005, slippage=0.0005):
+    """Whole shares bought at the first close (MockContext fill model), remainder kept as cash."""
+    return _holding_curve(close[:, None], [0], lambda cash, qty, i: _trade_to(
+        cash, qty, close[i:i + 1], [np.inf], commission_rate, slippage), initial_capital)
+
+
+def fixed_mix(closes, weights, rebalance, initial_capital=100000.0, commission_rate=0.0005, slippage=0.0005):
+    """
+    Constant-weight portfolio of closes (bars x symbols), traded back to
+    `weights` at the close of every bar where `rebalance` is True (bar 0
+    always is) as rebalance_to_weights does: int(NAV * weight / close)
+    shares per leg, sells first, buys capped by cash, MockContext slippage
+    and commission. Holdings only change on rebalance bars, so those are
+    the only ones visited in Python.
+    """
+    rebalance = np.asarray(rebalance, dtype=bool).copy()
+    rebalance[0] = True
+
+    def trade(cash, qty, i):
+        nav = cash + float(qty @ closes[i])
+        return _trade_to(cash, qty, closes[i], [int(nav * w / p) if p > 0 else None
+                                                for w, p in zip(weights, closes[i])], commission_rate, slippage)
+
+    return _holding_curve(closes, np.flatnonzero(rebalance), trade, initial_capital)
+
+
+def ma_timing(close, signal_close, window=200, initial_capital=100000.0, start=0, commission_rate=0.0005,
+              slippage=0.0005):
+    """
+    Hold `close` for the next bar whenever signal_close ended a bar above its
+    `window`-bar MA, else cash (no yield): all-in with whole shares at the
+    close the signal turns on, all out at the close it turns off, MockContext
+    slippage and commission on each trade.
+    The curve starts at bar `start`; bars before it only warm up the MA.
+    """
+    ma = rolling_ma(signal_close, window)
+    invested = (signal_close > ma)[start:]  # NaN MA during warmup compares False
+    close = close[start:]
+    switches = np.flatnonzero(invested != np.concatenate(([False], invested[:-1])))
+
+    def trade(cash, qty, i):
+        return _trade_to(cash, qty, close[i:i + 1], [np.inf if invested[i] else 0], commission_rate, slippage)
+
+    return _holding_curve(close[:, None], switches, trade, initial_capital)
+
+
+def _trade_to(cash, qty, prices, targets, commission_rate, slippage):
+    """
+    Move whole-share holdings `qty` toward `targets` (None: leave the leg,
+    inf: as many as the cash buys) at
+    `prices` like MockContext._rebalance with close fills: sells first, then
+    buys in leg order, each capped by affordable_qty of the cash left.
+    Returns the new (cash, qty).
+    """
+    qty = qty.copy()
+    for j, (target, price) in enumerate(zip(targets, prices)):
+        if target is not None and price > 0 and target < qty[j]:
+            value = price * (1 - slippage) * (qty[j] - target)
+            cash += value - max(1.0, value * commission_rate)
+            qty[j] = target
+    for j, (target, price) in enumerate(zip(targets, prices)):
+        if target is not None and price > 0 and target > qty[j]:
+            buy = min(target - qty[j], affordable_qty(float(cash), float(price), slippage, commission_rate))
+            if buy > 0:
+                value = price * (1 + slippage) * buy
+                cash -= value + max(1.0, value * commission_rate)
+                qty[j] += buy
+    return cash, qty
+
+
+def _holding_curve(closes, trade_bars, trade, initial_capital):
+    """
+    Equity curve (cash + holdings at each close) of a portfolio that only
+    trades on trade_bars (ascending), where trade(cash, qty, i) returns the
+    holdings after trading at bar i's close. Cash only before the first one.
+    """
+    n_bars, n_symbols = closes.shape
+    cash = np.empty(len(trade_bars) + 1)
+    held = np.zeros((len(trade_bars) + 1, n_symbols))
+    cash[0] = initial_capital
+    for k, i in enumerate(trade_bars):
+        cash[k + 1], held[k + 1] = trade(cash[k], held[k], i)
+    mask = np.zeros(n_bars, dtype=np.int64)
+    mask[trade_bars] = 1
+    segment = np.cumsum(mask)
+    return cash[segment] + (closes * held[segment]).sum(axis=1)
+
+
+def rebalance_mask(dates, rebalance):
+    """True on the first bar of each calendar period ('M', 'Q', 'Y') or every N bars."""
+    if isinstance(rebalance, (int, np.integer)):
+        return np.arange(len(dates)) % rebalance == 0
+    periods = pd.DatetimeIndex(dates).to_period(rebalance).asi8
+    mask = np.ones(len(dates), dtype=bool)
+    mask[1:] = periods[1:] != periods[:-1]
+    return mask
+
+
+def build_benchmarks(frames, specs=None, initial_capital=100000.0, start=0, commission_rate=0.0005, slippage=0.0005):
+    """
+    Equity curves for every benchmark in `specs` (default DEFAULT_BENCHMARKS)
+    from aligned {symbol: frame} data, each close column read once.
+    Curves start at bar `start`, with the bars before it as indicator warmup.
+    Every benchmark trades whole shares at the close and pays the strategies'
+    slippage and commission, so its row compares like for like with theirs.
+    Returns {name: DataFrame with total_value}, in the order of specs.
+    """
+    specs = DEFAULT_BENCHMARKS if specs is None else specs
+    dates = next(iter(frames.values())).index[start:]
+    closes = {}
+
+    def close_of(symbol):
+        if symbol not in closes:
+            closes[symbol] = np.array(frames[symbol]['close'], dtype=float)
+        return closes[symbol]
+
+    curves = {}
+    for name, spec in specs.items():
+        if isinstance(spec, str):
+            spec = {'kind': 'buy_hold', 'symbol': spec}
+        kind = spec['kind']
+        if kind == 'buy_hold':
+            values = buy_and_hold(close_of(spec['symbol'])[start:], initial_capital, commission_rate, slippage)
+        elif kind == 'mix':
+            symbols = list(spec['weights'])
+            matrix = np.column_stack([close_of(s)[start:] for s in symbols])
+            weights = np.array([spec['weights'][s] for s in symbols], dtype=float)
+            values = fixed_mix(matrix, weights, rebalance_mask(dates, spec.get('rebalance', 'M')), initial_capital,
+                               commission_rate, slippage)
+        elif kind == 'ma_timing':
+            values = ma_timing(close_of(spec['symbol']), close_of(spec.get('signal', spec['symbol'])),
+                               spec.get('window', 200), initial_capital, start, commission_rate, slippage)
+        else:
+            raise ValueError(f"Unknown benchmark kind {kind!r} for {name}")
+        curves[name] = pd.DataFrame({'total_value': values}, index=dates)
+    return curves
+
+
+def check_benchmarks(qqq_path, tqqq_path):
+    """
+    Trade every DEFAULT_BENCHMARKS spec bar by bar on a MockContext (close
+    fills, _rebalance sizing) and assert the same equity curve as
+    build_benchmarks.
+    """
+    from data_loader import load_and_clean_data
+    from mock_api import MockContext
+
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    frames = {"US.QQQ": df_qqq, "US.TQQQ": df_tqqq}
+    curves = build_benchmarks(frames)
+    for name, spec in DEFAULT_BENCHMARKS.items():
+        if isinstance(spec, str):
+            spec = {'kind': 'buy_hold', 'symbol': spec}
+        if spec['kind'] == 'buy_hold':
+            trades = np.zeros(len(df_qqq), dtype=bool)
+            trades[0] = True
+            weights = np.ones(len(df_qqq))[:, None]
+            symbols = [spec['symbol']]
+        elif spec['kind'] == 'mix':
+            trades = rebalance_mask(df_qqq.index, spec['rebalance'])
+            symbols = list(spec['weights'])
+            weights = np.tile([spec['weights'][s] for s in symbols], (len(df_qqq), 1))
+        else:
+            signal = np.array(frames[spec['signal']]['close'], dtype=float)
+            invested = signal > rolling_ma(signal, spec['window'])
+            trades = invested != np.concatenate(([False], invested[:-1]))
+            weights = invested.astype(float)[:, None]
+            symbols = [spec['symbol']]
+        ctx = MockContext(df_qqq, df_tqqq)
+        values = np.empty(len(df_qqq))
+        for i in range(len(df_qqq)):
+            ctx.advance(i)
+            if trades[i]:
+                ctx._rebalance(dict(zip(symbols, weights[i])), 0.0)
+            values[i] = ctx.nav(i)
+        np.testing.assert_allclose(curves[name]['total_value'].to_numpy(), values, rtol=1e-12, err_msg=name)
+
+
+if __name__ == "__main__":
+    import os
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    check_benchmarks(os.path.join(base_dir, "input", "QQQ.csv"), os.path.join(base_dir, "input", "TQQQ.csv"))
+    print(f"Benchmarks OK: {len(DEFAULT_BENCHMARKS)} curves match bar-by-bar MockContext trading")
@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+CHECKPOINT_VERSION = 3
+
+
+def data_fingerprint(ctx, n_bars):
+    """Hash of the first n_bars dates and OHLCV of every store; appended bars don't change it."""
+    h = hashlib.sha256()
+    h.update(ctx.dates[:n_bars].values.astype('datetime64[ns]').view(np.int64).tobytes())
+    for sym_str, bars in zip(ctx.symbols, ctx.registry.bars):
+        h.update(sym_str.encode())
+        for name in sorted(bars.columns):
+            h.update(name.encode())
+            h.update(bars.columns[name][:n_bars].tobytes())
+    return h.hexdigest()
+
+
+def strategy_state(strategy):
+    # Plain instance attributes only; methods swapped in by apply_params/profilers are rebuilt per run
+    return {k: v for k, v in vars(strategy).items() if not callable(v)}
+
+
+def save_checkpoint(path, ctx, strategy, run_signature):
+    """
+    Pickle the account (cash, positions, history rows, order ledger, order
+    book, signals) and the strategy's attributes as of the last processed bar
+    ctx.cursor.
+    """
+    n_bars = ctx.cursor + 1
+    state = {
+        'version': CHECKPOINT_VERSION,
+        'run_signature': run_signature,
+        'n_bars': n_bars,
+        'last_date': ctx.dates[ctx.cursor],
+        'fingerprint': data_fingerprint(ctx, n_bars),
+        'cash': ctx.cash,
+        'qty': ctx.qty.copy(),
+        'history_start': ctx.history_start,
+        'history': ctx.history[ctx.history_start:n_bars].copy(),
+        'ledger': ctx.ledger[:ctx.n_orders].copy(),
+        'next_order_id': ctx.next_order_id,
+        'pending': list(ctx.booked_orders.values()),
+        'order_states': dict(ctx.order_states),
+        'limit_orders': dict(ctx.limit_orders),
+        'limit_heaps': [(list(buys), list(sells)) for buys, sells in ctx.limit_heaps],
+        'limit_expiry': {bar: list(ids) for bar, ids in ctx.limit_expiry.items()},
+        'stale_limits': ctx.stale_limits,
+        'signals_history': list(ctx.signals_history),
+        'last_signal': ctx.last_signal,
+        'strategy': strategy_state(strategy),
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, ctx, run_signature):
+    """
+    Checkpoint state if it can resume on ctx's data, else None (with a warning).
+    It must come from the same strategy/params/mode, cover fewer bars than
+    ctx has, and its bars must be an unchanged prefix of ctx's data.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get('version') != CHECKPOINT_VERSION or state['run_signature'] != run_signature:
+        logging.warning(f"Checkpoint {path} was made by a different strategy/params; running from scratch.")
+        return None
+    n_bars = state['n_bars']
+    if n_bars > len(ctx.dates) or data_fingerprint(ctx, n_bars) != state['fingerprint']:
+        logging.warning(f"Checkpoint {path} does not match the first {n_bars} bars of the data; running from scratch.")
+        return None
+    return state
+
+
+def restore_checkpoint(state, ctx, strategy):
+    """Load checkpoint state into a fresh ctx/strategy; returns the first bar left to simulate."""
+    n_bars = state['n_bars']
+    ctx.cash = state['cash']
+    ctx.qty[:] = state['qty']
+    ctx.history_start = state['history_start']
+    ctx.history[ctx.history_start:n_bars] = state['history']
+    ctx.history_end = n_bars
+    ledger = state['ledger']
+    while len(ctx.ledger) < len(ledger):
+        ctx.ledger = np.concatenate([ctx.ledger, np.zeros(len(ctx.ledger), dtype=ctx.ledger.dtype)])
+    ctx.ledger[:len(ledger)] = ledger
+    ctx.n_orders = len(ledger)
+    ctx.next_order_id = state['next_order_id']
+    ctx.order_states = dict(state['order_states'])
+    ctx.pending = list(state['pending'])
+    for entry in ctx.pending:
+        oid, sid, qty, side = entry[:4]
+        ctx.booked_orders[oid] = entry
+        ctx.open_orders[sid][oid] = entry
+        if side.name == 'SELL':
+            ctx.pending_sell_qty[sid] += qty
+    ctx.limit_orders = dict(state['limit_orders'])
+    ctx.limit_heaps = [(list(buys), list(sells)) for buys, sells in state['limit_heaps']]
+    ctx.limit_expiry = {bar: list(ids) for bar, ids in state['limit_expiry'].items()}
+    ctx.stale_limits = state['stale_limits']
+    for oid, (sid, qty, side, _) in ctx.limit_orders.items():
+        ctx.open_orders[sid][oid] = (oid, sid, qty, side)
+        if side.name == 'SELL':
+            ctx.pending_sell_qty[sid] += qty
+    ctx.signals_history = list(state['signals_history'])
+    ctx.last_signal = state['last_signal']
+    ctx.advance(n_bars - 1)
+    for name, value in state['strategy'].items():
+        setattr(strategy, name, value)
+    return n_bars
+
+
+def check_resume(qqq_path, tqqq_path, strategy_path, split_date, vectorized=False, fill_timing='close'):
+    """
+    Run up to (excluding) split_date with a checkpoint, resume on the full data,
+    and assert the curve, orders and signals equal a from-scratch run.
+    """
+    import pandas as pd
+    from data_loader import load_and_clean_data
+    from engine import load_strategy_class, run_strategy
+
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    StrategyClass = load_strategy_class(strategy_path)
+    split = int(df_qqq.index.searchsorted(pd.Timestamp(split_date)))
+
+    df_full, ref_ctx = run_strategy(df_qqq, df_tqqq, StrategyClass, vectorized=vectorized, return_context=True,
+                                    fill_timing=fill_timing)
+    ref_orders = ref_ctx.orders_frame()
+    ref_signals = list(ref_ctx.signals_history)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "state.pkl")
+        run_strategy(df_qqq.iloc[:split], df_tqqq.iloc[:split], StrategyClass,
+                     vectorized=vectorized, checkpoint_path=path, fill_timing=fill_timing)
+        df_resumed, ctx = run_strategy(df_qqq, df_tqqq, StrategyClass, vectorized=vectorized,
+                                       checkpoint_path=path, return_context=True, fill_timing=fill_timing)
+    assert ctx.resumed_from == split, "run did not resume from the checkpoint"
+
+    pd.testing.assert_frame_equal(df_full, df_resumed, check_exact=True)
+    pd.testing.assert_frame_equal(ref_orders, ctx.orders_frame(), check_exact=True)
+    assert ref_signals == list(ctx.signals_history), "signal history differs"
+    assert ref_ctx.order_states == ctx.order_states, "order statuses differ"
+    return True
+
+
+if __name__ == "__main__":
+    import engine  # configures logging; quieten the exec'd strategy's per-bar prints
+    logging.getLogger().setLevel(logging.WARNING)
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    for name, vectorized, fill_timing in (("tqqq.py", False, 'close'), ("tqqq_opt.py", False, 'close'),
+                                          ("tqqq_opt.py", True, 'close'), ("tqqq.py", False, 'next_open')):
+        check_resume(qqq_path, tqqq_path, os.path.join(base_dir, "code", name), "2025-06-02", vectorized, fill_timing)
+        print(f"Checkpoint resume OK: {name}{' (vectorized)' if vectorized else ''}"
+              f"{'' if fill_timing == 'close' else f' (fills at {fill_timing})'}")
@@ -1,31 +1,30 @@
-
 import pandas as pd
 import numpy as np
 
-def load_and_clean_data(qqq_path, tqqq_path):
+def _read_bars(path):
+    df = pd.read_csv(path)
+    df.columns = [c.lower() for c in df.columns]
+    df['date'] = pd.to_datetime(df['date'])
+    df.set_index('date', inplace=True)
+    return df
+
+def load_symbols(paths):
     """
-    Load QQQ and TQQQ data, align timestamps, and clean up.
+    Load {symbol: csv path} (e.g. {"US.QQQ": ..., "US.TQQQ": ..., "US.SQQQ": ...}),
+    align every frame on the dates common to all of them, and clean up.
+    Returns {symbol: DataFrame} in the order given.
     """
-    # Load QQQ
-    df_qqq = pd.read_csv(qqq_path)
-    df_qqq.columns = [c.lower() for c in df_qqq.columns]
-    df_qqq['date'] = pd.to_datetime(df_qqq['date'])
-    df_qqq.set_index('date', inplace=True)
-    
-    # Load TQQQ
-    df_tqqq = pd.read_csv(tqqq_path)
-    df_tqqq.columns = [c.lower() for c in df_tqqq.columns]
-    df_tqqq['date'] = pd.to_datetime(df_tqqq['date'])
-    df_tqqq.set_index('date', inplace=True)
+    frames = {sym: _read_bars(path) for sym, path in paths.items()}
     
     # Align dates (intersection)
-    common_dates = df_qqq.index.intersection(df_tqqq.index)
-    df_qqq = df_qqq.loc[common_dates].sort_index()
-    df_tqqq = df_tqqq.loc[common_dates].sort_index()
+    common_dates = None
+    for df in frames.values():
+        common_dates = df.index if common_dates is None else common_dates.intersection(df.index)
+    frames = {sym: df.loc[common_dates].sort_index() for sym, df in frames.items()}
     
     # Fill missing columns for backtest (High, Low, Volume)
     # Using Open/Close approximations if missing
-    for df in [df_qqq, df_tqqq]:
+    for df in frames.values():
         if 'high' not in df.columns:
             df['high'] = df[['open', 'close']].max(axis=1)
         if 'low' not in df.columns:
@@ -33,4 +32,11 @@ def load_and_clean_data(qqq_path, tqqq_path):
         if 'volume' not in df.columns:
             df['volume'] = 0.0  # Default to 0, will disable volume-based signals
             
-    return df_qqq, df_tqqq
+    return frames
+
+def load_and_clean_data(qqq_path, tqqq_path):
+    """
+    Load QQQ and TQQQ data, align timestamps, and clean up.
+    """
+    frames = load_symbols({"US.QQQ": qqq_path, "US.TQQQ": tqqq_path})
+    return frames["US.QQQ"], frames["US.TQQQ"]
@@ -139,6 +139,24 @@ def compare_versions(v22_dir, v23_dir):
     
     # Merge
     df = df_v23[['V23']].join(df_v22[['V22']], how='inner').join(df_qqq[['QQQ']], how='inner')
+    print_comparison(df)
+
+def compare_strategies(qqq_path, tqqq_path, v22_path, v23_path):
+    """
+    compare_versions without intermediate CSVs: V22, V23 (vectorized) and the
+    QQQ benchmark run in one lockstep pass over data loaded once.
+    """
+    from engine import run_backtests
+    print(f"Comparing V22.1 ({v22_path}) vs V23.0 ({v23_path})")
+    curves = run_backtests(qqq_path, tqqq_path,
+                           {'V22': v22_path, 'V23': (v23_path, {'vectorized': True})},
+                           benchmarks={'QQQ': 'US.QQQ'})
+    df = pd.DataFrame({name: curves[name]['total_value'] for name in ('V23', 'V22', 'QQQ')})
+    print_comparison(df)
+
+def print_comparison(df):
+    """Markdown tables of V23/V22/QQQ metrics; df holds one equity column per name."""
+    df = df.copy()
     
     # Calculate Returns
     df['V23_Ret'] = df['V23'].pct_change().fillna(0)
@@ -186,7 +204,11 @@ def compare_versions(v22_dir, v23_dir):
                   is_percent=True)
 
 if __name__ == "__main__":
-    if len(sys.argv) == 3:
+    if len(sys.argv) == 2 and sys.argv[1] == "--run":
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        compare_strategies(os.path.join(base_dir, "input", "QQQ.csv"), os.path.join(base_dir, "input", "TQQQ.csv"),
+                           os.path.join(base_dir, "code", "tqqq.py"), os.path.join(base_dir, "code", "tqqq_opt.py"))
+    elif len(sys.argv) == 3:
         compare_versions(sys.argv[1], sys.argv[2])
     else:
         run_diagnosis()
@@ -3,38 +3,157 @@ import pandas as pd
 import numpy as np
 import logging
 import importlib.util
+import hashlib
 import sys
 import os
 from mock_api import *
-from data_loader import load_and_clean_data
+from data_loader import load_and_clean_data, load_symbols
+from checkpoint import load_checkpoint, restore_checkpoint, save_checkpoint
+from benchmarks import build_benchmarks, buy_and_hold
+from indicators import RETURN_INDICATORS
+from minute_store import MinuteContext, open_minute_stores
+from events import EventRecorder, BAR_ERROR, bar_error_args
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_backtest(qqq_path, tqqq_path, strategy_path):
+def run_backtest(qqq_path, tqqq_path, strategy_path, vectorized=False, params=None, profiler=None,
+                 checkpoint_path=None, extra_symbols=None, return_context=False, fill_timing='close',
+                 start=None, end=None, events=None):
+    """
+    Run a strategy file against the aligned QQQ/TQQQ history.
+    vectorized=True uses the target-weight fast path when the strategy
+    implements target_weights(data); otherwise the per-bar loop is used.
+    params: optional {attribute: value} overrides applied to the Strategy
+    instance right after its global_variables().
+    profiler: optional profiler.ApiProfiler; times every injected API call
+    and handle_data/target_weights.
+    checkpoint_path: resume from / save to this checkpoint (see run_strategy).
+    extra_symbols: optional {symbol: csv path} tradable alongside QQQ/TQQQ,
+    e.g. {"US.SQQQ": "input/SQQQ.csv"}; all series are aligned on common dates.
+    return_context=True returns (DataFrame, MockContext) for order/signal inspection.
+    fill_timing: when place_market orders fill, one of mock_api.FILL_TIMINGS.
+    start/end: simulate only the bars dated start..end (inclusive, either may
+    be None), preceded by just the warmup the strategy's lookbacks need (see
+    strategy_warmup) instead of the whole history.
+    events: optional events.EventRecorder for the strategy's prints and
+    per-bar errors (see run_strategy).
+    """
+    df_qqq, df_tqqq, frames = load_frames(qqq_path, tqqq_path, extra_symbols)
+    StrategyClass = load_strategy_class(strategy_path, profiler=profiler)
+    start_index = 0
+    if start is not None or end is not None:
+        df_qqq, df_tqqq, frames, start_index = window_frames(
+            df_qqq, df_tqqq, frames, [(StrategyClass, {'vectorized': vectorized, 'params': params})], start, end)
+    return run_strategy(df_qqq, df_tqqq, StrategyClass, vectorized=vectorized, params=params,
+                        start_index=start_index, profiler=profiler, checkpoint_path=checkpoint_path,
+                        extra_frames=frames, return_context=return_context, fill_timing=fill_timing,
+                        events=events)
+
+def run_backtests(qqq_path, tqqq_path, runs, benchmarks=None, profiler=None, extra_symbols=None,
+                  return_context=False, start=None, end=None):
+    """
+    Load the data once and run several strategy files over it in a single
+    lockstep pass (see run_lockstep).
+    runs: {name: strategy_path} or {name: (strategy_path, options)}, where
+    options holds any of vectorized/params/checkpoint_path/fill_timing/events.
+    benchmarks: optional {name: symbol or spec} baselines on the same dates,
+    e.g. {"QQQ Benchmark": "US.QQQ"} or benchmarks.DEFAULT_BENCHMARKS.
+    start/end: as in run_backtest, one window for every run and benchmark
+    (the warmup is the longest any run needs).
+    Returns {name: DataFrame} (or (DataFrame, MockContext) per strategy run
+    with return_context=True), strategies first, then benchmarks.
+    """
+    df_qqq, df_tqqq, frames = load_frames(qqq_path, tqqq_path, extra_symbols)
+    classes = {}
+    for name, spec in runs.items():
+        path, options = spec if isinstance(spec, tuple) else (spec, {})
+        classes[name] = (load_strategy_class(path, profiler=profiler), dict(options, profiler=profiler))
+    start_index = 0
+    if start is not None or end is not None:
+        df_qqq, df_tqqq, frames, start_index = window_frames(df_qqq, df_tqqq, frames, classes.values(), start, end)
+    results = run_lockstep(df_qqq, df_tqqq, classes, start_index=start_index, extra_frames=frames,
+                           return_context=return_context)
+    if benchmarks:
+        results.update(build_benchmarks({"US.QQQ": df_qqq, "US.TQQQ": df_tqqq, **(frames or {})}, benchmarks,
+                                        start=start_index))
+    return results
+
+def load_frames(qqq_path, tqqq_path, extra_symbols=None):
+    """Aligned QQQ/TQQQ frames plus {symbol: frame} for extra_symbols (None without them)."""
     logging.info("Loading data...")
+    if extra_symbols:
+        frames = load_symbols({"US.QQQ": qqq_path, "US.TQQQ": tqqq_path, **extra_symbols})
+        return frames.pop("US.QQQ"), frames.pop("US.TQQQ"), frames
     df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
-    
-    # Define time range (intersection of both)
+    return df_qqq, df_tqqq, None
+
+def date_window(dates, start=None, end=None):
+    """Bar range [start_index, end_index) of the dates from start to end (inclusive; None = open)."""
+    start_index = 0 if start is None else int(dates.searchsorted(pd.Timestamp(start)))
+    end_index = len(dates) if end is None else int(dates.searchsorted(pd.Timestamp(end), side='right'))
+    if start_index >= end_index:
+        raise ValueError(f"No bars between {start} and {end}")
+    return start_index, end_index
+
+def window_frames(df_qqq, df_tqqq, frames, runs, start=None, end=None):
+    """
+    Cut aligned frames down to the start..end window plus the warmup before
+    it that the longest-looking of `runs` ((StrategyClass, options) pairs)
+    needs. Returns (df_qqq, df_tqqq, frames, start_index), start_index being
+    the window's first bar in the cut frames.
+    """
     dates = df_qqq.index
-    logging.info(f"Backtest range: {dates[0]} to {dates[-1]}")
-    
-    # Initialize Context
-    ctx = MockContext(df_qqq, df_tqqq)
-    set_context(ctx)
-    
+    start_index, end_index = date_window(dates, start, end)
+    warmup = 0
+    if start_index > 0:
+        for StrategyClass, options in runs:
+            warmup = max(warmup, strategy_warmup(df_qqq, df_tqqq, StrategyClass, options.get('params'),
+                                                 start_index, frames, options.get('vectorized', False)))
+    lo = max(0, start_index - warmup)
+    logging.info(f"Window {dates[start_index].date()} to {dates[end_index - 1].date()}: "
+                 f"{end_index - start_index} bars after {start_index - lo} warmup bars")
+    frames = {sym: df.iloc[lo:end_index] for sym, df in frames.items()} if frames else frames
+    return df_qqq.iloc[lo:end_index], df_tqqq.iloc[lo:end_index], frames, start_index - lo
+
+# (abs path, mtime_ns, size) -> (code object, source sha256); a file is parsed once per process
+_compiled_strategies = {}
+# Same key -> Strategy class exec'd against the plain (unprofiled) mock API
+_strategy_classes = {}
+
+def _source_key(strategy_path):
+    st = os.stat(strategy_path)
+    return (os.path.abspath(strategy_path), st.st_mtime_ns, st.st_size)
+
+def compile_strategy(strategy_path):
+    """Compile a strategy file once; returns (code object, sha256 of the source)."""
+    key = _source_key(strategy_path)
+    compiled = _compiled_strategies.get(key)
+    if compiled is None:
+        with open(strategy_path, 'r') as f:
+            code = f.read()
+        compiled = (compile(code, key[0], 'exec'), hashlib.sha256(code.encode()).hexdigest())
+        _compiled_strategies[key] = compiled
+    return compiled
+
+def load_strategy_class(strategy_path, profiler=None):
+    """
+    Exec a strategy file against the mock API and return its Strategy class.
+    The class is cached per file version and safe to reuse across runs and
+    threads: the mock API resolves the running MockContext per call.
+    """
+    key = _source_key(strategy_path)
+    if profiler is None and key in _strategy_classes:
+        return _strategy_classes[key]
     # Dynamically load strategy from file
     logging.info(f"Loading strategy from {strategy_path}...")
-    spec = importlib.util.spec_from_file_location("StrategyModule", strategy_path)
-    module = importlib.util.module_from_spec(spec)
     
     # Inject mock API into module namespace
     # This is tricky because the module expects `from extensions import *` etc.
     # We can inject into sys.modules or monkeypatch.
-    # A cleaner way: Read the file content and exec it in a custom globals dict that has our mocks.
+    # A cleaner way: exec the compiled file in a custom globals dict that has our mocks.
     
-    with open(strategy_path, 'r') as f:
-        code = f.read()
+    code, digest = compile_strategy(strategy_path)
     
     # Prepare global namespace with our mock functions
     mock_globals = {
@@ -61,6 +180,10 @@ def run_backtest(qqq_path, tqqq_path, strategy_path):
         'ma': ma,
         'rsi': rsi,
         'vol': vol,
+        'bar_history': bar_history,
+        'highest': highest,
+        'lowest': lowest,
+        'rolling_mean': rolling_mean,
         'request_orderid': request_orderid,
         'order_status': order_status,
         'position_holding_qty': position_holding_qty,
@@ -68,10 +191,17 @@ def run_backtest(qqq_path, tqqq_path, strategy_path):
         'position_market_cap': position_market_cap,
         'net_asset': net_asset,
         'place_market': place_market,
+        'rebalance_to_weights': rebalance_to_weights,
+        'place_limit': place_limit,
+        'cancel_order': cancel_order,
         'max_qty_to_buy_on_cash': max_qty_to_buy_on_cash,
-        # Helper for print
-        'print': logging.info
+        'VectorData': VectorData,
+        'np': np,
+        # print() is buffered on the run's EventRecorder
+        'print': strategy_print
     }
+    if profiler is not None:
+        profiler.wrap_namespace(mock_globals)
     
     # Execute strategy definition
     try:
@@ -83,58 +213,384 @@ def run_backtest(qqq_path, tqqq_path, strategy_path):
     StrategyClass = mock_globals.get('Strategy')
     if not StrategyClass:
         raise ValueError("Class 'Strategy' not found in strategy file.")
+    # Identifies the source in checkpoints
+    StrategyClass._source_digest = digest
+    if profiler is None:
+        _strategy_classes[key] = StrategyClass
+    return StrategyClass
+
+def run_strategy(df_qqq, df_tqqq, StrategyClass, vectorized=False, params=None,
+                 start_index=0, end_index=None, indicator_cache=None, profiler=None,
+                 checkpoint_path=None, extra_frames=None, return_context=False, fill_timing='close',
+                 events=None):
+    """
+    Run an already loaded Strategy class over aligned, cleaned frames.
+    The run gets its own MockContext, bound to the mock API only while it
+    runs, so runs may go back to back or in parallel threads.
+    start_index/end_index restrict the simulated bars to [start, end) while
+    indicators and bar lookbacks still see the full history before start.
+    indicator_cache: optional dict shared across runs on the same frames.
+    extra_frames: optional {symbol: frame} registered after QQQ/TQQQ (same dates).
+    profiler: optional ApiProfiler; also times handle_data/target_weights.
+    checkpoint_path: if it holds a checkpoint of the same strategy/params
+    whose bars are a prefix of this data, restore it and simulate only the
+    bars after it instead of calling initialize(); the state after the last
+    bar is written back to it.
+    return_context=True returns (DataFrame, MockContext).
+    fill_timing: 'close' fills place_market orders at the close of the bar
+    they are placed on; 'next_open'/'next_close' book them as pending and
+    fill them on the next bar (the vectorized path then falls back to the
+    per-bar loop).
+    events: EventRecorder the strategy's prints and per-bar errors go to
+    (default: echoed to logging at the root logger's level, so a run under a
+    quietened logger formats none of its prints); finish() is called at the end.
+    """
+    # Define time range (intersection of both)
+    dates = df_qqq.index
+    if end_index is None:
+        end_index = len(dates)
+    logging.info(f"Backtest range: {dates[start_index]} to {dates[end_index - 1]}")
     
-    strategy = StrategyClass()
+    # Initialize Context
+    ctx = MockContext(df_qqq, df_tqqq, indicator_cache=indicator_cache, extra_symbols=extra_frames,
+                      fill_timing=fill_timing, events=events)
+    with use_context(ctx):
+        _simulate(ctx, StrategyClass, vectorized, params, start_index, end_index, profiler, checkpoint_path)
+    ctx.events.finish(ctx.bar_dates)
+
+    # History rows were filled in place; expose them without copying
+    df_results = ctx.history_frame()
+    if return_context:
+        return df_results, ctx
+    return df_results
+
+def run_lockstep(df_qqq, df_tqqq, runs, start_index=0, end_index=None, indicator_cache=None,
+                 extra_frames=None, return_context=False):
+    """
+    Advance several strategies over the same frames in one pass.
+    runs: {name: StrategyClass} or {name: (StrategyClass, options)} with
+    options from run_strategy (vectorized, params, checkpoint_path, profiler, fill_timing, events).
+    Each run gets its own MockContext (cash, positions, orders) but they share
+    one symbol registry and indicator cache, and every bar is stepped for all
+    runs before moving on; each result equals a separate run_strategy call.
+    Returns {name: DataFrame}, or {name: (DataFrame, MockContext)}.
+    """
+    dates = df_qqq.index
+    if end_index is None:
+        end_index = len(dates)
+    if indicator_cache is None:
+        indicator_cache = {}
+    registry = build_registry(df_qqq, df_tqqq, extra_frames)
+    logging.info(f"Lockstep backtest of {len(runs)} strategies: {dates[start_index]} to {dates[end_index - 1]}")
+
+    steppers = []
+    for name, spec in runs.items():
+        StrategyClass, options = spec if isinstance(spec, tuple) else (spec, {})
+        ctx = MockContext(df_qqq, df_tqqq, indicator_cache=indicator_cache, registry=registry,
+                          fill_timing=options.get('fill_timing', 'close'), events=options.get('events'))
+        steps = _steps(ctx, StrategyClass, options.get('vectorized', False), options.get('params'),
+                       start_index, end_index, options.get('profiler'), options.get('checkpoint_path'))
+        # The first step initializes (or resumes) and reports the first bar the run still needs
+        with use_context(ctx):
+            first = next(steps)
+        steppers.append((name, ctx, steps, first))
+
+    for i in range(start_index, end_index):
+        for _, ctx, steps, first in steppers:
+            if i >= first:
+                with use_context(ctx):
+                    next(steps)
+    for _, ctx, steps, _ in steppers:
+        # Runs the post-loop part (checkpoint save)
+        with use_context(ctx):
+            next(steps, None)
+        ctx.events.finish(ctx.bar_dates)
+
+    results = {}
+    for name, ctx, _, _ in steppers:
+        df = ctx.history_frame()
+        results[name] = (df, ctx) if return_context else df
+    return results
+
+def run_minute_backtest(store_root, strategy_path, bar_type=BarType.M1, symbols=("US.QQQ", "US.TQQQ"),
+                        params=None, profiler=None, max_chunks=2, return_context=False, fill_timing='close',
+                        events=None):
+    """
+    Run a strategy file on intraday bars from a minute store (see
+    minute_store.write_minute_store). handle_data runs on every bar of
+    `bar_type`; only max_chunks yearly chunks per symbol are mapped at once.
+    Returns the daily portfolio history, or (DataFrame, MinuteContext).
+    """
+    stores = open_minute_stores(store_root, symbols, bar_type, max_chunks)
+    StrategyClass = load_strategy_class(strategy_path, profiler=profiler)
+    return run_minute_strategy(stores, StrategyClass, params=params, profiler=profiler,
+                               return_context=return_context, fill_timing=fill_timing, events=events)
+
+def run_minute_strategy(stores, StrategyClass, params=None, profiler=None, return_context=False,
+                        fill_timing='close', events=None):
+    """
+    run_strategy for {symbol: minute_store.MinuteBars}: same per-bar order of
+    fills, limits and handle_data, but each day's history row and signal are
+    recorded at its last bar. No vectorized path or checkpoints.
+    """
+    ctx = MinuteContext(stores, fill_timing=fill_timing, events=events)
+    logging.info(f"{ctx.bar_type.name} backtest: {ctx.n_bars} bars over {len(ctx.dates)} days, "
+                 f"{ctx.dates[0]} to {ctx.dates[-1]}")
+    with use_context(ctx):
+        strategy = StrategyClass()
+        if profiler is not None:
+            profiler.wrap_methods(strategy)
+        if params:
+            apply_params(strategy, params)
+        logging.info("Initializing strategy...")
+        strategy.initialize()
+        logging.info("Starting intraday simulation loop...")
+        for i in range(ctx.n_bars):
+            ctx.advance(i)
+            if ctx.pending:
+                ctx.fill_pending('open')
+            if ctx.limit_orders:
+                ctx.match_limits()
+            try:
+                strategy.handle_data()
+            except Exception as e:
+                ctx.events.record(i, BAR_ERROR, bar_error_args(ctx.current_date, e))
+            if ctx.pending:
+                ctx.fill_pending('close')
+            if ctx.is_day_close():
+                ctx.signals_history.append(getattr(strategy, 'state_label', None))
+                mark_to_market(ctx, ctx.day)
+    ctx.events.finish(ctx.bar_dates)
+
+    df_results = ctx.history_frame()
+    if return_context:
+        return df_results, ctx
+    return df_results
+
+def _simulate(ctx, StrategyClass, vectorized, params, start_index, end_index, profiler, checkpoint_path):
+    """Initialize (or resume) one strategy instance on ctx and step it through the bars."""
+    for _ in _steps(ctx, StrategyClass, vectorized, params, start_index, end_index, profiler, checkpoint_path):
+        pass
+
+def _steps(ctx, StrategyClass, vectorized, params, start_index, end_index, profiler, checkpoint_path):
+    """
+    One run as a generator: the first next() initializes (or resumes from the
+    checkpoint) and yields the first bar to simulate; each next() after that
+    simulates one bar and yields its index. The caller binds ctx to the mock
+    API around every next().
+    """
+    if start_index > 0:
+        # Initialize as of the last bar before the window, so ATH-style lookbacks see history
+        ctx.advance(start_index - 1)
     
-    # Initialize
-    logging.info("Initializing strategy...")
-    strategy.initialize()
+    strategy = StrategyClass()
+    if profiler is not None:
+        profiler.wrap_methods(strategy)
+    if params:
+        apply_params(strategy, params)
+
+    run_signature = (getattr(StrategyClass, '_source_digest', StrategyClass.__qualname__),
+                     sorted((params or {}).items()), bool(vectorized), start_index, ctx.fill_timing)
+    state = load_checkpoint(checkpoint_path, ctx, run_signature)
+    if state is not None and state['n_bars'] <= end_index:
+        start_index = restore_checkpoint(state, ctx, strategy)
+        ctx.resumed_from = start_index
+        logging.info(f"Resuming from checkpoint after {state['last_date']} ({end_index - start_index} new bars)...")
+    else:
+        # Initialize
+        logging.info("Initializing strategy...")
+        strategy.initialize()
+    yield start_index
     
-    # Run Loop
-    logging.info("Starting simulation loop...")
-    for current_date in dates:
-        ctx.current_date = current_date
-        
-        # Check if data exists for today
-        if current_date not in df_qqq.index or current_date not in df_tqqq.index:
-            continue
-            
-        # Run handle_data
+    if vectorized and ctx.fill_timing != 'close':
+        # target_weights() trades at the close by construction
+        logging.warning(f"fill_timing={ctx.fill_timing!r} needs the per-bar loop; ignoring vectorized.")
+        vectorized = False
+    if vectorized and hasattr(strategy, 'target_weights'):
+        logging.info("Starting vectorized target-weight run...")
+        yield from target_weight_steps(ctx, strategy, start_index, end_index)
+    else:
+        if vectorized:
+            logging.warning("Strategy has no target_weights(); falling back to per-bar loop.")
+        # Run Loop
+        logging.info("Starting simulation loop...")
+        for i in range(start_index, end_index):
+            # Both frames share the aligned date index, so one cursor serves every symbol
+            ctx.advance(i)
+            # Orders booked for this bar's open, then resting limits the bar trades
+            # through, fill before the strategy runs at the close
+            if ctx.pending:
+                ctx.fill_pending('open')
+            if ctx.limit_orders:
+                ctx.match_limits()
+
+            # Run handle_data
+            try:
+                strategy.handle_data()
+            except Exception as e:
+                ctx.events.record(i, BAR_ERROR, bar_error_args(ctx.current_date, e))
+            # ...and those due at this close fill after it (it still saw them open)
+            if ctx.pending:
+                ctx.fill_pending('close')
+            # Strategies that keep a regime label (V22 state_label) get it recorded per bar
+            ctx.signals_history.append(getattr(strategy, 'state_label', None))
+
+            mark_to_market(ctx, i)
+            yield i
+
+    if checkpoint_path and end_index > start_index:
+        save_checkpoint(checkpoint_path, ctx, strategy, run_signature)
+
+def apply_params(strategy, params):
+    """
+    Override strategy attributes right after global_variables() sets defaults,
+    so the rest of initialize() (e.g. _init_ath_price) already sees them.
+    """
+    original = strategy.global_variables
+    def global_variables():
+        original()
+        for name, value in params.items():
+            setattr(strategy, name, value)
+    strategy.global_variables = global_variables
+
+# Substrings of strategy attributes holding a lookback in bars (ma_long_window, rsi_period, ...)
+LOOKBACK_ATTRS = ('window', 'period', 'lookback')
+
+class LookbackProbe(MockContext):
+    """MockContext recording the most bars (counting the cursor bar) any data request reaches back."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lookback = 1
+
+    def get_price(self, symbol, field='close', offset=0, bar_type=None):
+        self.lookback = max(self.lookback, offset)
+        return super().get_price(symbol, field, offset, bar_type)
+
+    def get_indicator(self, symbol, field, name, period):
+        self.lookback = max(self.lookback, period + (name in RETURN_INDICATORS))
+        return super().get_indicator(symbol, field, name, period)
+
+    def get_indicator_value(self, symbol, field, name, period, select=1, bar_type=None):
+        self.lookback = max(self.lookback, period + (name in RETURN_INDICATORS) + select - 1)
+        return super().get_indicator_value(symbol, field, name, period, select, bar_type)
+
+    def get_window(self, symbol, field, length, select=1, bar_type=None):
+        self.lookback = max(self.lookback, length + select - 1)
+        return super().get_window(symbol, field, length, select, bar_type)
+
+def strategy_warmup(df_qqq, df_tqqq, StrategyClass, params=None, start_index=0, extra_frames=None,
+                    vectorized=False):
+    """
+    Bars of history a run starting at start_index needs before it: the
+    longest lookback that initialize() and the first handle_data (or
+    target_weights) request on a throwaway probe context, or that any
+    *window/*period/*lookback attribute names (covering branches the probe
+    bar did not take), or the strategy's warmup_bars if it declares one.
+    """
+    # The probe's prints are not the run's: kept on a small recorder and never echoed
+    ctx = LookbackProbe(df_qqq, df_tqqq, extra_symbols=extra_frames, events=EventRecorder(capacity=64))
+    strategy = StrategyClass()
+    if params:
+        apply_params(strategy, params)
+    with use_context(ctx):
+        if start_index > 0:
+            ctx.advance(start_index - 1)
+        strategy.initialize()
+        ctx.advance(start_index)
         try:
-            strategy.handle_data()
+            if vectorized and hasattr(strategy, 'target_weights'):
+                strategy.target_weights(VectorData(ctx))
+            else:
+                strategy.handle_data()
         except Exception as e:
-            logging.error(f"Error on {current_date}: {e}")
-            
-        # Update portfolio value for the day (mark-to-market)
-        # Note: positions updated inside place_market (instant fill assumption)
-        # We calculate EOD value
-        val_qqq = ctx.positions["US.QQQ"] * df_qqq.loc[current_date, 'close']
-        val_tqqq = ctx.positions["US.TQQQ"] * df_tqqq.loc[current_date, 'close']
-        total_value = ctx.cash + val_qqq + val_tqqq
-        
-        ctx.portfolio_history.append({
-            'date': current_date,
-            'total_value': total_value,
-            'cash': ctx.cash,
-            'qqq_val': val_qqq,
-            'tqqq_val': val_tqqq,
-            'qqq_qty': ctx.positions["US.QQQ"],
-            'tqqq_qty': ctx.positions["US.TQQQ"]
-        })
-        
-    # Convert history to DataFrame
-    df_results = pd.DataFrame(ctx.portfolio_history)
-    df_results.set_index('date', inplace=True)
-    return df_results
+            logging.error(f"Warmup probe of {StrategyClass.__qualname__} failed on {ctx.current_date}: {e}")
+    warmup = ctx.lookback
+    for name, value in vars(strategy).items():
+        if type(value) is int and any(key in name for key in LOOKBACK_ATTRS):
+            # +1: the attribute may size a returns-based indicator
+            warmup = max(warmup, value + 1)
+    return max(warmup, getattr(strategy, 'warmup_bars', 0))
+
+def mark_to_market(ctx, i):
+    """Record the end-of-day portfolio value for bar i in ctx.history."""
+    ctx.record_bar(i)
+
+def run_target_weights(ctx, strategy, start_index=0, end_index=None):
+    """
+    Fast path for strategies whose handle_data only maps indicators to weights
+    and hands them to rebalance_to_weights.
+    strategy.target_weights(VectorData) returns {Contract: weight array}; a NaN
+    weight on any leg means "no rebalance on that bar". Weights are computed
+    once with NumPy; each active bar then makes the same
+    ctx.rebalance_to_weights call handle_data would (with the strategy's
+    min_trade, default 0), so sizing, sell-before-buy order and fills are
+    identical, but the per-bar mock API round-trips are gone. NAV depends on
+    yesterday's fills, so the share/cash recurrence itself stays a (tight)
+    sequential loop.
+    """
+    for _ in target_weight_steps(ctx, strategy, start_index, end_index):
+        pass
+
+def target_weight_steps(ctx, strategy, start_index=0, end_index=None):
+    """run_target_weights as a generator yielding each bar index once it is filled and marked."""
+    weights = strategy.target_weights(VectorData(ctx))
+    legs = [(symbol, np.asarray(w, dtype=float)) for symbol, w in weights.items()]
+    active = np.ones(len(ctx.dates), dtype=bool)
+    for _, w in legs:
+        active &= ~np.isnan(w)
+    min_trade = getattr(strategy, 'min_trade', 0.0)
+
+    if end_index is None:
+        end_index = len(ctx.dates)
+    for i in range(start_index, end_index):
+        ctx.advance(i)
+        if active[i]:
+            ctx._rebalance({symbol: w[i] for symbol, w in legs}, min_trade)
+        mark_to_market(ctx, i)
+        yield i
 
 def run_benchmark(df, initial_capital=100000.0):
     """
     Simple Buy & Hold Benchmark
     """
-    start_price = df['close'].iloc[0]
-    shares = initial_capital // start_price
-    cash = initial_capital - (shares * start_price)
-    
     df_bm = pd.DataFrame(index=df.index)
-    df_bm['total_value'] = (df['close'] * shares) + cash
+    df_bm['total_value'] = buy_and_hold(np.array(df['close'], dtype=float), initial_capital)
     return df_bm
+
+def check_window(qqq_path, tqqq_path, strategy_path, start, end=None, vectorized=False):
+    """
+    Assert a start..end run on the warmup-cut frames equals the same window
+    simulated over the full history (curve and orders), and time both the
+    windowed and the full-history run_backtest. Returns (window s, full s).
+    """
+    import time
+    df_qqq, df_tqqq, _ = load_frames(qqq_path, tqqq_path)
+    start_index, end_index = date_window(df_qqq.index, start, end)
+    StrategyClass = load_strategy_class(strategy_path)
+    df_ref, ref_ctx = run_strategy(df_qqq, df_tqqq, StrategyClass, vectorized=vectorized, start_index=start_index,
+                                   end_index=end_index, return_context=True)
+
+    t0 = time.perf_counter()
+    df_win, ctx = run_backtest(qqq_path, tqqq_path, strategy_path, vectorized=vectorized, start=start, end=end,
+                               return_context=True)
+    t_window = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    run_backtest(qqq_path, tqqq_path, strategy_path, vectorized=vectorized)
+    t_full = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(df_ref, df_win, check_exact=True)
+    orders = ctx.orders_frame().drop(columns='bar')
+    pd.testing.assert_frame_equal(ref_ctx.orders_frame().drop(columns='bar'), orders, check_exact=True)
+    return t_window, t_full
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    for name, vectorized in (("tqqq.py", False), ("tqqq_opt.py", False), ("tqqq_opt.py", True)):
+        for start, end in (("2011-06-01", "2012-05-31"), ("2020-01-01", "2020-12-31"), ("2024-01-01", None)):
+            t_window, t_full = check_window(qqq_path, tqqq_path, os.path.join(base_dir, "code", name),
+                                            start, end, vectorized)
+            print(f"Window OK: {name}{' (vectorized)' if vectorized else ''} {start}..{end or 'end'} "
+                  f"in {t_window:.3f}s vs {t_full:.3f}s full history")
@@ -0,0 +1,164 @@
+import logging
+import traceback
+
+import numpy as np
+
+# Event code -> (name, level, %-style template); a None template joins the
+# args with spaces like print(). Messages are only formatted when read.
+EVENT_TYPES = []
+
+
+def register_event(name, level, template):
+    """Add an event type; returns its code."""
+    EVENT_TYPES.append((name, level, template))
+    return len(EVENT_TYPES) - 1
+
+
+PRINT = register_event('print', logging.INFO, None)
+BAR_ERROR = register_event('bar_error', logging.ERROR, "Error on %s: %s\n%s")
+
+
+def bar_error_args(date, e):
+    # BAR_ERROR args as text: a held exception would keep its traceback's frames (ctx, strategy) alive
+    return (date, repr(e), ''.join(traceback.format_exception(type(e), e, e.__traceback__)).rstrip())
+
+
+def event_template(code, args):
+    template = EVENT_TYPES[code][2]
+    return ' '.join(['%s'] * len(args)) if template is None else template
+
+
+def format_event(code, args):
+    return event_template(code, args) % tuple(args)
+
+
+class EventRecorder:
+    """
+    Ring buffer of (bar index, event code, args) for one run.
+    Bars and codes live in preallocated arrays and args are kept as passed;
+    nothing is formatted until events are read or dumped, so a recorder
+    whose level drops an event costs one comparison. Once capacity events
+    are held the oldest are overwritten (counted in `dropped`).
+    level: events below it are ignored (None: the root logger's level when
+    the recorder is made, so a quietened sweep worker records no prints).
+    echo=True also hands each kept event to logging as it happens (the
+    logging module formats it only if a handler emits it).
+    dump_path: file finish() writes the buffered events to.
+    """
+
+    def __init__(self, capacity=4096, level=None, echo=False, dump_path=None):
+        self.capacity = capacity
+        self.level = logging.getLogger().getEffectiveLevel() if level is None else level
+        self.echo = echo
+        self.dump_path = dump_path
+        self.bars = np.zeros(capacity, dtype=np.int64)
+        self.codes = np.zeros(capacity, dtype=np.int16)
+        self.args = [None] * capacity
+        self.count = 0
+
+    def record(self, bar, code, args):
+        level = EVENT_TYPES[code][1]
+        if level < self.level:
+            return
+        slot = self.count % self.capacity
+        self.bars[slot] = -1 if bar is None else bar
+        self.codes[slot] = code
+        self.args[slot] = args
+        self.count += 1
+        if self.echo:
+            logging.log(level, event_template(code, args), *args)
+
+    @property
+    def dropped(self):
+        return max(self.count - self.capacity, 0)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _order(self):
+        # Buffer slots oldest first
+        n = len(self)
+        return np.arange(self.count - n, self.count) % self.capacity
+
+    def events(self):
+        """Held events oldest first, as (bar, event name, args)."""
+        return [(int(self.bars[s]), EVENT_TYPES[self.codes[s]][0], self.args[s]) for s in self._order()]
+
+    def messages(self):
+        return [format_event(self.codes[s], self.args[s]) for s in self._order()]
+
+    def lines(self, bar_dates=None):
+        """'date level message' per held event; bar_dates maps bar indices to dates (e.g. ctx.bar_dates)."""
+        order = self._order()
+        bars = self.bars[order]
+        dates = bars if bar_dates is None else bar_dates(np.maximum(bars, 0))
+        lines = []
+        for s, bar, date in zip(order, bars, dates):
+            code = self.codes[s]
+            stamp = '-' if bar < 0 else date
+            lines.append(f"{stamp} {logging.getLevelName(EVENT_TYPES[code][1])} {format_event(code, self.args[s])}")
+        return lines
+
+    def dump(self, path, bar_dates=None):
+        with open(path, "w", encoding="utf-8") as f:
+            if self.dropped:
+                f.write(f"# {self.dropped} earlier events dropped (capacity {self.capacity})\n")
+            for line in self.lines(bar_dates):
+                f.write(line + "\n")
+
+    def finish(self, bar_dates=None):
+        # Called by the engine once a run is over
+        if self.dump_path:
+            self.dump(self.dump_path, bar_dates)
+            logging.info(f"{len(self)} events written to {self.dump_path}")
+
+
+def check_events(qqq_path, tqqq_path, strategy_path, capacity=64):
+    """
+    Run a strategy with a full recorder, a small (wrapping) one and a quiet
+    one: the curves must match, the small ring must hold the newest events
+    of the full one, the quiet one none, and the dump one line per event.
+    Returns the number of events the full recorder held.
+    """
+    import os
+    import tempfile
+    import pandas as pd
+    from data_loader import load_and_clean_data
+    from engine import load_strategy_class, run_strategy
+
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    StrategyClass = load_strategy_class(strategy_path)
+    full = EventRecorder(capacity=1 << 16, level=logging.INFO)
+    ring = EventRecorder(capacity=capacity, level=logging.INFO)
+    quiet = EventRecorder(level=logging.WARNING)
+    df_full, ctx = run_strategy(df_qqq, df_tqqq, StrategyClass, events=full, return_context=True)
+    for events in (ring, quiet):
+        pd.testing.assert_frame_equal(df_full, run_strategy(df_qqq, df_tqqq, StrategyClass, events=events),
+                                      check_exact=True)
+
+    assert full.dropped == 0 and full.count > capacity, "strategy printed too little to wrap the ring"
+    assert ring.count == full.count and ring.dropped == full.count - capacity
+    assert ring.events() == full.events()[-capacity:], "ring does not hold the newest events"
+    assert ring.messages() == full.messages()[-capacity:]
+    assert len(quiet) == 0, "events below the recorder level were kept"
+    for (_, name, args), message in zip(full.events(), full.messages()):
+        if name == 'print':
+            assert message == ' '.join(str(a) for a in args)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "events.log")
+        full.dump(path, ctx.bar_dates)
+        with open(path, encoding="utf-8") as f:
+            assert f.read().splitlines() == full.lines(ctx.bar_dates)
+    return full.count
+
+
+if __name__ == "__main__":
+    import os
+    import engine  # configures logging
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    logging.getLogger().setLevel(logging.WARNING)
+    # V22 prints on many bars (V23 only at initialize)
+    n = check_events(qqq_path, tqqq_path, os.path.join(base_dir, "code", "tqqq.py"))
+    print(f"Event recorder OK: tqqq.py, {n} events")
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def rolling_ma(values, period):
+    """
+    Simple moving average over the trailing `period` bars (last axis, so a
+    2-D paths x bars array works too). Bars without a full window are NaN.
+    Windows are summed left to right so results match the builtin sum()
+    used by the per-bar implementation bit for bit.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if period <= 0 or values.shape[-1] < period:
+        return out
+    windows = sliding_window_view(values, period, axis=-1)
+    acc = windows[..., 0].copy()
+    for k in range(1, period):
+        acc += windows[..., k]
+    out[..., period - 1:] = acc / period
+    return out
+
+
+def rolling_rsi(values, period):
+    """
+    RSI based on simple rolling means of gains/losses (not Wilder smoothing).
+    Bars without enough history are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    s = pd.Series(values)
+    delta = s.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / loss
+        rsi_val = 100 - (100 / (1 + rs))
+    out = np.array(rsi_val, dtype=float)
+    # The first `period` bars have fewer than period + 1 prices
+    out[:period] = np.nan
+    return out
+
+
+def rolling_vol(values, period):
+    """
+    Annualized volatility of the trailing `period` simple returns (ddof=1).
+    Bars without period + 1 prices are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if period <= 1 or len(values) < period + 1:
+        return out
+    returns = values[1:] / values[:-1] - 1.0
+    windows = sliding_window_view(returns, period)
+    mean = windows.sum(axis=1) / period
+    var = ((windows - mean[:, None]) ** 2).sum(axis=1) / (period - 1)
+    out[period:] = np.sqrt(var) * np.sqrt(252)
+    return out
+
+
+def rolling_max(values, period):
+    """
+    Highest value over the trailing `period` bars, NaNs skipped. Near the start
+    of history the window is whatever bars exist (like looping select=1..period).
+    """
+    s = pd.Series(np.asarray(values, dtype=float))
+    return np.array(s.rolling(window=period, min_periods=1).max(), dtype=float)
+
+
+def rolling_min(values, period):
+    """Lowest value over the trailing `period` bars; same windowing as rolling_max."""
+    s = pd.Series(np.asarray(values, dtype=float))
+    return np.array(s.rolling(window=period, min_periods=1).min(), dtype=float)
+
+
+# Indicators computed on returns/deltas: a value needs period + 1 prices
+RETURN_INDICATORS = ('rsi', 'vol')
+
+INDICATORS = {
+    'ma': rolling_ma,
+    'rsi': rolling_rsi,
+    'vol': rolling_vol,
+    'highest': rolling_max,
+    'lowest': rolling_min,
+}
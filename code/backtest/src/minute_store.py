@@ -0,0 +1,426 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_FIELDS
+from indicators import INDICATORS, RETURN_INDICATORS
+from mock_api import BarType, MockContext, SymbolRegistry, build_registry
+
+NS_PER_DAY = 86_400 * 10**9
+INTRADAY_MINUTES = {BarType.M1: 1, BarType.M5: 5}
+
+
+def store_dir(root, symbol, bar_type):
+    return os.path.join(root, bar_type.name, symbol)
+
+
+def read_minute_csv(path):
+    """Intraday bars from a CSV with a date/datetime/timestamp column (exchange local time)."""
+    df = pd.read_csv(path)
+    df.columns = [c.lower() for c in df.columns]
+    time_col = next(c for c in ('datetime', 'timestamp', 'date', 'time') if c in df.columns)
+    df[time_col] = pd.to_datetime(df[time_col])
+    return df.set_index(time_col).rename_axis('date').sort_index()
+
+
+def resample_bars(df, minutes):
+    """Aggregate 1-minute bars into `minutes`-minute bars within each day (M1 -> M5)."""
+    spec = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    out = df.resample(f"{minutes}min", label='left', closed='left').agg(
+        {name: how for name, how in spec.items() if name in df.columns})
+    return out.dropna(subset=['close'])
+
+
+def write_minute_store(root, frames, bar_type=BarType.M1):
+    """
+    Write {symbol: intraday frame} as per-symbol, per-year column files
+    <root>/<bar type>/<symbol>/<year>/<field>.npy (bar times as int64 ns in
+    ts.npy), on the timestamps common to every symbol. Only the years present
+    in `frames` are replaced, so a long history can be written a year at a time.
+    """
+    common = None
+    for df in frames.values():
+        common = df.index if common is None else common.intersection(df.index)
+    common = common.sort_values()
+    years = common.year
+    ts = common.values.astype('datetime64[ns]').view(np.int64)
+    for symbol, df in frames.items():
+        df = df.loc[common]
+        # Same approximations as data_loader.load_symbols for missing columns
+        columns = {
+            'open': df['open'],
+            'high': df['high'] if 'high' in df.columns else df[['open', 'close']].max(axis=1),
+            'low': df['low'] if 'low' in df.columns else df[['open', 'close']].min(axis=1),
+            'close': df['close'],
+            'volume': df['volume'] if 'volume' in df.columns else pd.Series(0.0, index=df.index),
+        }
+        for year in np.unique(years):
+            mask = years == year
+            chunk_dir = os.path.join(store_dir(root, symbol, bar_type), str(year))
+            os.makedirs(chunk_dir, exist_ok=True)
+            np.save(os.path.join(chunk_dir, "ts.npy"), ts[mask])
+            for name in BAR_FIELDS:
+                np.save(os.path.join(chunk_dir, f"{name}.npy"), columns[name].to_numpy(dtype=np.float64)[mask])
+
+
+class MinuteBars:
+    """
+    One symbol's intraday bars from a minute store, with the BarStore lookups
+    (value/window by global bar cursor). Each year is a chunk of memory-mapped
+    column files; at most max_chunks are mapped at a time (least recently used
+    unmapped first), so memory stays bounded however long the history is.
+    """
+
+    def __init__(self, root, symbol, bar_type=BarType.M1, max_chunks=2):
+        self.symbol = symbol
+        self.bar_type = bar_type
+        self.directory = store_dir(root, symbol, bar_type)
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"No {bar_type.name} bars for {symbol} under {root}")
+        self.years = sorted(int(name) for name in os.listdir(self.directory) if name.isdigit())
+        # Only the .npy headers are read here
+        lengths = [np.load(os.path.join(self.directory, str(y), "ts.npy"), mmap_mode='r').shape[0]
+                   for y in self.years]
+        self.starts = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        self.length = int(self.starts[-1])
+        self.max_chunks = max(1, max_chunks)
+        self._chunks = OrderedDict()  # chunk number -> {field: memmap}
+        self._lo = self._hi = 0
+        self._cols = {}
+        self._daily = None
+        self.day_last = None
+
+    def __len__(self):
+        return self.length
+
+    def _page(self, k):
+        cols = self._chunks.pop(k, None)
+        if cols is None:
+            chunk_dir = os.path.join(self.directory, str(self.years[k]))
+            cols = {name[:-4]: np.load(os.path.join(chunk_dir, name), mmap_mode='r')
+                    for name in os.listdir(chunk_dir) if name.endswith(".npy")}
+            while len(self._chunks) >= self.max_chunks:
+                self._chunks.popitem(last=False)
+        self._chunks[k] = cols
+        self._lo, self._hi, self._cols = int(self.starts[k]), int(self.starts[k + 1]), cols
+        return cols
+
+    def _locate(self, target):
+        # Make the chunk holding bar `target` current; False if out of range
+        if self._lo <= target < self._hi:
+            return True
+        if target < 0 or target >= self.length:
+            return False
+        self._page(int(np.searchsorted(self.starts, target, side='right')) - 1)
+        return True
+
+    @property
+    def mapped_chunks(self):
+        return len(self._chunks)
+
+    def column(self, field):
+        # Whole-history columns would defeat the paging; intraday indicators use window()
+        return None
+
+    def value(self, field, cursor, select=1):
+        """Value of `field` at bar `cursor - (select - 1)`; None if out of range or NaN."""
+        if cursor is None:
+            return None
+        target = cursor - (select - 1)
+        if not self._locate(target):
+            return None
+        col = self._cols.get(field)
+        if col is None:
+            return None
+        val = col[target - self._lo]
+        if val != val:  # NaN
+            return None
+        return float(val)
+
+    def window(self, field, cursor, length):
+        """Up to `length` values ending at `cursor` (inclusive); a view unless it spans chunks."""
+        if cursor is None or cursor < 0 or not self._locate(cursor) or field not in self._cols:
+            return None
+        start = max(cursor - length + 1, 0)
+        if start >= self._lo:
+            return self._cols[field][start - self._lo:cursor + 1 - self._lo]
+        pieces = []
+        end = cursor + 1
+        while end > start:
+            self._locate(end - 1)
+            lo = max(start, self._lo)
+            pieces.append(self._cols[field][lo - self._lo:end - self._lo])
+            end = lo
+        return np.concatenate(pieces[::-1])
+
+    def timestamp(self, i):
+        """Bar i's time as int64 ns."""
+        self._locate(i)
+        return int(self._cols['ts'][i - self._lo])
+
+    def timestamps(self, bars):
+        """DatetimeIndex of bar indices (any order)."""
+        bars = np.asarray(bars, dtype=np.int64)
+        out = np.empty(len(bars), dtype=np.int64)
+        chunk = np.searchsorted(self.starts, bars, side='right') - 1
+        for k in np.unique(chunk):
+            mask = chunk == k
+            out[mask] = self._page(int(k))['ts'][bars[mask] - self.starts[k]]
+        return pd.DatetimeIndex(out.view('datetime64[ns]'))
+
+    def daily(self):
+        """
+        Daily OHLCV derived from the intraday bars (first open, highest high,
+        lowest low, last close, summed volume), streamed chunk by chunk.
+        Also sets day_last, the global index of every day's last bar.
+        """
+        if self._daily is None:
+            days, lasts = [], []
+            rows = {name: [] for name in BAR_FIELDS}
+            for k in range(len(self.years)):
+                cols = self._page(k)
+                day = cols['ts'] // NS_PER_DAY
+                if len(day) == 0:
+                    continue
+                first = np.flatnonzero(np.concatenate(([True], day[1:] != day[:-1])))
+                last = np.concatenate((first[1:], [len(day)])) - 1
+                days.append(day[first])
+                lasts.append(self.starts[k] + last)
+                rows['open'].append(cols['open'][first])
+                rows['high'].append(np.maximum.reduceat(cols['high'], first))
+                rows['low'].append(np.minimum.reduceat(cols['low'], first))
+                rows['close'].append(cols['close'][last])
+                rows['volume'].append(np.add.reduceat(cols['volume'], first))
+            index = pd.DatetimeIndex((np.concatenate(days) * NS_PER_DAY).view('datetime64[ns]'), name='date')
+            self._daily = pd.DataFrame({name: np.concatenate(parts) for name, parts in rows.items()}, index=index)
+            self.day_last = np.concatenate(lasts).astype(np.int64)
+        return self._daily
+
+
+def open_minute_stores(root, symbols=("US.QQQ", "US.TQQQ"), bar_type=BarType.M1, max_chunks=2):
+    """{symbol: MinuteBars} for a store written by write_minute_store."""
+    return {symbol: MinuteBars(root, symbol, bar_type, max_chunks) for symbol in symbols}
+
+
+class MinuteContext(MockContext):
+    """
+    MockContext over intraday bars. The cursor is a global bar index into the
+    minute stores, so fills, limits and NAV use the current bar, while the
+    portfolio history keeps one row per day, written at each day's last bar.
+    Daily requests (bar_type=BarType.D1, vol()) read daily bars derived from
+    the same stores and see completed days only: on a day's last bar that is
+    exactly what a daily run sees at its close, earlier in the day the day before.
+    """
+
+    def __init__(self, stores, initial_capital=100000.0, commission_rate=0.0005, slippage=0.0005,
+                 indicator_cache=None, fill_timing='close', events=None):
+        # stores: {symbol: MinuteBars}, "US.QQQ" and "US.TQQQ" first, one bar type, same timestamps
+        symbols = list(stores)
+        if symbols[:2] != ["US.QQQ", "US.TQQQ"]:
+            raise ValueError(f"stores must start with US.QQQ and US.TQQQ, got {symbols}")
+        ref = stores["US.QQQ"]
+        for symbol, store in stores.items():
+            if store.bar_type is not ref.bar_type or not np.array_equal(store.starts, ref.starts):
+                raise ValueError(f"{symbol} minute store is not aligned with US.QQQ")
+        daily = {symbol: store.daily() for symbol, store in stores.items()}
+        df_qqq, df_tqqq = daily.pop("US.QQQ"), daily.pop("US.TQQQ")
+        registry = build_registry(df_qqq, df_tqqq, daily)
+        super().__init__(df_qqq, df_tqqq, initial_capital, commission_rate, slippage,
+                         indicator_cache=indicator_cache, registry=registry, fill_timing=fill_timing,
+                         events=events)
+        # Data-only daily context, kept on the last completed day
+        self.daily_view = MockContext(df_qqq, df_tqqq, indicator_cache=self.indicator_cache, registry=registry)
+        self.registry = SymbolRegistry()
+        for symbol, store in stores.items():
+            self.registry.register(symbol, store)
+        self.bars_qqq, self.bars_tqqq = self.registry.bars[0], self.registry.bars[1]
+        self.stores = self.registry.bars
+        self.bar_type = ref.bar_type
+        self.n_bars = ref.length
+        self.day_last = ref.day_last
+        # Day of the cursor bar, and the last day completed at it (-1 before the first close)
+        self.day = None
+        self.completed_day = -1
+
+    def advance(self, cursor):
+        self.cursor = cursor
+        self.current_date = pd.Timestamp(self.stores[0].timestamp(cursor))
+        self._snapshot = None
+        day = self.day
+        if day is None or cursor > self.day_last[day] or (day > 0 and cursor <= self.day_last[day - 1]):
+            day = self.day = int(np.searchsorted(self.day_last, cursor))
+        completed = day if cursor == self.day_last[day] else day - 1
+        if completed != self.completed_day:
+            self.completed_day = completed
+            if completed >= 0:
+                self.daily_view.advance(completed)
+            else:
+                self.daily_view.cursor = None
+
+    def is_day_close(self):
+        return self.cursor == self.day_last[self.day]
+
+    def closes_at(self, i):
+        return np.array([np.nan if v is None else v for v in (bars.value('close', i) for bars in self.stores)])
+
+    def _check_bar_type(self, bar_type):
+        if bar_type is not self.bar_type:
+            raise ValueError(f"{bar_type.name} bars requested in a {self.bar_type.name} run")
+
+    def get_price(self, symbol, field='close', offset=0, bar_type=None):
+        # bar_type=None (internal callers, max_qty_to_buy_on_cash) means the run's own bars
+        if bar_type is BarType.D1:
+            return self.daily_view.get_price(symbol, field, offset)
+        if bar_type is not None:
+            self._check_bar_type(bar_type)
+        return super().get_price(symbol, field, offset)
+
+    def get_window(self, symbol, field, length, select=1, bar_type=None):
+        if bar_type is BarType.D1:
+            return self.daily_view.get_window(symbol, field, length, select)
+        if bar_type is not None:
+            self._check_bar_type(bar_type)
+        return super().get_window(symbol, field, length, select)
+
+    def get_indicator(self, symbol, field, name, period):
+        # Whole-history series are daily (VectorData); intraday values come from windows
+        return self.daily_view.get_indicator(symbol, field, name, period)
+
+    def get_indicator_value(self, symbol, field, name, period, select=1, bar_type=None):
+        if bar_type is BarType.D1:
+            return self.daily_view.get_indicator_value(symbol, field, name, period, select)
+        if bar_type is not None:
+            self._check_bar_type(bar_type)
+        length = period + 1 if name in RETURN_INDICATORS else period
+        window = self.get_window(symbol, field, length, select)
+        if window is None or len(window) == 0:
+            return None
+        val = INDICATORS[name](window, period)[-1]
+        if np.isnan(val):
+            return None
+        return float(val)
+
+    def day_order_expiry(self):
+        # DAY limits live until the close of the session they first rest in
+        day = min(int(np.searchsorted(self.day_last, self.cursor + 1)), len(self.day_last) - 1)
+        return int(self.day_last[day])
+
+    def record_bar(self, day):
+        """Write day's portfolio row, valued at the cursor bar (the day's last)."""
+        self._write_history(day, self.market_values().tolist())
+
+    def bar_dates(self, bars):
+        return self.stores[0].timestamps(bars)
+
+    def mapped_chunks(self):
+        # Chunks currently mapped per symbol, for checking the paging bound
+        return {bars.symbol: bars.mapped_chunks for bars in self.stores}
+
+
+def synthetic_intraday(df, bars_per_day=78, session_open="09:30", bar_minutes=5):
+    """
+    Intraday bars consistent with daily OHLCV: each day walks linearly from
+    the open to the low and high (low first on up days) and on to the close,
+    so the derived daily bars reproduce df (bars_per_day must be a multiple
+    of 3 to hit both extremes). For exercising the intraday path with only
+    daily data at hand; not a market model.
+    """
+    n = len(df)
+    legs = np.linspace(0.0, 3.0, bars_per_day + 1)[1:]
+    up = (df['close'] >= df['open']).to_numpy()
+    o, h, l, c = (df[name].to_numpy(dtype=np.float64) for name in ('open', 'high', 'low', 'close'))
+    first = np.where(up, l, h)[:, None]
+    second = np.where(up, h, l)[:, None]
+    seg = np.minimum(legs.astype(int), 2)
+    frac = legs - seg
+    starts = np.stack([o, first[:, 0], second[:, 0]], axis=1)[:, seg]
+    ends = np.stack([first[:, 0], second[:, 0], c], axis=1)[:, seg]
+    closes = starts + (ends - starts) * frac
+    # Snap the leg ends so the day's extremes and close are hit exactly
+    closes[:, np.flatnonzero(np.isclose(legs, 1.0))] = first
+    closes[:, np.flatnonzero(np.isclose(legs, 2.0))] = second
+    closes[:, -1] = c
+    opens = np.concatenate([o[:, None], closes[:, :-1]], axis=1)
+    offsets = pd.to_timedelta(session_open + ":00") + pd.to_timedelta(np.arange(bars_per_day) * bar_minutes, unit='min')
+    index = (df.index.normalize().values[:, None] + offsets.values[None, :]).ravel()
+    volume = np.repeat(df['volume'].to_numpy(dtype=np.float64) / bars_per_day, bars_per_day)
+    return pd.DataFrame({
+        'open': opens.ravel(), 'high': np.maximum(opens, closes).ravel(), 'low': np.minimum(opens, closes).ravel(),
+        'close': closes.ravel(), 'volume': volume,
+    }, index=pd.DatetimeIndex(index, name='date'))
+
+
+def check_minute_store(qqq_path, tqqq_path, strategy_path=None, start_date="2023-01-01", bar_type=BarType.M5,
+                       max_chunks=2):
+    """
+    Write synthetic intraday bars for the daily data from start_date on and
+    assert: the derived daily bars equal the daily data, daily reads on each
+    day's last bar equal a daily context's (and the day before's earlier on),
+    and no more than max_chunks chunks per symbol are ever mapped. With
+    strategy_path, also run it end to end in intraday mode.
+    """
+    import tempfile
+    from data_loader import load_and_clean_data
+    from mock_api import Contract, use_context, bar_close, ma, rsi, vol
+
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    df_qqq, df_tqqq = df_qqq.loc[start_date:], df_tqqq.loc[start_date:]
+    per_day = 390 // INTRADAY_MINUTES[bar_type]
+    with tempfile.TemporaryDirectory() as root:
+        write_minute_store(root, {"US.QQQ": synthetic_intraday(df_qqq, per_day, bar_minutes=INTRADAY_MINUTES[bar_type]),
+                                  "US.TQQQ": synthetic_intraday(df_tqqq, per_day, bar_minutes=INTRADAY_MINUTES[bar_type])},
+                           bar_type)
+        stores = open_minute_stores(root, bar_type=bar_type, max_chunks=max_chunks)
+        for store, df in zip(stores.values(), (df_qqq, df_tqqq)):
+            derived = store.daily()
+            assert (derived.index == df.index.normalize()).all(), "derived days differ"
+            for name in ('open', 'high', 'low', 'close'):
+                assert np.array_equal(derived[name].to_numpy(), df[name].to_numpy(dtype=np.float64)), name
+            assert np.allclose(derived['volume'].to_numpy(), df['volume'].to_numpy(dtype=np.float64))
+
+        ctx = MinuteContext(stores)
+        daily = MockContext(df_qqq, df_tqqq)
+        qqq = Contract("US.QQQ")
+        probes = (lambda: bar_close(qqq, BarType.D1, 1, None), lambda: ma(qqq, 20, BarType.D1, None, 1, None),
+                  lambda: rsi(qqq, 14, BarType.D1, None, 2, None), lambda: vol(qqq, 20))
+        for i in range(ctx.n_bars):
+            ctx.advance(i)
+            with use_context(ctx):
+                seen = [probe() for probe in probes]
+            if ctx.completed_day >= 0:
+                daily.advance(ctx.completed_day)
+                with use_context(daily):
+                    expected = [probe() for probe in probes]
+                assert seen == expected, f"daily reads differ at {ctx.current_date}"
+            else:
+                assert seen[0] is None
+            assert max(ctx.mapped_chunks().values()) <= max_chunks
+        # Intraday reads are the current bar
+        with use_context(ctx):
+            assert bar_close(qqq, bar_type, 1, None) == df_qqq['close'].iloc[-1]
+
+        if strategy_path:
+            from engine import load_strategy_class, run_minute_strategy
+            df, ctx = run_minute_strategy(stores, load_strategy_class(strategy_path), return_context=True)
+            assert len(df) == len(df_qqq) and (df.index == df_qqq.index.normalize()).all()
+            assert max(ctx.mapped_chunks().values()) <= max_chunks
+            return df, ctx
+    return True
+
+
+if __name__ == "__main__":
+    import logging
+    import time
+    import engine  # configures logging; quieten the exec'd strategy's per-bar prints
+    logging.getLogger().setLevel(logging.WARNING)
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    check_minute_store(qqq_path, tqqq_path)
+    print("Minute store OK: derived daily bars and daily reads match, paging bounded")
+    t0 = time.perf_counter()
+    df, ctx = check_minute_store(qqq_path, tqqq_path, os.path.join(base_dir, "code", "tqqq.py"))
+    print(f"Intraday run OK: tqqq.py on {ctx.n_bars} {ctx.bar_type.name} bars in {time.perf_counter() - t0:.1f}s, "
+          f"final value {df['total_value'].iloc[-1]:.2f}, {ctx.n_orders} orders")
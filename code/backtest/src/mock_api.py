@@ -1,11 +1,17 @@
 
+import heapq
 import math
 import logging
+import contextvars
+from contextlib import contextmanager
 from enum import Enum, auto
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 import pandas as pd
 import numpy as np
+from indicators import INDICATORS
+from bar_store import BarStore
+from events import EventRecorder, PRINT
 
 # --- Enums ---
 class AlgoStrategyType(Enum):
@@ -13,6 +19,8 @@ class AlgoStrategyType(Enum):
 
 class BarType(Enum):
     D1 = auto()
+    M1 = auto()
+    M5 = auto()
 
 class DataType(Enum):
     CLOSE = auto()
@@ -38,6 +46,7 @@ class OrdType(Enum):
 
 class TimeInForce(Enum):
     DAY = auto()
+    GTC = auto()
 
 class THType(Enum):
     RTH = auto()
@@ -77,8 +86,154 @@ class Order:
     status: OrderStatus
     timestamp: pd.Timestamp
 
+@dataclass
+class AccountSnapshot:
+    """Account state at one bar, between fills. Missing closes value a position at 0."""
+    cursor: Optional[int]
+    cash: float
+    prices: np.ndarray  # close per symbol id (NaN if missing)
+    market_values: List[float]  # per symbol id
+    nav: float
+
+# Columnar layouts for the preallocated portfolio history and order ledger.
+# History columns depend on the registered symbols, see history_dtype().
+ORDER_DTYPE = np.dtype([
+    ('order_id', 'i8'), ('bar', 'i8'), ('symbol', 'i8'), ('qty', 'i8'),
+    ('side', 'i1'), ('price', 'f8'), ('status', 'i1'),
+])
+SIDE_CODES = {OrderSide.BUY: 1, OrderSide.SELL: -1}
+SIDES_BY_CODE = {code: side for side, code in SIDE_CODES.items()}
+# When a place_market order fills: at the close of the bar it was placed on
+# (handle_data runs at the close), at the next bar's open, or at the next bar's close
+FILL_TIMINGS = ('close', 'next_open', 'next_close')
+
+def history_dtype(symbols):
+    # total_value, cash, <ticker>_val..., <ticker>_qty... (QQQ/TQQQ -> the original column order)
+    tickers = [sym.split('.')[-1].lower() for sym in symbols]
+    return np.dtype([('total_value', 'f8'), ('cash', 'f8')]
+                    + [(f'{t}_val', 'f8') for t in tickers]
+                    + [(f'{t}_qty', 'i8') for t in tickers])
+
+def _frame(arr, names, index=None):
+    # DataFrame over structured array fields without copying them
+    return pd.DataFrame({n: arr[n] for n in names}, index=index, copy=False)
+
+class SymbolRegistry:
+    """
+    Symbol string -> integer id, with one BarStore per id.
+    The bare ticker ("QQQ") is registered as an alias of "US.QQQ" so plain
+    string lookups keep working; every lookup is a single dict get.
+    """
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.bars: List[BarStore] = []
+
+    def register(self, symbol, df):
+        # df: a bar frame, or a ready store with the BarStore lookups (e.g. minute_store.MinuteBars)
+        sym_str = symbol.symbol if isinstance(symbol, Contract) else symbol
+        if sym_str in self.ids:
+            raise ValueError(f"Symbol {sym_str} registered twice")
+        sid = len(self.symbols)
+        self.symbols.append(sym_str)
+        self.bars.append(BarStore(df) if isinstance(df, pd.DataFrame) else df)
+        self.ids[sym_str] = sid
+        self.ids.setdefault(sym_str.split('.')[-1], sid)
+        return sid
+
+    def id_of(self, symbol):
+        # Contract or symbol string -> id, None if unknown
+        return self.ids.get(symbol.symbol if isinstance(symbol, Contract) else symbol)
+
+    def __len__(self):
+        return len(self.symbols)
+
+def affordable_qty(cash, price, slippage, commission_rate):
+    """
+    Most whole shares `cash` buys at close `price` under the MockContext fill
+    model (price + slippage, max(1 USD, value * rate) commission).
+    Works elementwise on arrays; returns 0 where nothing is affordable.
+    """
+    exec_price = price * (1 + slippage)
+    if isinstance(cash, float) and isinstance(price, float):
+        # Scalar fast path (one call per order), same arithmetic as below
+        if not price > 0 or cash <= 1.0:
+            return 0
+        qty = min(math.floor(cash / (exec_price * (1 + commission_rate))), math.floor((cash - 1.0) / exec_price))
+        value = exec_price * qty
+        if qty > 0 and value + max(1.0, value * commission_rate) > cash:
+            qty -= 1
+        return max(qty, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qty = np.minimum(np.floor(cash / (exec_price * (1 + commission_rate))), np.floor((cash - 1.0) / exec_price))
+    qty = np.where((price > 0) & (qty > 0), qty, 0.0)
+    # Float rounding can leave the cost a hair over cash; one share back fixes it
+    value = exec_price * qty
+    return np.where(value + np.maximum(1.0, value * commission_rate) > cash, np.maximum(qty - 1, 0.0), qty)
+
+def build_registry(df_qqq, df_tqqq, extra_symbols=None):
+    """Registry with QQQ, TQQQ and then extra_symbols ({symbol string: frame}) in order."""
+    registry = SymbolRegistry()
+    registry.register("US.QQQ", df_qqq)
+    registry.register("US.TQQQ", df_tqqq)
+    for sym_str, df in (extra_symbols or {}).items():
+        if len(df) != len(df_qqq):
+            raise ValueError(f"{sym_str} is not aligned with the QQQ/TQQQ dates")
+        registry.register(sym_str, df)
+    return registry
+
+class PositionBook:
+    """dict-style view of MockContext.qty keyed by symbol string (the old ctx.positions API)."""
+    def __init__(self, registry, qty):
+        self.registry = registry
+        self.qty = qty
+
+    def __getitem__(self, symbol):
+        sid = self.registry.id_of(symbol)
+        if sid is None:
+            raise KeyError(symbol)
+        return int(self.qty[sid])
+
+    def __setitem__(self, symbol, value):
+        sid = self.registry.id_of(symbol)
+        if sid is None:
+            raise KeyError(symbol)
+        self.qty[sid] = value
+
+    def get(self, symbol, default=0):
+        sid = self.registry.id_of(symbol)
+        return default if sid is None else int(self.qty[sid])
+
+    def __contains__(self, symbol):
+        return self.registry.id_of(symbol) is not None
+
+    def __iter__(self):
+        return iter(self.registry.symbols)
+
+    def __len__(self):
+        return len(self.registry)
+
+    def keys(self):
+        return list(self.registry.symbols)
+
+    def items(self):
+        return [(sym, int(q)) for sym, q in zip(self.registry.symbols, self.qty)]
+
+    def update(self, other):
+        for symbol, value in dict(other).items():
+            self[symbol] = value
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
 class MockContext:
-    def __init__(self, df_qqq, df_tqqq, initial_capital=100000.0, commission_rate=0.0005, slippage=0.0005):
+    def __init__(self, df_qqq, df_tqqq, initial_capital=100000.0, commission_rate=0.0005, slippage=0.0005,
+                 indicator_cache=None, extra_symbols=None, registry=None, fill_timing='close', events=None):
+        # extra_symbols: optional {symbol string: frame} (e.g. {"US.SQQQ": df}) on the same dates
+        # registry: optional SymbolRegistry already built on these frames; accounts run in
+        # lockstep share one so every context reads the same bar stores
+        # events: EventRecorder for the strategy's prints and per-bar errors; the default
+        # echoes them to logging at the root logger's level
         self.df_qqq = df_qqq
         self.df_tqqq = df_tqqq
         self.initial_capital = initial_capital
@@ -86,82 +241,424 @@ class MockContext:
         self.commission_rate = commission_rate
         self.slippage = slippage  # Percentage slippage
         self.current_date = None
-        self.positions: Dict[str, int] = {"US.QQQ": 0, "US.TQQQ": 0}
-        self.orders: List[Order] = []
+        # Integer bar cursor into the aligned bar stores; advanced by the engine loop
+        self.cursor = None
+        self.dates = df_qqq.index
+        if registry is None:
+            registry = build_registry(df_qqq, df_tqqq, extra_symbols)
+        self.registry = registry
+        self.symbols = self.registry.symbols
+        self.bars_qqq, self.bars_tqqq = self.registry.bars[0], self.registry.bars[1]
+        # Closes laid out bar-major, so one row values every symbol at a bar
+        self.closes_by_bar = np.ascontiguousarray(np.stack([b.column('close') for b in self.registry.bars], axis=1))
+        # Share counts by symbol id; positions is the dict-style view over them
+        self.qty = np.zeros(len(self.registry), dtype=np.int64)
+        self.positions = PositionBook(self.registry, self.qty)
+        n_bars = len(self.dates)
+        # One history row per bar, written in place by record_bar(); rows
+        # [history_start, history_end) are the ones a run has filled.
+        self.history_dtype = history_dtype(self.symbols)
+        self.history = np.zeros(n_bars, dtype=self.history_dtype)
+        self.history_start = None
+        self.history_end = None
+        # Fills go into a preallocated ledger (grown by doubling if a strategy trades more)
+        self.ledger = np.zeros(max(2 * n_bars, 16), dtype=ORDER_DTYPE)
+        self.n_orders = 0
         self.next_order_id = 1
-        self.portfolio_history = []
         self.signals_history = []
         self.last_signal = None
-
-    def get_price(self, symbol, field='close', offset=0):
+        # Memoized AccountSnapshot; cleared by advance() and by fills
+        self._snapshot = None
+        if fill_timing not in FILL_TIMINGS:
+            raise ValueError(f"fill_timing must be one of {FILL_TIMINGS}, got {fill_timing!r}")
+        self.fill_timing = fill_timing
+        # Order book. pending holds (order_id, sid, qty, side, due bar, 'open' | 'close')
+        # in submission order; the dicts below index it so status polls are O(1).
+        # booked_orders maps the ids still open to their entries: cancelled ids leave
+        # booked_orders only, and fill_pending drops their pending entries.
+        self.pending = []
+        self.booked_orders: Dict[str, tuple] = {}
+        self.order_states: Dict[str, OrderStatus] = {}
+        self.open_orders: List[Dict[str, tuple]] = [{} for _ in self.symbols]
+        self.pending_sell_qty = np.zeros(len(self.symbols), dtype=np.int64)
+        # Ids placed on bar day_bar, per symbol (reset lazily on the first order of a new bar)
+        self.day_bar = None
+        self.day_orders: List[List[str]] = [[] for _ in self.symbols]
+        # Resting limit orders: order_id -> (sid, qty, side, limit price), plus per-symbol
+        # heaps of (key, seq, order_id) with the best price on top (buys keyed by -price).
+        # Cancelled/expired ids leave limit_orders only; their heap entries are skipped when popped.
+        self.limit_orders: Dict[str, tuple] = {}
+        self.limit_heaps = [([], []) for _ in self.symbols]
+        self.stale_limits = 0
+        # bar -> ids of DAY limits that expire after matching on that bar
+        self.limit_expiry: Dict[int, List[str]] = {}
+        # Bar a checkpointed run resumed at (None for a run from scratch)
+        self.resumed_from = None
+        # (symbol, field, indicator, period) -> full-length array, built on first request.
+        # Runs over the same frames may pass in one dict to share it.
+        self.indicator_cache: Dict[tuple, np.ndarray] = {} if indicator_cache is None else indicator_cache
+        self.events = EventRecorder(echo=True) if events is None else events
+
+    def advance(self, cursor):
+        # Move to bar `cursor` (same position in both aligned stores)
+        self.cursor = cursor
+        self.current_date = self.dates[cursor]
+        self._snapshot = None
+
+    def snapshot(self):
+        """
+        Prices, market values and NAV at the cursor, built once and reused
+        until the bar advances or a fill changes cash/positions.
+        """
+        snap = self._snapshot
+        if snap is None:
+            n = len(self.registry)
+            if self.cursor is None:
+                prices = np.full(n, np.nan)
+                values = [0.0] * n
+            else:
+                prices = self.closes_at(self.cursor)
+                values = [v if v == v else 0.0 for v in (self.qty * prices).tolist()]
+            nav = self.cash
+            for value in values:
+                nav += value
+            snap = AccountSnapshot(self.cursor, self.cash, prices, values, nav)
+            self._snapshot = snap
+        return snap
+
+    def closes_at(self, i):
+        # Close of every symbol at bar i, indexed by symbol id (NaN if missing)
+        return self.closes_by_bar[i]
+
+    def _get_bars(self, symbol):
+        sid = self.registry.id_of(symbol)
+        return None if sid is None else self.registry.bars[sid]
+
+    def position(self, symbol):
+        sid = self.registry.id_of(symbol)
+        return 0 if sid is None else int(self.qty[sid])
+
+    def market_values(self, i=None):
+        """Per-symbol position value at bar i (default: cursor), indexed by symbol id."""
+        return self.qty * self.closes_at(self.cursor if i is None else i)
+
+    def nav(self, i=None):
+        # Summed left to right from cash, like the original cash + qqq + tqqq, so totals stay bit-identical
+        total = self.cash
+        for value in self.market_values(i).tolist():
+            total += value
+        return total
+
+    def get_price(self, symbol, field='close', offset=0, bar_type=None):
         # symbol: Contract object or string
-        sym_str = symbol.symbol if isinstance(symbol, Contract) else symbol
-        
-        if "QQQ" in sym_str and "TQQQ" not in sym_str:
-            df = self.df_qqq
-        elif "TQQQ" in sym_str:
-            df = self.df_tqqq
-        else:
+        # Offset is backward looking (select=1 is today, select=2 is yesterday)
+        # tqqq.py logic: select=1 means current bar (most recent closed bar if backtesting on Close)
+        if bar_type is not None and bar_type is not BarType.D1:
+            _intraday_error(bar_type)
+        bars = self._get_bars(symbol)
+        if bars is None:
             return None
-        
-        # Current date index
-        try:
-            loc = df.index.get_loc(self.current_date)
-            # Offset is backward looking (select=1 is today, select=2 is yesterday)
-            # tqqq.py logic: select=1 means current bar (most recent closed bar if backtesting on Close)
-            # In backtest loop, 'current_date' is 'today'. So select=1 is today.
-            target_loc = loc - (offset - 1)
-            if target_loc < 0:
-                return None
-            
-            val = df.iloc[target_loc][field]
-            if pd.isna(val):
+        return bars.value(field, self.cursor, offset)
+
+    def get_data_slice(self, symbol, field, length):
+        bars = self._get_bars(symbol)
+        if bars is None:
+            return []
+        window = bars.window(field, self.cursor, length)
+        if window is None:
+            return []
+        # Return list
+        return window.tolist()
+
+    def get_indicator(self, symbol, field, name, period):
+        # Whole-history indicator series, computed once with vectorized rolling ops
+        sid = self.registry.id_of(symbol)
+        if sid is None:
+            return None
+        key = (self.symbols[sid], field, name, period)
+        series = self.indicator_cache.get(key)
+        if series is None:
+            bars = self.registry.bars[sid]
+            if bars.column(field) is None:
                 return None
-            return float(val)
-        except KeyError:
+            series = INDICATORS[name](bars.column(field), period)
+            self.indicator_cache[key] = series
+        return series
+
+    def get_indicator_value(self, symbol, field, name, period, select=1, bar_type=None):
+        # select=1 is the current bar, select=2 the previous one, ...
+        if bar_type is not None and bar_type is not BarType.D1:
+            _intraday_error(bar_type)
+        series = self.get_indicator(symbol, field, name, period)
+        if series is None or self.cursor is None:
             return None
-        except IndexError:
+        target_loc = self.cursor - (select - 1)
+        if target_loc < 0 or target_loc >= len(series):
             return None
-
-    def get_data_slice(self, symbol, field, length):
-        sym_str = symbol.symbol if isinstance(symbol, Contract) else symbol
-        if "QQQ" in sym_str and "TQQQ" not in sym_str:
-            df = self.df_qqq
-        elif "TQQQ" in sym_str:
-            df = self.df_tqqq
-        else:
+        val = series[target_loc]
+        if np.isnan(val):
+            return None
+        return float(val)
+
+    def get_window(self, symbol, field, length, select=1, bar_type=None):
+        # Read-only view of up to `length` bars ending at select (oldest first)
+        if bar_type is not None and bar_type is not BarType.D1:
+            _intraday_error(bar_type)
+        bars = self._get_bars(symbol)
+        if bars is None or self.cursor is None:
+            return None
+        window = bars.window(field, self.cursor - (select - 1), length)
+        if window is None:
+            return None
+        window.flags.writeable = False
+        return window
+
+    def submit_order(self, symbol, qty, side):
+        """
+        place_market entry point; returns the order id, or None if rejected.
+        With fill_timing='close' the order fills (or is rejected) right away,
+        as execute_order. Otherwise it is booked as SUBMITTED and filled by
+        fill_pending() on the next bar; it turns FAILED there if cash or
+        shares fall short.
+        """
+        sid = self.registry.id_of(symbol)
+        if sid is None or qty <= 0:
+            return None
+        if self.fill_timing == 'close':
+            oid = self.execute_order(symbol, qty, side)
+            if oid is not None:
+                self._track_order(sid, oid, OrderStatus.FILLED_ALL)
+            return oid
+        oid = str(self.next_order_id)
+        self.next_order_id += 1
+        entry = (oid, sid, qty, side, self.cursor + 1, 'open' if self.fill_timing == 'next_open' else 'close')
+        self.pending.append(entry)
+        self.booked_orders[oid] = entry
+        self.open_orders[sid][oid] = entry
+        if side == OrderSide.SELL:
+            self.pending_sell_qty[sid] += qty
+        self._track_order(sid, oid, OrderStatus.SUBMITTED)
+        return oid
+
+    def _track_order(self, sid, oid, status):
+        self.order_states[oid] = status
+        if self.day_bar != self.cursor:
+            self.day_bar = self.cursor
+            self.day_orders = [[] for _ in self.symbols]
+        self.day_orders[sid].append(oid)
+
+    def rebalance_to_weights(self, weights, min_trade=0.0):
+        """
+        Move each {symbol: weight} leg to int(NAV * weight / close) shares, all
+        sized from one snapshot. Legs whose trade is worth less than min_trade
+        are skipped; symbols not in `weights` are left alone. Sells go first
+        (capped by available_qty), then buys in the given order, each capped
+        by the cash left after the sells (with fill_timing='close') and the
+        buys before it. Returns the submitted orders as Order objects (price =
+        the close they were sized at).
+        """
+        return [Order(oid, Contract(self.symbols[sid]), qty, side, price, self.order_states[oid], self.current_date)
+                for oid, sid, qty, side, price in self._rebalance(weights, min_trade)]
+
+    def _rebalance(self, weights, min_trade):
+        # rebalance_to_weights without building Order objects: [(order_id, sid, qty, side, close)]
+        snap = self.snapshot()
+        prices = snap.prices.tolist()
+        legs = []
+        for symbol, weight in weights.items():
+            sid = self.registry.id_of(symbol)
+            price = prices[sid] if sid is not None else 0.0
+            if not price > 0:
+                continue
+            diff = int(snap.nav * weight / price) - int(self.qty[sid])
+            if diff != 0 and abs(diff) * price >= min_trade:
+                legs.append((symbol, sid, diff, price))
+        if not legs:
             return []
-            
-        try:
-            loc = df.index.get_loc(self.current_date)
-            start_loc = loc - length + 1
-            if start_loc < 0:
-                start_loc = 0
-            # Return list
-            return df.iloc[start_loc : loc + 1][field].tolist()
-        except:
+        orders = []
+        for symbol, sid, diff, price in legs:
+            if diff < 0:
+                qty = min(-diff, int(self.qty[sid] - self.pending_sell_qty[sid]))
+                if qty > 0:
+                    orders.append((self.submit_order(symbol, qty, OrderSide.SELL), sid, qty, OrderSide.SELL, price))
+        budget = self.cash
+        for symbol, sid, diff, price in legs:
+            if diff > 0:
+                qty = min(diff, affordable_qty(budget, price, self.slippage, self.commission_rate))
+                if qty > 0:
+                    value = price * (1 + self.slippage) * qty
+                    budget -= value + max(1.0, value * self.commission_rate)
+                    orders.append((self.submit_order(symbol, qty, OrderSide.BUY), sid, qty, OrderSide.BUY, price))
+        return [order for order in orders if order[0] is not None]
+
+    def submit_limit(self, symbol, qty, side, price, time_in_force=TimeInForce.DAY):
+        """
+        Rest a limit order from the next bar on; returns its id (None if rejected).
+        DAY orders that do not fill on the next bar are cancelled; GTC orders
+        rest until filled or cancelled.
+        """
+        sid = self.registry.id_of(symbol)
+        if sid is None or qty <= 0 or not price or price <= 0:
+            return None
+        oid = str(self.next_order_id)
+        self.next_order_id += 1
+        self.limit_orders[oid] = (sid, qty, side, price)
+        buys, sells = self.limit_heaps[sid]
+        if side == OrderSide.BUY:
+            heapq.heappush(buys, (-price, int(oid), oid))
+        else:
+            heapq.heappush(sells, (price, int(oid), oid))
+            self.pending_sell_qty[sid] += qty
+        self.open_orders[sid][oid] = (oid, sid, qty, side)
+        if time_in_force == TimeInForce.DAY:
+            self.limit_expiry.setdefault(self.day_order_expiry(), []).append(oid)
+        self._track_order(sid, oid, OrderStatus.SUBMITTED)
+        return oid
+
+    def day_order_expiry(self):
+        # Bar after whose matching a DAY order placed now is cancelled: the next one
+        return self.cursor + 1
+
+    def match_limits(self):
+        """
+        Fill resting limits the current bar trades through: every symbol's
+        sells first (they free cash), then every symbol's buys, each best
+        price first then oldest. A bar that opens through the limit fills at
+        the open, otherwise at the limit once the low (buys) / high (sells)
+        reaches it. No slippage; commission and cash/share checks as for
+        market orders, a failed check marks the order FAILED.
+        Each fill costs one heap pop, so resting ladders cost O(log n) per fill.
+        """
+        quotes = []
+        for sid, (buys, sells) in enumerate(self.limit_heaps):
+            if not buys and not sells:
+                continue
+            bars = self.registry.bars[sid]
+            bar_open = bars.value('open', self.cursor, 1)
+            high = bars.value('high', self.cursor, 1)
+            low = bars.value('low', self.cursor, 1)
+            if bar_open is None or high is None or low is None:
+                continue
+            quotes.append((buys, sells, bar_open, high, low))
+        for _, sells, bar_open, high, _ in quotes:
+            while sells:
+                price, _, oid = sells[0]
+                if oid not in self.limit_orders:
+                    heapq.heappop(sells)
+                    continue
+                if high < price:
+                    break
+                heapq.heappop(sells)
+                self._fill_limit(oid, bar_open if bar_open >= price else price)
+        for buys, _, bar_open, _, low in quotes:
+            while buys:
+                neg_price, _, oid = buys[0]
+                if oid not in self.limit_orders:
+                    heapq.heappop(buys)
+                    continue
+                if low > -neg_price:
+                    break
+                heapq.heappop(buys)
+                self._fill_limit(oid, bar_open if bar_open <= -neg_price else -neg_price)
+        for oid in self.limit_expiry.pop(self.cursor, ()):
+            if oid in self.limit_orders:
+                self._close_limit(oid, OrderStatus.CANCELLED_ALL)
+        # Cancelled ids below the tops never surface; rebuild once they outnumber live ones
+        if self.stale_limits > 64 + len(self.limit_orders):
+            self.limit_heaps = [([e for e in buys if e[2] in self.limit_orders],
+                                 [e for e in sells if e[2] in self.limit_orders])
+                                for buys, sells in self.limit_heaps]
+            for buys, sells in self.limit_heaps:
+                heapq.heapify(buys)
+                heapq.heapify(sells)
+            self.stale_limits = 0
+
+    def _fill_limit(self, oid, price):
+        sid, qty, side, _ = self.limit_orders[oid]
+        filled = self._fill(sid, qty, side, price, int(oid), slippage=False)
+        self._close_limit(oid, OrderStatus.FILLED_ALL if filled else OrderStatus.FAILED)
+
+    def _close_limit(self, oid, status):
+        sid, qty, side, _ = self.limit_orders.pop(oid)
+        if status == OrderStatus.CANCELLED_ALL:
+            self.stale_limits += 1
+        self.order_states[oid] = status
+        del self.open_orders[sid][oid]
+        if side == OrderSide.SELL:
+            self.pending_sell_qty[sid] -= qty
+
+    def cancel_order(self, oid):
+        """Cancel an open limit or booked market order; False if it is no longer open."""
+        oid = str(oid)
+        if oid in self.limit_orders:
+            self._close_limit(oid, OrderStatus.CANCELLED_ALL)
+            return True
+        entry = self.booked_orders.pop(oid, None)
+        if entry is None:
+            return False
+        _, sid, qty, side = entry[:4]
+        del self.open_orders[sid][oid]
+        if side == OrderSide.SELL:
+            self.pending_sell_qty[sid] -= qty
+        self.order_states[oid] = OrderStatus.CANCELLED_ALL
+        return True
+
+    def fill_pending(self, stage):
+        """Fill booked orders due at this bar's 'open' or 'close' at that price."""
+        keep = []
+        for entry in self.pending:
+            oid, sid, qty, side, due, when = entry
+            if oid not in self.booked_orders:
+                continue  # cancelled
+            if when != stage or due > self.cursor:
+                keep.append(entry)
+                continue
+            del self.booked_orders[oid]
+            price = self.registry.bars[sid].value(stage, self.cursor, 1)
+            filled = price is not None and price > 0 and self._fill(sid, qty, side, price, int(oid))
+            self.order_states[oid] = OrderStatus.FILLED_ALL if filled else OrderStatus.FAILED
+            del self.open_orders[sid][oid]
+            if side == OrderSide.SELL:
+                self.pending_sell_qty[sid] -= qty
+        self.pending = keep
+
+    def order_ids(self, symbol, statuses=None):
+        """Ids of the symbol's open orders and of those placed this bar, newest first."""
+        sid = self.registry.id_of(symbol)
+        if sid is None:
             return []
+        today = self.day_orders[sid] if self.day_bar == self.cursor else ()
+        ids = dict.fromkeys(reversed(today))
+        ids.update(dict.fromkeys(reversed(self.open_orders[sid])))
+        if statuses:
+            return [oid for oid in ids if self.order_states[oid] in statuses]
+        return list(ids)
+
+    def available_qty(self, symbol):
+        # Shares not already committed to open sell orders
+        sid = self.registry.id_of(symbol)
+        return 0 if sid is None else int(self.qty[sid] - self.pending_sell_qty[sid])
 
     def execute_order(self, symbol, qty, side):
-        sym_str = symbol.symbol
-        price = self.get_price(symbol, 'open', 1) # Executing at Open of *current* bar?
-        # Actually, tqqq.py places market orders. In backtest, we usually execute at Close of current bar or Open of NEXT bar.
-        # Since tqqq.py logic runs 'handle_data', usually meant for 'on_bar_close' or periodic check.
-        # If it runs at close, market orders fill at close (or next open).
-        # Let's assume fills at CLOSE of current bar for simplicity in daily bars, or NEXT OPEN.
-        # Given T+1 logic:
-        # Day T: Signal -> Sell. (Executes today? Or tomorrow?)
-        # tqqq.py says: "place_market".
-        # If running daily after close, order fills next open.
-        # If running daily before close, order fills close.
-        # Let's assume fills at CLOSE price of current day (simulating MOC or immediate execution).
-        price = self.get_price(symbol, 'close', 1)
+        """
+        Fill at the close of the current bar (handle_data runs at the close);
+        returns the order id, or None if there is no price or the cash/shares
+        check fails.
+        """
+        sid = self.registry.id_of(symbol)
+        price = None if sid is None else self.registry.bars[sid].value('close', self.cursor, 1)
         
         if price is None or price <= 0:
-            return
-        
-        # Apply slippage
-        if side == OrderSide.BUY:
+            return None
+        if self._fill(sid, qty, side, price):
+            return str(self.next_order_id - 1)
+        return None
+
+    def _fill(self, sid, qty, side, price, order_id=None, slippage=True):
+        # Apply slippage (limit orders fill at their own price)
+        if not slippage:
+            exec_price = price
+        elif side == OrderSide.BUY:
             exec_price = price * (1 + self.slippage)
         else:
             exec_price = price * (1 - self.slippage)
@@ -174,41 +671,118 @@ class MockContext:
             cost = value + commission
             if self.cash >= cost:
                 self.cash -= cost
-                self.positions[sym_str] += qty
-                self.orders.append(Order(str(self.next_order_id), symbol, qty, side, exec_price, OrderStatus.FILLED_ALL, self.current_date))
-                self.next_order_id += 1
-            else:
-                # Adjust qty if not enough cash? tqqq.py has 'max_qty_to_buy_on_cash' logic, but here we execute what's passed
-                pass
+                self.qty[sid] += qty
+                self._record_fill(sid, qty, side, exec_price, order_id)
+                return True
+            # Not enough cash: rejected (sizing is the strategy's job, cf. max_qty_to_buy_on_cash)
         elif side == OrderSide.SELL:
             revenue = value - commission
-            if self.positions[sym_str] >= qty:
-                self.positions[sym_str] -= qty
+            if self.qty[sid] >= qty:
+                self.qty[sid] -= qty
                 self.cash += revenue
-                self.orders.append(Order(str(self.next_order_id), symbol, qty, side, exec_price, OrderStatus.FILLED_ALL, self.current_date))
-                self.next_order_id += 1
+                self._record_fill(sid, qty, side, exec_price, order_id)
+                return True
+        return False
+
+    def _record_fill(self, sid, qty, side, exec_price, order_id=None):
+        # order_id: id given at submission to a booked order; immediate fills take the next id
+        self._snapshot = None
+        if self.n_orders == len(self.ledger):
+            self.ledger = np.concatenate([self.ledger, np.zeros(len(self.ledger), dtype=ORDER_DTYPE)])
+        if order_id is None:
+            order_id = self.next_order_id
+            self.next_order_id += 1
+        self.ledger[self.n_orders] = (order_id, self.cursor, sid, qty,
+                                      SIDE_CODES[side], exec_price, OrderStatus.FILLED_ALL.value)
+        self.n_orders += 1
+
+    def record_bar(self, i):
+        """Write the end-of-day portfolio row for bar i into the history array."""
+        self._write_history(i, self.market_values(i).tolist())
+
+    def _write_history(self, i, values):
+        total = self.cash
+        for value in values:
+            total += value
+        self.history[i] = (total, self.cash, *values, *self.qty.tolist())
+        if self.history_start is None:
+            self.history_start = i
+        self.history_end = i + 1
 
     def update_portfolio(self):
-        val_qqq = self.positions["US.QQQ"] * (self.get_price("US.QQQ", 'close', 1) or 0)
-        val_tqqq = self.positions["US.TQQQ"] * (self.get_price("US.TQQQ", 'close', 1) or 0)
-        total_value = self.cash + val_qqq + val_tqqq
-        self.portfolio_history.append({
-            'date': self.current_date,
-            'cash': self.cash,
-            'qqq_val': val_qqq,
-            'tqqq_val': val_tqqq,
-            'total_value': total_value,
-            'qqq_qty': self.positions["US.QQQ"],
-            'tqqq_qty': self.positions["US.TQQQ"]
-        })
-
-# --- Global API Mocks ---
-# These will be injected into the strategy namespace
-context: MockContext = None
+        self.record_bar(self.cursor)
+
+    def history_frame(self):
+        """Filled history rows as a DataFrame indexed by date; columns are views on self.history."""
+        if self.history_start is None:
+            return _frame(self.history[:0], self.history_dtype.names, pd.Index([], name='date'))
+        rows = self.history[self.history_start:self.history_end]
+        index = self.dates[self.history_start:self.history_end].rename('date')
+        return _frame(rows, self.history_dtype.names, index)
+
+    @property
+    def portfolio_history(self):
+        return self.history_frame()
+
+    def orders_frame(self):
+        """
+        Order ledger as a DataFrame. Numeric columns are views on self.ledger;
+        date/symbol/side are decoded from the bar, symbol id and side code.
+        """
+        rows = self.ledger[:self.n_orders]
+        df = _frame(rows, ('order_id', 'bar', 'qty', 'price'))
+        df.insert(1, 'date', self.bar_dates(rows['bar']))
+        df.insert(2, 'symbol', np.array(self.symbols, dtype=object)[rows['symbol']])
+        df['side'] = np.where(rows['side'] > 0, OrderSide.BUY.name, OrderSide.SELL.name)
+        return df
+
+    @property
+    def orders(self) -> List[Order]:
+        # Order objects materialized from the ledger, for callers of the old list API
+        rows = self.ledger[:self.n_orders]
+        dates = self.bar_dates(rows['bar'])
+        return [
+            Order(str(r['order_id']), Contract(self.symbols[r['symbol']]), int(r['qty']),
+                  SIDES_BY_CODE[int(r['side'])], float(r['price']), OrderStatus(int(r['status'])),
+                  date)
+            for r, date in zip(rows, dates)
+        ]
+
+    def bar_dates(self, bars):
+        # Timestamps of ledger bar indices
+        return self.dates[bars]
+
+# --- API Mocks ---
+# These will be injected into the strategy namespace. Each call reads the
+# MockContext of the current run from a context variable, so runs in other
+# threads (or one after another) never see each other's account.
+_current_context: contextvars.ContextVar = contextvars.ContextVar('mock_context', default=None)
 
 def set_context(ctx):
-    global context
-    context = ctx
+    _current_context.set(ctx)
+
+def get_context():
+    return _current_context.get()
+
+@contextmanager
+def use_context(ctx):
+    """Bind `ctx` to the mock API for the duration of the with-block."""
+    token = _current_context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current_context.reset(token)
+
+def _intraday_error(bar_type):
+    raise ValueError(f"{bar_type.name} bars need an intraday run on a minute store (minute_store.MinuteContext)")
+
+def strategy_print(*args):
+    # The strategy's print(): recorded unformatted on the run's EventRecorder
+    ctx = _current_context.get()
+    if ctx is None:
+        logging.info(' '.join(['%s'] * len(args)), *args)
+    else:
+        ctx.events.record(ctx.cursor, PRINT, args)
 
 def declare_strategy_type(type): pass
 def declare_trig_symbol(): pass
@@ -217,117 +791,98 @@ def alert(title, content):
     pass
 
 def bar_close(symbol, bar_type, select, session_type):
-    return context.get_price(symbol, 'close', select)
+    return _current_context.get().get_price(symbol, 'close', select, bar_type)
 
 def bar_open(symbol, bar_type, select, session_type):
-    return context.get_price(symbol, 'open', select)
+    return _current_context.get().get_price(symbol, 'open', select, bar_type)
 
 def bar_high(symbol, bar_type, select, session_type):
-    return context.get_price(symbol, 'high', select)
+    return _current_context.get().get_price(symbol, 'high', select, bar_type)
 
 def bar_volume(symbol, bar_type, select, session_type):
-    return context.get_price(symbol, 'volume', select)
+    return _current_context.get().get_price(symbol, 'volume', select, bar_type)
 
 def ma(symbol, period, bar_type, data_type, select, session_type):
-    # Calculate MA on the fly or using rolling window
     # select=1 means current bar. window=period.
-    # Need history of length (period + select - 1)
-    data = context.get_data_slice(symbol, 'close', period + select - 1)
-    if len(data) < period:
-        return None
-    # If select=1, use last 'period' items
-    # If select=2, use items from -(period+1) to -1
-    end_idx = len(data) - (select - 1)
-    start_idx = end_idx - period
-    if start_idx < 0:
-        return None
-    
-    subset = data[start_idx:end_idx]
-    if not subset:
-        return None
-    return sum(subset) / len(subset)
+    return _current_context.get().get_indicator_value(symbol, 'close', 'ma', period, select, bar_type)
 
 def rsi(symbol, period, bar_type, data_type, select, session_type):
-    # RSI implementation
-    # Need period + select + lookback for calculation
-    # Standard RSI requires previous average gain/loss, which implies recursive calc or long history
-    # Simple approximation using rolling window
-    lookback = period * 5 # Get enough data
-    data = context.get_data_slice(symbol, 'close', lookback + select)
-    if not data or len(data) < period + 1:
+    # Simple rolling-mean RSI; neutral 50 until enough history is available
+    val = _current_context.get().get_indicator_value(symbol, 'close', 'rsi', period, select, bar_type)
+    if val is None:
         return 50.0 # Default neutral
-    
-    # Trim to relevant end
-    end_idx = len(data) - (select - 1)
-    if end_idx < period + 1:
-        return 50.0
-        
-    prices = data[:end_idx]
-    # We need to calculate RSI for the last point
-    # Use pandas for efficiency if possible, but data is list
-    # Convert to series
-    s = pd.Series(prices)
-    delta = s.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    
-    rs = gain / loss
-    rsi_val = 100 - (100 / (1 + rs))
-    
-    val = rsi_val.iloc[-1]
-    if np.isnan(val):
-        return 50.0
-    return float(val)
+    return val
 
 def vol(symbol, period, select=1):
-    # Annualized Volatility
+    # Annualized Volatility of daily returns
     # select=1 means current window
-    data = context.get_data_slice(symbol, 'close', period + select)
-    if not data or len(data) < period + 1:
-        return 0.0
-        
-    end_idx = len(data) - (select - 1)
-    prices = data[:end_idx]
-    s = pd.Series(prices)
-    ret = s.pct_change().dropna()
-    # Take last 'period' returns
-    if len(ret) < period:
+    val = _current_context.get().get_indicator_value(symbol, 'close', 'vol', period, select, BarType.D1)
+    if val is None:
         return 0.0
-    
-    ret_window = ret.tail(period)
-    # Annualize
-    return float(ret_window.std() * np.sqrt(252))
+    return val
+
+
+# Bar fields addressed by DataType in the window APIs
+DATA_FIELDS = {
+    DataType.CLOSE: 'close',
+    DataType.OPEN: 'open',
+    DataType.HIGH: 'high',
+    DataType.LOW: 'low',
+    DataType.VOLUME: 'volume',
+}
+
+def bar_history(symbol, period, bar_type, data_type=DataType.CLOSE, select=1, session_type=None):
+    # NumPy window of the last `period` bars ending at select, oldest first; read-only, no copy
+    return _current_context.get().get_window(symbol, DATA_FIELDS[data_type], period, select, bar_type)
+
+def highest(symbol, period, bar_type, data_type=DataType.HIGH, select=1, session_type=None):
+    # Max over the `period` bars ending at select (fewer near the start of history)
+    return _current_context.get().get_indicator_value(symbol, DATA_FIELDS[data_type], 'highest', period, select, bar_type)
+
+def lowest(symbol, period, bar_type, data_type=DataType.LOW, select=1, session_type=None):
+    return _current_context.get().get_indicator_value(symbol, DATA_FIELDS[data_type], 'lowest', period, select, bar_type)
+
+def rolling_mean(symbol, period, bar_type, data_type=DataType.CLOSE, select=1, session_type=None):
+    # Simple mean of any bar field; None until `period` bars exist
+    return _current_context.get().get_indicator_value(symbol, DATA_FIELDS[data_type], 'ma', period, select, bar_type)
 
 
 def request_orderid(symbol, status, start, end, time_zone):
-    return [] # Always empty for backtest (instant fill)
+    # Open orders plus those placed on the current bar; status=[] means any status
+    return _current_context.get().order_ids(symbol, status)
 
 def order_status(orderid):
-    return OrderStatus.FILLED_ALL
+    return _current_context.get().order_states.get(str(orderid))
 
 def position_holding_qty(symbol):
-    sym_str = symbol.symbol
-    return context.positions.get(sym_str, 0)
+    return _current_context.get().position(symbol)
 
 def available_qty(symbol):
-    sym_str = symbol.symbol
-    return context.positions.get(sym_str, 0)
+    return _current_context.get().available_qty(symbol)
 
 def position_market_cap(symbol):
-    qty = position_holding_qty(symbol)
-    price = bar_close(symbol, None, 1, None)
-    if price:
-        return qty * price
-    return 0.0
+    context = _current_context.get()
+    sid = context.registry.id_of(symbol)
+    if sid is None:
+        return 0.0
+    return context.snapshot().market_values[sid]
 
 def net_asset(currency):
-    # Approximate
-    val_qqq = position_market_cap(Contract("US.QQQ"))
-    val_tqqq = position_market_cap(Contract("US.TQQQ"))
-    return context.cash + val_qqq + val_tqqq
+    # Cash plus every registered symbol's position at today's close (missing closes count as 0)
+    return _current_context.get().snapshot().nav
 
 def place_market(symbol, qty, side, time_in_force):
-    context.execute_order(symbol, qty, side)
+    return _current_context.get().submit_order(symbol, qty, side)
+
+def rebalance_to_weights(weights, min_trade=0.0):
+    # Batch rebalance {Contract: weight}; see MockContext.rebalance_to_weights
+    return _current_context.get().rebalance_to_weights(weights, min_trade)
+
+def place_limit(symbol, price, qty, side, time_in_force):
+    return _current_context.get().submit_limit(symbol, qty, side, price, time_in_force)
+
+def cancel_order(orderid):
+    return _current_context.get().cancel_order(orderid)
 
 def max_qty_to_buy_on_cash(symbol, order_type, price, order_trade_session_type):
     # Calculate max qty based on current cash
@@ -335,9 +890,32 @@ def max_qty_to_buy_on_cash(symbol, order_type, price, order_trade_session_type):
     if not price or price <= 0:
         return 0
     # Add buffer for commission/slippage
-    available_cash = context.cash * 0.99 
+    available_cash = _current_context.get().cash * 0.99 
     return int(available_cash / price)
 
+# --- Vectorized Data ---
+class VectorData:
+    """
+    Whole-history arrays for strategies that implement target_weights().
+    Warmup bars follow the per-bar mocks: ma -> NaN, rsi -> 50.0, vol -> 0.0.
+    """
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def close(self, symbol):
+        return self.ctx._get_bars(symbol).column('close')
+
+    def ma(self, symbol, period):
+        return self.ctx.get_indicator(symbol, 'close', 'ma', period)
+
+    def rsi(self, symbol, period):
+        series = self.ctx.get_indicator(symbol, 'close', 'rsi', period)
+        return np.where(np.isnan(series), 50.0, series)
+
+    def vol(self, symbol, period):
+        series = self.ctx.get_indicator(symbol, 'close', 'vol', period)
+        return np.where(np.isnan(series), 0.0, series)
+
 # --- Base Class ---
 class StrategyBase:
     def initialize(self): pass
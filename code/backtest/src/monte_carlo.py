@@ -0,0 +1,452 @@
+"""
+Block-bootstrap Monte Carlo for strategy robustness.
+
+Synthetic QQQ paths are built by resampling blocks of historical daily
+(close return, open gap, volume) triples; the matching TQQQ path is the
+3x daily-reset product of each QQQ return minus the fund's expense drag.
+V22 (state machine) and target-weight strategies such as V23
+(Strategy.target_weights) are evaluated on chunks of paths as 2-D
+(paths x bars) arrays: the only Python loop is over bars, and every step
+updates all paths of the chunk at once. Per-path results are streamed into
+accumulators, so memory is bounded by chunk_size x n_bars.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_and_clean_data
+from indicators import rolling_ma
+from mock_api import SymbolRegistry, affordable_qty
+from v22_kernel import DEFAULT_PARAMS as V22_PARAMS, TARGET_Q, TARGET_T, reverse_window_mean, run_v22_kernel, \
+    synthetic_volume, NORMAL, ZONE_BATTLE_ATTACK, ZONE_BATTLE_DEFEND, BEAR_CASH, TOP_ESCAPE, INIT
+
+
+# --- Path generation ---
+
+def historical_inputs(df_qqq, df_tqqq):
+    """Per-bar resampling inputs: QQQ close returns, open gaps, volumes (bars 1..n-1)."""
+    close = df_qqq['close'].to_numpy(dtype=float)
+    open_ = df_qqq['open'].to_numpy(dtype=float)
+    return {
+        'ret': close[1:] / close[:-1] - 1.0,
+        'gap': open_[1:] / close[:-1],
+        'volume': df_qqq['volume'].to_numpy(dtype=float)[1:],
+        'start_qqq': float(close[0]),
+        'start_tqqq': float(df_tqqq['close'].iloc[0]),
+    }
+
+
+def bootstrap_indices(rng, n_source, n_paths, n_bars, block_size):
+    """(n_paths, n_bars) source indices made of contiguous blocks with random starts."""
+    n_blocks = -(-n_bars // block_size)
+    starts = rng.integers(0, n_source - block_size + 1, size=(n_paths, n_blocks))
+    idx = starts[:, :, None] + np.arange(block_size)[None, None, :]
+    return idx.reshape(n_paths, n_blocks * block_size)[:, :n_bars]
+
+
+def generate_paths(inputs, rng, n_paths, n_bars, block_size=20, leverage=3.0, annual_fee=0.0095):
+    """
+    One chunk of synthetic OHLCV paths as (n_paths, n_bars) arrays.
+    Bar 0 is the historical starting bar; bars 1.. are bootstrapped.
+    """
+    idx = bootstrap_indices(rng, len(inputs['ret']), n_paths, n_bars - 1, block_size)
+    ret = inputs['ret'][idx]
+    gap = inputs['gap'][idx]
+
+    close_q = np.empty((n_paths, n_bars))
+    close_q[:, 0] = inputs['start_qqq']
+    close_q[:, 1:] = inputs['start_qqq'] * np.cumprod(1.0 + ret, axis=1)
+    open_q = np.empty((n_paths, n_bars))
+    open_q[:, 0] = inputs['start_qqq']
+    open_q[:, 1:] = close_q[:, :-1] * gap
+    volume = np.zeros((n_paths, n_bars))
+    volume[:, 1:] = inputs['volume'][idx]
+
+    # Daily-reset leveraged fund: leverage x QQQ daily return minus expense drag
+    ret_t = leverage * ret - annual_fee / 252
+    close_t = np.empty((n_paths, n_bars))
+    close_t[:, 0] = inputs['start_tqqq']
+    close_t[:, 1:] = inputs['start_tqqq'] * np.cumprod(1.0 + np.maximum(ret_t, -0.999), axis=1)
+    return {'close_q': close_q, 'open_q': open_q, 'volume': volume, 'close_t': close_t}
+
+
+# --- 2-D indicators (along the bar axis) ---
+
+def rsi_2d(close, period):
+    delta = np.diff(close, axis=1)
+    gain = np.zeros(close.shape)
+    loss = np.zeros(close.shape)
+    gain[:, 1:] = np.where(delta > 0, delta, 0.0)
+    loss[:, 1:] = np.where(delta < 0, -delta, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = rolling_ma(gain, period) / rolling_ma(loss, period)
+        out = 100 - (100 / (1 + rs))
+    out[:, :period] = np.nan
+    return out
+
+
+def vol_2d(close, period):
+    ret = np.zeros(close.shape)
+    ret[:, 1:] = close[:, 1:] / close[:, :-1] - 1.0
+    mean = rolling_ma(ret, period)
+    mean_sq = rolling_ma(ret * ret, period)
+    var = np.maximum(mean_sq - mean * mean, 0.0) * period / (period - 1)
+    out = np.sqrt(var) * np.sqrt(252)
+    out[:, :period] = np.nan
+    return out
+
+
+# Symbol ids of the simulated legs (ids only, the paths hold the prices); id k trades PATH_CLOSES[k]
+PATH_SYMBOLS = SymbolRegistry()
+for _symbol in ("US.QQQ", "US.TQQQ"):
+    PATH_SYMBOLS.register(_symbol, None)
+PATH_CLOSES = ('close_q', 'close_t')
+
+
+def path_leg(symbol):
+    """Leg index (0 QQQ, 1 TQQQ) of a Contract or symbol string."""
+    leg = PATH_SYMBOLS.id_of(symbol)
+    if leg is None:
+        raise ValueError(f"No Monte Carlo path for {symbol}; paths cover {PATH_SYMBOLS.symbols}")
+    return leg
+
+
+class PathData:
+    """VectorData look-alike over a chunk of paths, for Strategy.target_weights()."""
+    def __init__(self, paths):
+        self.paths = paths
+        self.cache = {}
+
+    def _close(self, symbol):
+        return self.paths[PATH_CLOSES[path_leg(symbol)]]
+
+    def _cached(self, key, fn):
+        if key not in self.cache:
+            self.cache[key] = fn()
+        return self.cache[key]
+
+    def close(self, symbol):
+        return self._close(symbol)
+
+    def ma(self, symbol, period):
+        return self._cached(('ma', str(symbol), period), lambda: rolling_ma(self._close(symbol), period))
+
+    def rsi(self, symbol, period):
+        series = self._cached(('rsi', str(symbol), period), lambda: rsi_2d(self._close(symbol), period))
+        return np.where(np.isnan(series), 50.0, series)
+
+    def vol(self, symbol, period):
+        series = self._cached(('vol', str(symbol), period), lambda: vol_2d(self._close(symbol), period))
+        return np.where(np.isnan(series), 0.0, series)
+
+
+# --- Batched accounting ---
+
+class BatchAccount:
+    """
+    Cash/positions for a chunk of paths with the MockContext fill model
+    (close +/- slippage, max(1 USD, value * rate) commission, cash check on buys),
+    plus streaming return/drawdown accumulators.
+    """
+    def __init__(self, n_paths, initial_capital, commission_rate, slippage):
+        self.initial_capital = initial_capital
+        self.commission_rate = commission_rate
+        self.slippage = slippage
+        self.cash = np.full(n_paths, float(initial_capital))
+        self.qty = np.zeros((2, n_paths))  # 0 = QQQ, 1 = TQQQ
+        self.trades = np.zeros(n_paths, dtype=np.int64)
+        self.prev_value = None
+        self.peak = np.zeros(n_paths)
+        self.max_dd = np.zeros(n_paths)
+        self.ret_sum = np.zeros(n_paths)
+        self.ret_sq = np.zeros(n_paths)
+        self.n_ret = 0
+
+    def fill(self, mask, leg, qty, is_buy, price):
+        qty = np.where(mask, qty, 0.0)
+        if is_buy:
+            exec_price = price * (1 + self.slippage)
+        else:
+            exec_price = price * (1 - self.slippage)
+        value = exec_price * qty
+        commission = np.maximum(1.0, value * self.commission_rate)
+        if is_buy:
+            ok = (qty > 0) & (price > 0) & (self.cash >= value + commission)
+            self.cash = np.where(ok, self.cash - (value + commission), self.cash)
+            self.qty[leg] = np.where(ok, self.qty[leg] + qty, self.qty[leg])
+        else:
+            ok = (qty > 0) & (price > 0) & (self.qty[leg] >= qty)
+            self.qty[leg] = np.where(ok, self.qty[leg] - qty, self.qty[leg])
+            self.cash = np.where(ok, self.cash + (value - commission), self.cash)
+        self.trades += ok
+        return ok
+
+    def mark(self, p_q, p_t):
+        value = self.cash + self.qty[0] * p_q + self.qty[1] * p_t
+        if self.prev_value is None:
+            ret = value / self.initial_capital - 1.0
+        else:
+            ret = value / self.prev_value - 1.0
+        if self.prev_value is not None:
+            # metrics.calculate_metrics fills the first bar's return with 0
+            self.ret_sum += ret
+            self.ret_sq += ret * ret
+            self.n_ret += 1
+        self.prev_value = value
+        self.peak = np.maximum(self.peak, value)
+        self.max_dd = np.minimum(self.max_dd, value / self.peak - 1.0)
+
+    def results(self, n_bars):
+        final = self.prev_value
+        # Synthetic paths have no calendar; use 252 bars per year
+        years = n_bars / 252
+        cagr = (final / self.initial_capital) ** (1 / years) - 1.0
+        n = self.n_ret + 1  # includes the zero first-bar return
+        mean = self.ret_sum / n
+        var = np.maximum(self.ret_sq - n * mean * mean, 0.0) / max(n - 1, 1)
+        std = np.sqrt(var)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(std > 0, np.sqrt(252) * mean / std, 0.0)
+        return {
+            'Final Value': final,
+            'CAGR': cagr,
+            'Max Drawdown': self.max_dd,
+            'Annual Volatility': std * np.sqrt(252),
+            'Sharpe Ratio': sharpe,
+            'Trade Count': self.trades,
+        }
+
+
+def _buy_only_batch(acct, mask, tg_q, tg_t, p_q, p_t):
+    # Strategy.execute_buy_only for the paths in `mask`
+    val_q = acct.qty[0] * p_q
+    val_t = acct.qty[1] * p_t
+    equity = acct.cash + val_q + val_t
+    mask = mask & (equity > 0)
+    need_q = np.maximum(equity * tg_q - val_q, 0.0)
+    need_t = np.maximum(equity * tg_t - val_t, 0.0)
+    for leg, need, price in ((0, need_q, p_q), (1, need_t, p_t)):
+        go = mask & (need > 500.0) & (price > 0)
+        safe_price = np.where(price > 0, price, 1.0)
+        need_qty = np.trunc(need / safe_price)
+        # max_qty_to_buy_on_cash keeps a 1% buffer
+        cash_qty = np.trunc(acct.cash * 0.99 / safe_price)
+        acct.fill(go, leg, np.minimum(need_qty, cash_qty), True, price)
+
+
+def run_v22_batch(paths, acct, params=None):
+    """V22 state machine over (paths x bars) arrays; every bar updates all paths."""
+    p = dict(V22_PARAMS)
+    if params:
+        p.update(params)
+    close_q, open_q, volume, close_t = paths['close_q'], paths['open_q'], paths['volume'], paths['close_t']
+    n_paths, n_bars = close_q.shape
+    ma200 = rolling_ma(close_q, p['ma_long_window'])
+    ma20 = rolling_ma(close_q, p['ma_short_window'])
+    vol_ma = reverse_window_mean(volume, p['vol_window'])
+    use_vol = p['vol_window'] <= 100  # vol_history keeps at most 100 bars
+
+    label = np.full(n_paths, INIT)
+    ath = np.zeros(n_paths)
+    risk_off_days = np.zeros(n_paths, dtype=np.int64)
+    pending = np.zeros(n_paths, dtype=bool)
+    pending_q = np.zeros(n_paths)
+    pending_t = np.zeros(n_paths)
+    # Per-path len(vol_history): bars with valid prices so far, T+1 bars included
+    n_hist = np.zeros(n_paths, dtype=np.int64)
+
+    for i in range(n_bars):
+        p_q = close_q[:, i]
+        p_t = close_t[:, i]
+        n_hist += (p_q > 0) & (p_t > 0)
+        risk_off = (label == BEAR_CASH) | (label == ZONE_BATTLE_DEFEND) | (label == TOP_ESCAPE)
+        risk_off_days = np.where(risk_off, risk_off_days + 1, 0)
+
+        # T+1 buys scheduled yesterday; these paths skip signal evaluation today
+        if pending.any():
+            _buy_only_batch(acct, pending, pending_q, pending_t, p_q, p_t)
+        live = ~pending
+        pending = np.zeros(n_paths, dtype=bool)
+
+        ath = np.where(live & (p_q > ath), p_q, ath)
+        drawdown = np.where(ath > 0, p_q / np.where(ath > 0, ath, 1.0) - 1.0, 0.0)
+        m200 = ma200[:, i]
+        m20 = ma20[:, i]
+        prev_m20 = ma20[:, i - 1] if i > 0 else np.full(n_paths, np.nan)
+
+        is_top = np.zeros(n_paths, dtype=bool)
+        if use_vol:
+            is_top = (n_hist >= p['vol_window']) & (ath > 0) & (p_q >= ath * p['high_zone']) \
+                & (volume[:, i] > vol_ma[:, i] * p['vol_factor']) & (p_q < open_q[:, i])
+
+        below_200 = ~np.isnan(m200) & (p_q < m200)
+        above_20 = ~np.isnan(m20) & (p_q > m20)
+        raw = np.where(
+            is_top, TOP_ESCAPE,
+            np.where(below_200,
+                     np.where(above_20 & (drawdown <= -0.10), ZONE_BATTLE_ATTACK, BEAR_CASH),
+                     np.where(drawdown < -0.10, ZONE_BATTLE_ATTACK, NORMAL)))
+
+        # Anti-V filter
+        to_risk_on = risk_off & ((raw == ZONE_BATTLE_ATTACK) | (raw == NORMAL))
+        ma20_not_rising = np.isnan(m20) | np.isnan(prev_m20) | (m20 <= prev_m20)
+        blocked = to_risk_on & ((risk_off_days < p['min_risk_off_days']) | ma20_not_rising)
+        next_state = np.where(blocked, label, raw)
+
+        tg_q = TARGET_Q[next_state]
+        tg_t = TARGET_T[next_state]
+        changed = live & (next_state != label)
+        label = np.where(live, next_state, label)
+
+        val_q = acct.qty[0] * p_q
+        val_t = acct.qty[1] * p_t
+        total = val_q + val_t
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deviation = np.abs(val_q - val_t) / (total + 0.000001)
+        rebalance = live & ~changed & (next_state == NORMAL) & (total > 0) & (deviation > 0.20)
+        act = changed | rebalance
+
+        equity = acct.cash + val_q + val_t
+        act = act & (equity > 0)
+        diff_q = equity * tg_q - val_q
+        diff_t = equity * tg_t - val_t
+        sold = np.zeros(n_paths, dtype=bool)
+        for leg, diff, price in ((0, diff_q, p_q), (1, diff_t, p_t)):
+            go = act & (diff < -500.0) & (price > 0)
+            qty = np.minimum(np.trunc(np.abs(diff) / np.where(price > 0, price, 1.0)), acct.qty[leg])
+            sold |= acct.fill(go, leg, qty, False, price)
+
+        pending = sold
+        pending_q = np.where(sold, tg_q, 0.0)
+        pending_t = np.where(sold, tg_t, 0.0)
+        _buy_only_batch(acct, act & ~sold, tg_q, tg_t, p_q, p_t)
+
+        acct.mark(p_q, p_t)
+    return acct
+
+
+def run_target_weight_batch(paths, acct, strategy):
+    """
+    Target-weight strategy (e.g. V23) over (paths x bars) arrays, traded like
+    MockContext.rebalance_to_weights: sells first, then buys capped by cash.
+    """
+    weights = strategy.target_weights(PathData(paths))
+    legs = []
+    for symbol, w in weights.items():
+        leg = path_leg(symbol)
+        legs.append((leg, np.asarray(w, dtype=float), paths[PATH_CLOSES[leg]]))
+    n_paths, n_bars = paths['close_q'].shape
+    active = np.ones((n_paths, n_bars), dtype=bool)
+    for _, w, _ in legs:
+        active &= ~np.isnan(w)
+
+    for i in range(n_bars):
+        p_q = paths['close_q'][:, i]
+        p_t = paths['close_t'][:, i]
+        act = active[:, i]
+        nav = acct.cash + acct.qty[0] * p_q + acct.qty[1] * p_t
+        diffs = []
+        for leg, w, closes in legs:
+            price = closes[:, i]
+            with np.errstate(invalid='ignore'):
+                target = np.trunc(nav * np.nan_to_num(w[:, i]) / np.where(price > 0, price, 1.0))
+            # Legs without a price are left alone
+            diffs.append((leg, np.where(price > 0, target - acct.qty[leg], 0.0), price))
+        for leg, diff, price in diffs:
+            acct.fill(act & (diff < 0), leg, np.minimum(-diff, acct.qty[leg]), False, price)
+        for leg, diff, price in diffs:
+            cash_qty = affordable_qty(acct.cash, price, acct.slippage, acct.commission_rate)
+            acct.fill(act & (diff > 0), leg, np.minimum(diff, cash_qty), True, price)
+        acct.mark(p_q, p_t)
+    return acct
+
+
+def run_buy_hold_batch(paths, acct, leg=0):
+    """Whole-number-share buy & hold from bar 0's close with the account's costs, as benchmarks.buy_and_hold."""
+    closes = paths['close_t'] if leg else paths['close_q']
+    qty = affordable_qty(acct.cash, closes[:, 0], acct.slippage, acct.commission_rate)
+    acct.fill(qty > 0, leg, qty, True, closes[:, 0])
+    for i in range(closes.shape[1]):
+        acct.mark(paths['close_q'][:, i], paths['close_t'][:, i])
+    return acct
+
+
+def simulate(qqq_path, tqqq_path, n_paths=1000, n_bars=None, block_size=20, chunk_size=250,
+             seed=None, v22_params=None, target_weight_strategies=None, leverage=3.0,
+             annual_fee=0.0095, initial_capital=100000.0, commission_rate=0.0005, slippage=0.0005):
+    """
+    Evaluate V22, any target-weight strategies ({name: Strategy instance}) and
+    QQQ buy & hold on n_paths bootstrapped paths, chunk_size paths at a time.
+    Returns one row per (path, strategy) with CAGR / Max Drawdown / Sharpe etc.
+    """
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    inputs = historical_inputs(df_qqq, df_tqqq)
+    n_bars = n_bars or len(df_qqq)
+    rng = np.random.default_rng(seed)
+    target_weight_strategies = target_weight_strategies or {}
+
+    frames = []
+    for start in range(0, n_paths, chunk_size):
+        m = min(chunk_size, n_paths - start)
+        logging.info(f"Monte Carlo paths {start}..{start + m - 1} of {n_paths}...")
+        paths = generate_paths(inputs, rng, m, n_bars, block_size, leverage, annual_fee)
+        runs = {'QQQ B&H': run_buy_hold_batch(paths, BatchAccount(m, initial_capital, commission_rate, slippage))}
+        runs['V22'] = run_v22_batch(paths, BatchAccount(m, initial_capital, commission_rate, slippage), v22_params)
+        for name, strategy in target_weight_strategies.items():
+            runs[name] = run_target_weight_batch(paths, BatchAccount(m, initial_capital, commission_rate, slippage), strategy)
+        for name, acct in runs.items():
+            res = acct.results(n_bars)
+            res['path'] = np.arange(start, start + m)
+            res['Strategy'] = name
+            frames.append(pd.DataFrame(res))
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(df, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+    """Distribution of CAGR / Max Drawdown / Sharpe per strategy."""
+    cols = ['CAGR', 'Max Drawdown', 'Sharpe Ratio']
+    summary = df.groupby('Strategy')[cols].quantile(list(quantiles)).unstack()
+    summary.columns = [f"{metric} p{int(q * 100)}" for metric, q in summary.columns]
+    summary['P(CAGR < 0)'] = df.groupby('Strategy')['CAGR'].apply(lambda s: float((s < 0).mean()))
+    return summary
+
+
+def check_v22_batch(qqq_path, tqqq_path, n_paths=8, n_bars=2000, seed=0, initial_capital=100000.0,
+                    commission_rate=0.0005, slippage=0.0005):
+    """
+    Run run_v22_batch on bootstrapped paths with synthetic non-zero volume and
+    the V22 kernel on each path alone; assert the same final value, trade
+    count and max drawdown per path. Returns the number of TOP_ESCAPE bars.
+    """
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    inputs = historical_inputs(df_qqq, df_tqqq)
+    inputs['volume'] = synthetic_volume(len(inputs['ret']), seed)
+    paths = generate_paths(inputs, np.random.default_rng(seed), n_paths, n_bars)
+    acct = run_v22_batch(paths, BatchAccount(n_paths, initial_capital, commission_rate, slippage))
+
+    n_top = 0
+    for j in range(n_paths):
+        open_q, close_q = paths['open_q'][j], paths['close_q'][j]
+        path_qqq = pd.DataFrame({'open': open_q, 'high': np.maximum(open_q, close_q), 'close': close_q,
+                                 'volume': paths['volume'][j]})
+        path_tqqq = pd.DataFrame({'close': paths['close_t'][j]})
+        df_k, trades_k, labels_k = run_v22_kernel(path_qqq, path_tqqq, initial_capital=initial_capital,
+                                                  commission_rate=commission_rate, slippage=slippage)
+        total = df_k['total_value'].to_numpy()
+        max_dd = min(np.min(total / np.maximum.accumulate(total) - 1.0), 0.0)
+        assert acct.prev_value[j] == total[-1], f"path {j}: final value differs"
+        assert acct.trades[j] == len(trades_k), f"path {j}: trade count differs"
+        assert acct.max_dd[j] == max_dd, f"path {j}: max drawdown differs"
+        n_top += int((labels_k == "TOP_ESCAPE").sum())
+    return n_top
+
+
+if __name__ == "__main__":
+    import os
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    n_top = check_v22_batch(qqq_path, tqqq_path)
+    assert n_top > 0, "synthetic volume never triggered TOP_ESCAPE"
+    print(f"Monte Carlo V22 batch matches the kernel per path on synthetic volume ({n_top} TOP_ESCAPE bars)")
@@ -0,0 +1,73 @@
+import json
+import logging
+import time
+from functools import wraps
+
+import numpy as np
+
+
+class ApiProfiler:
+    """
+    Opt-in wall-time profiler for the mock API injected into a strategy.
+    Only wrapped callables are timed; when no profiler is passed to the
+    engine nothing is wrapped, so the disabled path costs nothing.
+    """
+
+    def __init__(self):
+        # name -> list of durations in ns
+        self.samples = {}
+
+    def wrap(self, name, fn):
+        samples = self.samples.setdefault(name, [])
+        record = samples.append
+        clock = time.perf_counter_ns
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(clock() - t0)
+        return timed
+
+    def wrap_namespace(self, namespace):
+        """Replace every plain function in `namespace` (exec globals) with a timed wrapper."""
+        for name, obj in list(namespace.items()):
+            if callable(obj) and not isinstance(obj, type) and not name.startswith('__'):
+                namespace[name] = self.wrap(name, obj)
+
+    def wrap_methods(self, obj, names=('handle_data', 'target_weights')):
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is not None:
+                setattr(obj, name, self.wrap(name, method))
+
+    def summary(self):
+        """{name: {calls, total_s, mean_us, p50_us, p99_us}}, slowest cumulative first."""
+        rows = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            arr = np.asarray(samples, dtype=np.float64) / 1e3
+            rows[name] = {
+                'calls': len(samples),
+                'total_s': float(arr.sum() / 1e6),
+                'mean_us': float(arr.mean()),
+                'p50_us': float(np.percentile(arr, 50)),
+                'p99_us': float(np.percentile(arr, 99)),
+            }
+        return dict(sorted(rows.items(), key=lambda kv: kv[1]['total_s'], reverse=True))
+
+    def report(self):
+        lines = [f"{'API':<24}{'calls':>10}{'total s':>10}{'p50 us':>10}{'p99 us':>10}"]
+        for name, row in self.summary().items():
+            lines.append(f"{name:<24}{row['calls']:>10}{row['total_s']:>10.4f}"
+                         f"{row['p50_us']:>10.2f}{row['p99_us']:>10.2f}")
+        text = "\n".join(lines)
+        logging.info("API profile:\n" + text)
+        return text
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+from engine import run_backtests
+from metrics import calculate_metrics
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules whose behaviour determines a run's output; editing any of them invalidates the cache
+ENGINE_MODULES = ("engine.py", "mock_api.py", "data_loader.py", "indicators.py", "bar_store.py", "metrics.py",
+                  "benchmarks.py", "minute_store.py", "events.py", "sweep.py", "checkpoint.py", "v22_kernel.py",
+                  "walk_forward.py", "start_dates.py")
+
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def engine_version():
+    h = hashlib.sha256()
+    for name in ENGINE_MODULES:
+        h.update(name.encode())
+        h.update(_sha256_file(os.path.join(SRC_DIR, name)).encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed store of run results (pickled payload dicts).
+    Keys hash the strategy source, input files, engine version and run
+    arguments, so any change to them is a miss. Entries are evicted least
+    recently used first (file mtime, refreshed on every hit) once the store
+    exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.engine_version = engine_version()
+        # (path, size, mtime_ns) -> sha256, so sweeps hash each file once
+        self._file_hashes = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def file_hash(self, path):
+        st = os.stat(path)
+        stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        digest = self._file_hashes.get(stamp)
+        if digest is None:
+            digest = _sha256_file(path)
+            self._file_hashes[stamp] = digest
+        return digest
+
+    def key(self, strategy_path, data_paths, **run_args):
+        # strategy_path=None keys results derived from the data alone (benchmarks)
+        payload = {
+            'strategy': self.file_hash(strategy_path) if strategy_path else None,
+            'data': [self.file_hash(p) for p in data_paths],
+            'engine': self.engine_version,
+            'run': run_args,
+        }
+        blob = json.dumps(payload, sort_keys=True, default=repr).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError) as e:
+            logging.warning(f"Dropping unreadable cache entry {key[:12]}: {e}")
+            os.remove(path)
+            return None
+        os.utime(path)
+        return payload
+
+    def put(self, key, payload):
+        # Write-then-rename so concurrent readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            st = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((st.st_mtime_ns, st.st_size, name))
+            total += st.st_size
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+
+def cached_backtest(cache, qqq_path, tqqq_path, strategy_path, vectorized=False, params=None,
+                    checkpoint_path=None, fill_timing='close', start=None, end=None):
+    """
+    engine.run_backtest plus calculate_metrics, served from `cache` when the
+    same strategy/data/engine/arguments were run before.
+    On a miss, checkpoint_path is passed through so only new bars are simulated.
+    Returns (portfolio_history DataFrame, metrics dict).
+    """
+    options = {'vectorized': vectorized, 'params': params, 'checkpoint_path': checkpoint_path,
+               'fill_timing': fill_timing}
+    return cached_backtests(cache, qqq_path, tqqq_path, {'run': (strategy_path, options)}, start=start, end=end)['run']
+
+
+def cached_backtests(cache, qqq_path, tqqq_path, runs, benchmarks=None, start=None, end=None):
+    """
+    engine.run_backtests with per-strategy caching: runs found in `cache` are
+    served from it, the rest go through one lockstep pass over data loaded
+    once. The benchmark set is cached as one entry keyed by the data files,
+    so reports over the same data reuse it.
+    runs/benchmarks/start/end as in engine.run_backtests.
+    Returns {name: (DataFrame, metrics dict)}.
+    """
+    names = [*runs, *(benchmarks or {})]
+    results, misses, keys = {}, {}, {}
+    bench_key = None
+    if benchmarks:
+        bench_key = cache.key(None, (qqq_path, tqqq_path), benchmarks=benchmarks, start=start, end=end)
+        hit = cache.get(bench_key)
+        if hit is not None:
+            results.update(hit['benchmarks'])
+            benchmarks = None
+    for name, spec in runs.items():
+        path, options = spec if isinstance(spec, tuple) else (spec, {})
+        key = cache.key(path, (qqq_path, tqqq_path), vectorized=options.get('vectorized', False),
+                        params=options.get('params') or {}, fill_timing=options.get('fill_timing', 'close'),
+                        start=start, end=end)
+        hit = cache.get(key)
+        if hit is not None:
+            logging.info(f"Result cache hit for {name} ({key[:12]}), skipping simulation.")
+            results[name] = (hit['history'], hit['metrics'])
+        else:
+            misses[name] = spec
+            keys[name] = key
+    if misses or benchmarks:
+        for name, df in run_backtests(qqq_path, tqqq_path, misses, benchmarks=benchmarks,
+                                      start=start, end=end).items():
+            metrics = calculate_metrics(df)
+            if name in keys:
+                cache.put(keys[name], {'history': df, 'metrics': metrics})
+            results[name] = (df, dict(metrics))
+        if benchmarks:
+            cache.put(bench_key, {'benchmarks': {name: results[name] for name in benchmarks}})
+    return {name: results[name] for name in names}
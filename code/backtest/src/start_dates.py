@@ -0,0 +1,118 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import buy_and_hold, rebalance_mask
+from data_loader import load_and_clean_data
+from metrics import calculate_metrics
+from sweep import SharedBars, open_pool, map_runs, cache_key_fn
+from v22_kernel import STRATEGY_FILE, prepare_arrays, run_v22_kernel
+
+SUMMARY_METRICS = ("CAGR", "Max Drawdown", "Sharpe Ratio", "Excess CAGR")
+SUMMARY_QUANTILES = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+
+def start_offsets(dates, every='M', first=None, min_years=3):
+    """
+    Bar indices to start runs at: the first bar of every month/quarter/year
+    ('M', 'Q', 'Y') or every N bars, from `first` on, leaving at least
+    min_years of history after each start.
+    """
+    starts = np.flatnonzero(rebalance_mask(dates, every))
+    if first is not None:
+        starts = starts[starts >= dates.searchsorted(pd.Timestamp(first))]
+    last_start = dates.searchsorted(dates[-1] - pd.Timedelta(days=365.25 * min_years), side='right')
+    return starts[starts < last_start]
+
+
+def start_date_sensitivity(qqq_path, tqqq_path, strategy_path, every='M', first=None, min_years=3, params=None,
+                           processes=None, vectorized=False, cache=None, initial_capital=100000.0, kernel=False):
+    """
+    Run one strategy from every start offset (see start_offsets) to the end
+    of the data in a process pool. Workers map the aligned bars from shared
+    memory and keep one full-history indicator cache for all their offsets,
+    so every run starts warm and indicators are computed once per worker.
+    kernel=True (V22 only: strategy_path must be tqqq.py, which is then not
+    exec'd) runs every offset in-process through v22_kernel over one
+    prepare_arrays() set instead; results are the same, each run costs milliseconds.
+    Each row also carries QQQ buy & hold from the same start (Excess CAGR =
+    strategy CAGR - QQQ CAGR).
+    cache: optional ResultCache for the pool runs; starts already run are not rerun.
+    Returns one DataFrame row per start date, earliest first.
+    """
+    if kernel and os.path.basename(strategy_path) != STRATEGY_FILE:
+        raise ValueError(f"kernel=True runs the built-in V22 kernel ({STRATEGY_FILE}), not {strategy_path}")
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    dates = df_qqq.index
+    starts = start_offsets(dates, every, first, min_years)
+    if len(starts) == 0:
+        raise ValueError("No start dates leave enough history to run on.")
+    params = params or {}
+    logging.info(f"Start-date sensitivity: {len(starts)} starts from {dates[starts[0]].date()} "
+                 f"to {dates[starts[-1]].date()}...")
+
+    if kernel:
+        arrays = prepare_arrays(df_qqq, df_tqqq, params)
+        rows = []
+        for s in starts:
+            df, _, _ = run_v22_kernel(df_qqq, df_tqqq, params, arrays, initial_capital, start_index=int(s))
+            row = dict(params)
+            row.update(calculate_metrics(df, initial_capital))
+            row['Final Value'] = float(df['total_value'].iloc[-1])
+            rows.append(row)
+    else:
+        shared = SharedBars(df_qqq, df_tqqq)
+        try:
+            with open_pool(shared, strategy_path, processes, vectorized) as pool:
+                run_key = cache_key_fn(cache, qqq_path, tqqq_path, strategy_path, vectorized) if cache else None
+                # Earliest (longest) runs are queued first so the pool drains evenly
+                rows, _ = map_runs(pool, [(params, int(s), None, False) for s in starts], cache, run_key)
+        finally:
+            shared.close()
+
+    close_qqq = df_qqq['close'].to_numpy(dtype=float)
+    records = []
+    for s, row in zip(starts, rows):
+        bench = calculate_metrics(pd.DataFrame({'total_value': buy_and_hold(close_qqq[s:], initial_capital)},
+                                               index=dates[s:]), initial_capital)
+        record = {'start': dates[s].date(), 'years': (dates[-1] - dates[s]).days / 365.25}
+        record.update(row)
+        record['QQQ CAGR'] = bench['CAGR']
+        record['QQQ Max Drawdown'] = bench['Max Drawdown']
+        record['Excess CAGR'] = row['CAGR'] - bench['CAGR']
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+def summarize_starts(df_starts, metrics=SUMMARY_METRICS, quantiles=SUMMARY_QUANTILES):
+    """Distribution of each metric across start dates: one row per metric, one column per quantile, plus mean."""
+    table = df_starts[list(metrics)].quantile(list(quantiles)).T
+    table.columns = ['min' if q == 0 else 'max' if q == 1 else f"p{int(round(q * 100))}" for q in quantiles]
+    table['mean'] = df_starts[list(metrics)].mean()
+    return table
+
+
+def summarize_by_year(df_starts, metrics=("CAGR", "Max Drawdown", "Excess CAGR")):
+    """Median of each metric over the starts within each calendar year."""
+    years = pd.to_datetime(df_starts['start']).dt.year.rename('start year')
+    return df_starts[list(metrics)].groupby(years).median()
+
+
+if __name__ == "__main__":
+    import time
+    logging.getLogger().setLevel(logging.WARNING)  # engine (via sweep) configured INFO
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    strategy_path = os.path.join(base_dir, "code", "tqqq.py")
+    timings = {}
+    results = {}
+    for kernel in (False, True):
+        t0 = time.perf_counter()
+        results[kernel] = start_date_sensitivity(qqq_path, tqqq_path, strategy_path, every='Y', kernel=kernel)
+        timings[kernel] = time.perf_counter() - t0
+    pd.testing.assert_frame_equal(results[False], results[True], check_exact=True)
+    print(f"Start-date sensitivity OK: {len(results[True])} yearly V22 starts, pool {timings[False]:.1f}s, "
+          f"kernel {timings[True]:.1f}s, identical rows")
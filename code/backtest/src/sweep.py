@@ -0,0 +1,155 @@
+import itertools
+import logging
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_FIELDS
+from data_loader import load_and_clean_data
+from engine import load_strategy_class, run_strategy
+from events import EventRecorder
+from metrics import calculate_metrics
+
+
+def expand_grid(grid):
+    """{'vol_factor': [1.5, 2.0], 'high_zone': [0.9]} -> list of param dicts (grid order)."""
+    names = list(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+class SharedBars:
+    """
+    Aligned QQQ/TQQQ OHLCV published once in a shared memory block.
+    Layout: float64 [2 symbols, len(BAR_FIELDS), n_bars]; dates travel as int64 ns.
+    """
+
+    def __init__(self, df_qqq, df_tqqq):
+        n = len(df_qqq)
+        self.shape = (2, len(BAR_FIELDS), n)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)) * 8)
+        arr = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        for s, df in enumerate((df_qqq, df_tqqq)):
+            for f, name in enumerate(BAR_FIELDS):
+                arr[s, f] = df[name].to_numpy(dtype=np.float64)
+        self.dates = df_qqq.index.values.astype('datetime64[ns]').view(np.int64)
+
+    def handle(self):
+        # Picklable description for pool initializers
+        return self.shm.name, self.shape, self.dates
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_frames(handle):
+    """Rebuild (df_qqq, df_tqqq, shm) in a worker from a SharedBars handle."""
+    name, shape, dates = handle
+    # Pool workers share the parent's resource tracker; the parent unlinks the block
+    shm = shared_memory.SharedMemory(name=name)
+    arr = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    index = pd.DatetimeIndex(dates.view('datetime64[ns]'), name='date')
+    frames = []
+    for s in range(shape[0]):
+        frames.append(pd.DataFrame({name: arr[s, f] for f, name in enumerate(BAR_FIELDS)}, index=index, copy=False))
+    return frames[0], frames[1], shm
+
+
+# Per-worker state, filled by _init_worker
+_worker = {}
+
+
+def _init_worker(handle, strategy_path, vectorized):
+    logging.getLogger().setLevel(logging.WARNING)
+    df_qqq, df_tqqq, shm = attach_frames(handle)
+    _worker['shm'] = shm
+    _worker['df_qqq'] = df_qqq
+    _worker['df_tqqq'] = df_tqqq
+    _worker['strategy_class'] = load_strategy_class(strategy_path)
+    _worker['vectorized'] = vectorized
+    # Full-history indicators are computed once per worker and reused by every run
+    _worker['indicator_cache'] = {}
+
+
+def _run_one(task):
+    # task: (idx, params, start_index, end_index, keep_curve)
+    idx, params, start_index, end_index, keep_curve = task
+    # Prints are dropped unformatted; per-bar errors still reach the log
+    events = EventRecorder(capacity=256, level=logging.WARNING, echo=True)
+    df = run_strategy(_worker['df_qqq'], _worker['df_tqqq'], _worker['strategy_class'],
+                      vectorized=_worker['vectorized'], params=params,
+                      start_index=start_index, end_index=end_index,
+                      indicator_cache=_worker['indicator_cache'], events=events)
+    row = dict(params)
+    row.update(calculate_metrics(df))
+    row['Final Value'] = float(df['total_value'].iloc[-1])
+    curve = df['total_value'] if keep_curve else None
+    return idx, row, curve
+
+
+def open_pool(shared, strategy_path, processes=None, vectorized=False):
+    """Process pool whose workers map `shared` (SharedBars) and exec the strategy once."""
+    processes = processes or os.cpu_count() or 1
+    return Pool(processes, initializer=_init_worker,
+                initargs=(shared.handle(), strategy_path, vectorized))
+
+
+def map_runs(pool, tasks, cache=None, run_key=None):
+    """
+    Run (params, start_index, end_index, keep_curve) tasks on `pool`.
+    With a ResultCache, run_key(params, start_index, end_index) names each
+    task's entry: hits are served without touching the pool and misses are
+    stored (always with their curve) as they complete.
+    Returns (rows, curves) in task order.
+    """
+    rows = [None] * len(tasks)
+    curves = [None] * len(tasks)
+    pending = []
+    for i, (params, start_index, end_index, keep_curve) in enumerate(tasks):
+        if cache is not None:
+            hit = cache.get(run_key(params, start_index, end_index))
+            if hit is not None:
+                rows[i] = hit['row']
+                curves[i] = hit['curve'] if keep_curve else None
+                continue
+        pending.append((i, params, start_index, end_index, keep_curve or cache is not None))
+    if cache is not None:
+        logging.info(f"Result cache: {len(tasks) - len(pending)} of {len(tasks)} runs already done.")
+    for idx, row, curve in pool.imap_unordered(_run_one, pending):
+        params, start_index, end_index, keep_curve = tasks[idx]
+        if cache is not None:
+            cache.put(run_key(params, start_index, end_index), {'row': row, 'curve': curve})
+        rows[idx] = row
+        curves[idx] = curve if keep_curve else None
+    return rows, curves
+
+
+def cache_key_fn(cache, qqq_path, tqqq_path, strategy_path, vectorized):
+    """run_key for map_runs: one cache entry per (params, window) of this strategy/data."""
+    def run_key(params, start_index, end_index):
+        return cache.key(strategy_path, (qqq_path, tqqq_path), params=params,
+                         start=start_index, end=end_index, vectorized=vectorized)
+    return run_key
+
+
+def run_sweep(qqq_path, tqqq_path, strategy_path, grid, processes=None, vectorized=False, cache=None):
+    """
+    Run every parameter combination in `grid` across a process pool.
+    Data is loaded and aligned once in the parent and shared with the workers
+    through shared memory; each worker execs the strategy file once.
+    cache: optional ResultCache; combinations already run are not rerun.
+    Returns one metrics DataFrame (one row per combination, grid order).
+    """
+    combos = expand_grid(grid)
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    shared = SharedBars(df_qqq, df_tqqq)
+    logging.info(f"Sweeping {len(combos)} combinations...")
+    try:
+        with open_pool(shared, strategy_path, processes, vectorized) as pool:
+            run_key = cache_key_fn(cache, qqq_path, tqqq_path, strategy_path, vectorized) if cache else None
+            rows, _ = map_runs(pool, [(params, 0, None, False) for params in combos], cache, run_key)
+    finally:
+        shared.close()
+    return pd.DataFrame(rows)
@@ -0,0 +1,405 @@
+"""
+Sequential state-machine kernel for the V22 strategy (code/tqqq.py).
+
+V22 depends on its own path (ath_price, risk_off_days, T+1 pending_buy,
+Anti-V filter, NORMAL 20% rebalance), so it cannot be vectorized. This module
+runs the same transitions and the same MockContext fill model as one tight
+loop over precomputed NumPy arrays, with no mock API round-trips. If numba is
+installed the loop is compiled with njit; otherwise it runs as plain Python.
+
+Run this file directly to check parity against the exec'd strategy:
+    python code/backtest/src/v22_kernel.py
+"""
+import os
+import sys
+import logging
+import numpy as np
+import pandas as pd
+
+from indicators import rolling_ma, rolling_max
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+    njit = None
+
+# State codes used by the kernel (index into STATE_LABELS)
+STATE_LABELS = ["INIT", "NORMAL", "ZONE_BATTLE_ATTACK", "ZONE_BATTLE_DEFEND", "BEAR_CASH", "TOP_ESCAPE"]
+INIT, NORMAL, ZONE_BATTLE_ATTACK, ZONE_BATTLE_DEFEND, BEAR_CASH, TOP_ESCAPE = range(6)
+
+# Target weights (QQQ, TQQQ) per state, as in Strategy.handle_data
+TARGET_Q = np.array([0.0, 0.45, 0.0, 0.99, 0.0, 0.90])
+TARGET_T = np.array([0.0, 0.45, 0.99, 0.0, 0.0, 0.0])
+
+# Strategy.global_variables() defaults
+DEFAULT_PARAMS = {
+    'ma_long_window': 200,
+    'ma_short_window': 20,
+    'vol_window': 60,
+    'vol_factor': 2.0,
+    'high_zone': 0.95,
+    'min_risk_off_days': 2,
+}
+# Strategy._init_ath_price: highest QQQ high over this many bars before the first simulated bar
+ATH_LOOKBACK = 252
+# Strategy file the kernel reimplements
+STRATEGY_FILE = "tqqq.py"
+
+# Leg ids in the trade ledger
+LEG_QQQ = 0
+LEG_TQQQ = 1
+
+
+def _fill(leg, qty, is_buy, price, i, slippage, commission_rate, state, trades):
+    # MockContext.execute_order: fill at close +/- slippage, min 1 USD commission
+    # state: [cash, qty_q, qty_t, n_trades]
+    if price <= 0:
+        return
+    if is_buy:
+        exec_price = price * (1 + slippage)
+    else:
+        exec_price = price * (1 - slippage)
+    value = exec_price * qty
+    commission = max(1.0, value * commission_rate)
+    if is_buy:
+        cost = value + commission
+        if state[0] >= cost:
+            state[0] -= cost
+            state[1 + leg] += qty
+        else:
+            return
+    else:
+        if state[1 + leg] >= qty:
+            state[1 + leg] -= qty
+            state[0] += value - commission
+        else:
+            return
+    n = int(state[3])
+    trades[n, 0] = i
+    trades[n, 1] = leg
+    trades[n, 2] = 1.0 if is_buy else -1.0
+    trades[n, 3] = qty
+    trades[n, 4] = exec_price
+    state[3] = n + 1
+
+
+def _buy_only(tg_q, tg_t, p_q, p_t, i, slippage, commission_rate, state, trades):
+    # Strategy.execute_buy_only
+    val_q = state[1] * p_q
+    val_t = state[2] * p_t
+    equity = state[0] + val_q + val_t
+    if equity <= 0:
+        return
+    need_val_q = equity * tg_q - val_q
+    need_val_t = equity * tg_t - val_t
+    if need_val_q < 0.0:
+        need_val_q = 0.0
+    if need_val_t < 0.0:
+        need_val_t = 0.0
+    if need_val_q <= 500.0 and need_val_t <= 500.0:
+        return
+    if need_val_q > 500.0 and p_q > 0:
+        need_qty = int(need_val_q / p_q)
+        if need_qty > 0:
+            # max_qty_to_buy_on_cash keeps a 1% buffer
+            cash_qty = int(state[0] * 0.99 / p_q)
+            buy_qty = need_qty if need_qty < cash_qty else cash_qty
+            if buy_qty > 0:
+                _fill(LEG_QQQ, buy_qty, True, p_q, i, slippage, commission_rate, state, trades)
+    if need_val_t > 500.0 and p_t > 0:
+        need_qty = int(need_val_t / p_t)
+        if need_qty > 0:
+            cash_qty = int(state[0] * 0.99 / p_t)
+            buy_qty = need_qty if need_qty < cash_qty else cash_qty
+            if buy_qty > 0:
+                _fill(LEG_TQQQ, buy_qty, True, p_t, i, slippage, commission_rate, state, trades)
+
+
+def _v22_loop(close_q, open_q, vol_q, close_t, ma200, ma20, vol_ma,
+              vol_window, vol_factor, high_zone, min_risk_off_days, ath_init,
+              initial_capital, commission_rate, slippage,
+              target_q, target_t, states, cash_out, qty_q_out, qty_t_out, total_out, trades, start):
+    n = len(close_q)
+    state = np.zeros(4)
+    state[0] = initial_capital
+    label = INIT
+    ath = ath_init
+    risk_off_days = 0
+    pending_buy = False
+    pending_q = 0.0
+    pending_t = 0.0
+    # len(vol_history): bars with valid prices since the run started (T+1 bars included)
+    n_hist = 0
+
+    for i in range(start, n):
+        p_q = close_q[i]
+        p_t = close_t[i]
+        if p_q > 0 and p_t > 0:
+            n_hist += 1
+            if label == BEAR_CASH or label == ZONE_BATTLE_DEFEND or label == TOP_ESCAPE:
+                risk_off_days += 1
+            else:
+                risk_off_days = 0
+
+            if pending_buy:
+                _buy_only(pending_q, pending_t, p_q, p_t, i, slippage, commission_rate, state, trades)
+                pending_buy = False
+                pending_q = 0.0
+                pending_t = 0.0
+            else:
+                if p_q > ath:
+                    ath = p_q
+                drawdown = 0.0
+                if ath > 0:
+                    drawdown = (p_q / ath) - 1.0
+                m200 = ma200[i]
+                m20 = ma20[i]
+                prev_m20 = ma20[i - 1] if i > 0 else np.nan
+
+                is_top = False
+                # vol_history keeps at most the last 100 bars
+                if ath > 0 and p_q >= ath * high_zone and n_hist >= vol_window and vol_window <= 100:
+                    if vol_q[i] > vol_ma[i] * vol_factor and p_q < open_q[i]:
+                        is_top = True
+
+                if is_top:
+                    raw = TOP_ESCAPE
+                elif not np.isnan(m200) and p_q < m200:
+                    if not np.isnan(m20) and p_q > m20:
+                        raw = ZONE_BATTLE_ATTACK if drawdown <= -0.10 else BEAR_CASH
+                    else:
+                        raw = BEAR_CASH
+                else:
+                    raw = ZONE_BATTLE_ATTACK if drawdown < -0.10 else NORMAL
+
+                # Anti-V filter: risk-off -> risk-on needs cool-down and rising MA20
+                next_state = raw
+                if label == BEAR_CASH or label == ZONE_BATTLE_DEFEND or label == TOP_ESCAPE:
+                    if raw == ZONE_BATTLE_ATTACK or raw == NORMAL:
+                        blocked = risk_off_days < min_risk_off_days
+                        if np.isnan(m20) or np.isnan(prev_m20) or m20 <= prev_m20:
+                            blocked = True
+                        if blocked:
+                            next_state = label
+
+                tg_q = target_q[next_state]
+                tg_t = target_t[next_state]
+                need_action = False
+                if next_state != label:
+                    label = next_state
+                    need_action = True
+                elif next_state == NORMAL:
+                    val_q = state[1] * p_q
+                    val_t = state[2] * p_t
+                    total = val_q + val_t
+                    if total > 0:
+                        if abs(val_q - val_t) / (total + 0.000001) > 0.20:
+                            need_action = True
+
+                if need_action:
+                    val_q = state[1] * p_q
+                    val_t = state[2] * p_t
+                    equity = state[0] + val_q + val_t
+                    if equity > 0:
+                        diff_q = equity * tg_q - val_q
+                        diff_t = equity * tg_t - val_t
+                        sold = False
+                        if diff_q < -500.0 and p_q > 0:
+                            qty = int(abs(diff_q) / p_q)
+                            if qty > state[1]:
+                                qty = int(state[1])
+                            if qty > 0:
+                                _fill(LEG_QQQ, qty, False, p_q, i, slippage, commission_rate, state, trades)
+                                sold = True
+                        if diff_t < -500.0 and p_t > 0:
+                            qty = int(abs(diff_t) / p_t)
+                            if qty > state[2]:
+                                qty = int(state[2])
+                            if qty > 0:
+                                _fill(LEG_TQQQ, qty, False, p_t, i, slippage, commission_rate, state, trades)
+                                sold = True
+                        if sold:
+                            # T+1: buy tomorrow once cash has settled
+                            pending_buy = True
+                            pending_q = tg_q
+                            pending_t = tg_t
+                        else:
+                            _buy_only(tg_q, tg_t, p_q, p_t, i, slippage, commission_rate, state, trades)
+
+        states[i] = label
+        val_q = state[1] * p_q
+        val_t = state[2] * p_t
+        cash_out[i] = state[0]
+        qty_q_out[i] = state[1]
+        qty_t_out[i] = state[2]
+        total_out[i] = state[0] + val_q + val_t
+    return int(state[3])
+
+
+if njit is not None:
+    _fill = njit(cache=True)(_fill)
+    _buy_only = njit(cache=True)(_buy_only)
+    _v22_loop = njit(cache=True)(_v22_loop)
+
+
+def reverse_window_mean(values, window):
+    """
+    Mean of values[..., i-window+1..i] along the last axis, summed newest-first
+    like handle_data's vol_ma loop (so the float result matches it exactly).
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if window <= 0 or values.shape[-1] < window:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+    acc = windows[..., window - 1].copy()
+    for k in range(window - 2, -1, -1):
+        acc += windows[..., k]
+    out[..., window - 1:] = acc / float(window)
+    return out
+
+
+def prepare_arrays(df_qqq, df_tqqq, params=None):
+    """Precompute the per-bar inputs the kernel needs (shareable across variants)."""
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        p.update(params)
+    close_q = np.ascontiguousarray(df_qqq['close'].to_numpy(dtype=np.float64))
+    vol_q = np.ascontiguousarray(df_qqq['volume'].to_numpy(dtype=np.float64))
+    return {
+        'close_q': close_q,
+        'open_q': np.ascontiguousarray(df_qqq['open'].to_numpy(dtype=np.float64)),
+        'vol_q': vol_q,
+        'close_t': np.ascontiguousarray(df_tqqq['close'].to_numpy(dtype=np.float64)),
+        'ma200': rolling_ma(close_q, p['ma_long_window']),
+        'ma20': rolling_ma(close_q, p['ma_short_window']),
+        'vol_ma': reverse_window_mean(vol_q, p['vol_window']),
+        'ath_high': rolling_max(df_qqq['high'].to_numpy(dtype=np.float64), ATH_LOOKBACK),
+    }
+
+
+def run_v22_kernel(df_qqq, df_tqqq, params=None, arrays=None, initial_capital=100000.0,
+                   commission_rate=0.0005, slippage=0.0005, ath_init=None, start_index=0):
+    """
+    Run V22 over aligned QQQ/TQQQ frames (as returned by load_and_clean_data).
+    params overrides DEFAULT_PARAMS; arrays may be passed in from prepare_arrays()
+    to reuse indicators across variants with the same windows (and across
+    start offsets).
+    start_index: first bar to simulate, as engine.run_strategy's; indicators
+    still see the history before it.
+    ath_init: starting ATH. Default: what _init_ath_price sees in the mock
+    engine, the highest high of the 252 bars before start_index (0.0 when
+    starting at the first bar).
+
+    Returns (portfolio_history DataFrame, trades DataFrame, state label array)
+    for the bars from start_index on.
+    """
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        p.update(params)
+    if arrays is None:
+        arrays = prepare_arrays(df_qqq, df_tqqq, p)
+
+    n = len(arrays['close_q'])
+    if ath_init is None:
+        ath_init = arrays['ath_high'][start_index - 1] if start_index > 0 else 0.0
+    states = np.zeros(n, dtype=np.int64)
+    cash = np.zeros(n)
+    qty_q = np.zeros(n)
+    qty_t = np.zeros(n)
+    total = np.zeros(n)
+    # At most two fills per bar (one per leg)
+    trades = np.zeros((2 * n, 5))
+
+    n_trades = _v22_loop(
+        arrays['close_q'], arrays['open_q'], arrays['vol_q'], arrays['close_t'],
+        arrays['ma200'], arrays['ma20'], arrays['vol_ma'],
+        int(p['vol_window']), float(p['vol_factor']), float(p['high_zone']),
+        int(p['min_risk_off_days']), float(ath_init),
+        float(initial_capital), float(commission_rate), float(slippage),
+        TARGET_Q, TARGET_T, states, cash, qty_q, qty_t, total, trades, int(start_index)
+    )
+    s = start_index
+    states, cash, qty_q, qty_t, total = states[s:], cash[s:], qty_q[s:], qty_t[s:], total[s:]
+
+    qty_q = qty_q.astype(np.int64)
+    qty_t = qty_t.astype(np.int64)
+    val_qqq = qty_q * arrays['close_q'][s:]
+    val_tqqq = qty_t * arrays['close_t'][s:]
+    df_results = pd.DataFrame({
+        'total_value': total,
+        'cash': cash,
+        'qqq_val': val_qqq,
+        'tqqq_val': val_tqqq,
+        'qqq_qty': qty_q,
+        'tqqq_qty': qty_t,
+    }, index=df_qqq.index[s:])
+    df_results.index.name = 'date'
+
+    t = trades[:n_trades]
+    bar_idx = t[:, 0].astype(np.int64)
+    df_trades = pd.DataFrame({
+        'date': df_qqq.index[bar_idx],
+        'symbol': np.where(t[:, 1] == LEG_QQQ, "US.QQQ", "US.TQQQ"),
+        'side': np.where(t[:, 2] > 0, "BUY", "SELL"),
+        'qty': t[:, 3].astype(np.int64),
+        'price': t[:, 4],
+    })
+    labels = np.array(STATE_LABELS, dtype=object)[states]
+    return df_results, df_trades, labels
+
+
+def synthetic_volume(n, seed=0):
+    """Lognormal daily volumes (the bundled QQQ volume is all zero, so TOP_ESCAPE never fires on it)."""
+    return np.random.default_rng(seed).lognormal(16.0, 0.6, n)
+
+
+def check_parity(qqq_path, tqqq_path, strategy_path, start_date=None, volume_seed=None):
+    """
+    Run the exec'd V22 strategy through the engine and the kernel on the
+    same data (from start_date on, if given); assert identical state labels,
+    trades and equity curve.
+    volume_seed: if given, replace the QQQ volume with synthetic_volume(seed).
+    Returns the number of TOP_ESCAPE bars.
+    """
+    from engine import load_strategy_class, run_strategy
+    from data_loader import load_and_clean_data
+
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    if volume_seed is not None:
+        df_qqq['volume'] = synthetic_volume(len(df_qqq), volume_seed)
+    start_index = 0 if start_date is None else int(df_qqq.index.searchsorted(pd.Timestamp(start_date)))
+    df_ref, ctx = run_strategy(df_qqq, df_tqqq, load_strategy_class(strategy_path), start_index=start_index,
+                               return_context=True)
+    ref_labels = np.array(ctx.signals_history, dtype=object)
+    ref_trades = ctx.orders_frame()[['date', 'symbol', 'side', 'qty', 'price']]
+
+    df_k, trades_k, labels_k = run_v22_kernel(
+        df_qqq, df_tqqq, initial_capital=ctx.initial_capital,
+        commission_rate=ctx.commission_rate, slippage=ctx.slippage, start_index=start_index
+    )
+
+    assert len(ref_labels) == len(labels_k), "bar count differs"
+    mismatch = np.nonzero(ref_labels != labels_k)[0]
+    assert len(mismatch) == 0, f"state label differs first at bar {mismatch[:1]}"
+    pd.testing.assert_frame_equal(ref_trades, trades_k, check_exact=True, check_dtype=False)
+    pd.testing.assert_frame_equal(df_ref[df_k.columns], df_k, check_exact=True, check_dtype=False)
+    return int((labels_k == "TOP_ESCAPE").sum())
+
+
+if __name__ == "__main__":
+    import engine  # configures logging; quieten the exec'd strategy's per-bar prints
+    logging.getLogger().setLevel(logging.WARNING)
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    qqq_path = os.path.join(base_dir, "input", "QQQ.csv")
+    tqqq_path = os.path.join(base_dir, "input", "TQQQ.csv")
+    strategy_path = os.path.join(base_dir, "code", "tqqq.py")
+    if len(sys.argv) == 4:
+        qqq_path, tqqq_path, strategy_path = sys.argv[1:4]
+    for start_date in (None, "2005-03-01", "2020-01-02"):
+        check_parity(qqq_path, tqqq_path, strategy_path, start_date)
+    print(f"V22 kernel parity OK ({'numba' if njit is not None else 'python'}), from the first bar and two start offsets")
+    for start_date in (None, "2005-03-01"):
+        n_top = check_parity(qqq_path, tqqq_path, strategy_path, start_date, volume_seed=0)
+        assert n_top > 0, "synthetic volume never triggered TOP_ESCAPE"
+        print(f"V22 kernel parity OK on synthetic volume from {start_date or 'the first bar'}: {n_top} TOP_ESCAPE bars")
@@ -0,0 +1,108 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_and_clean_data
+from sweep import SharedBars, expand_grid, open_pool, map_runs, cache_key_fn
+
+
+def build_folds(dates, is_years=5, oos_years=1, first_start=None):
+    """
+    Rolling in-sample/out-of-sample windows as bar index ranges.
+    Each fold: IS = [is_start, is_end), OOS = [is_end, oos_end); the next fold
+    starts one OOS length later. The last OOS window is clipped to the data.
+    """
+    start = pd.Timestamp(first_start) if first_start is not None else dates[0]
+    folds = []
+    while True:
+        is_end_date = start + pd.DateOffset(years=is_years)
+        oos_end_date = is_end_date + pd.DateOffset(years=oos_years)
+        is_start = int(dates.searchsorted(start))
+        is_end = int(dates.searchsorted(is_end_date))
+        oos_end = int(dates.searchsorted(oos_end_date))
+        if is_end >= len(dates) or oos_end <= is_end:
+            break
+        folds.append({'is_start': is_start, 'is_end': is_end, 'oos_start': is_end, 'oos_end': oos_end})
+        start = start + pd.DateOffset(years=oos_years)
+    return folds
+
+
+def stitch_curves(curves, initial_capital=100000.0):
+    """Chain OOS equity curves (each starting from initial_capital) into one compounded curve."""
+    pieces = []
+    scale = 1.0
+    for curve in curves:
+        pieces.append(curve * scale)
+        scale = scale * curve.iloc[-1] / initial_capital
+    return pd.concat(pieces)
+
+
+def walk_forward(qqq_path, tqqq_path, strategy_path, grid, is_years=5, oos_years=1,
+                 objective="Sharpe Ratio", first_start=None, processes=None, vectorized=False,
+                 initial_capital=100000.0, cache=None):
+    """
+    Walk-forward optimization over rolling windows.
+    Every (fold, combination) in-sample run goes to one process pool, so folds
+    optimize in parallel; the best combination of each fold by `objective` is
+    then run on its out-of-sample window. Workers share the aligned data via
+    shared memory and compute full-series indicators once, so windows still
+    see the history before their start (MA200 etc. are warm from bar one).
+    cache: optional ResultCache shared with run_sweep; finished runs are reused.
+
+    Returns (folds DataFrame, stitched OOS equity DataFrame).
+    """
+    df_qqq, df_tqqq = load_and_clean_data(qqq_path, tqqq_path)
+    dates = df_qqq.index
+    folds = build_folds(dates, is_years, oos_years, first_start)
+    if not folds:
+        raise ValueError("Not enough history for a single walk-forward fold.")
+    combos = expand_grid(grid)
+    logging.info(f"Walk-forward: {len(folds)} folds x {len(combos)} combinations...")
+
+    shared = SharedBars(df_qqq, df_tqqq)
+    try:
+        with open_pool(shared, strategy_path, processes, vectorized) as pool:
+            run_key = cache_key_fn(cache, qqq_path, tqqq_path, strategy_path, vectorized) if cache else None
+            # 1. In-sample: every fold x combination at once
+            is_tasks = []
+            for fold in folds:
+                for params in combos:
+                    is_tasks.append((params, fold['is_start'], fold['is_end'], False))
+            is_rows, _ = map_runs(pool, is_tasks, cache, run_key)
+
+            best = []
+            for k in range(len(folds)):
+                rows = is_rows[k * len(combos):(k + 1) * len(combos)]
+                scores = [row[objective] for row in rows]
+                j = int(np.nanargmax(scores))
+                best.append((combos[j], scores[j]))
+
+            # 2. Out-of-sample: winner of each fold on the following window
+            oos_tasks = [(params, fold['oos_start'], fold['oos_end'], True)
+                         for fold, (params, _) in zip(folds, best)]
+            oos_rows, oos_curves = map_runs(pool, oos_tasks, cache, run_key)
+    finally:
+        shared.close()
+
+    records = []
+    for k, fold in enumerate(folds):
+        params, is_score = best[k]
+        record = {
+            'fold': k,
+            'is_start': dates[fold['is_start']].date(),
+            'is_end': dates[fold['is_end'] - 1].date(),
+            'oos_start': dates[fold['oos_start']].date(),
+            'oos_end': dates[fold['oos_end'] - 1].date(),
+        }
+        record.update(params)
+        record[f"IS {objective}"] = is_score
+        for name in ("Total Return", "CAGR", "Max Drawdown", "Sharpe Ratio"):
+            record[f"OOS {name}"] = oos_rows[k][name]
+        records.append(record)
+
+    stitched = stitch_curves(oos_curves, initial_capital)
+    fold_ids = np.concatenate([np.full(len(c), k) for k, c in enumerate(oos_curves)])
+    df_equity = pd.DataFrame({'total_value': stitched.to_numpy(), 'fold': fold_ids}, index=stitched.index)
+    df_equity.index.name = 'date'
+    return pd.DataFrame(records), df_equity
@@ -5,9 +5,16 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import Optional
+import argparse
 import json
+import logging
+import sys
 import uuid
 
+# Event recorder shared with the backtest engine
+sys.path.append(str(Path(__file__).resolve().parent / "backtest" / "src"))
+from events import EventRecorder, register_event
+
 # ==========================================
 # 1. Configuration & Constants
 # ==========================================
@@ -54,6 +61,22 @@ OUTPUT_TRADES_CSV = str(BASE_DIR / "output" / "backtest_trades.csv")
 OUTPUT_DAILY_CSV = str(BASE_DIR / "output" / "backtest_daily.csv")
 OUTPUT_TRADES_HTML = str(BASE_DIR / "output" / "backtest_trades.html")
 OUTPUT_REPORT_HTML = str(BASE_DIR / "output" / "backtest_report.html")
+VERBOSE = True # Print each event as it is logged
+
+# Portfolio.log template -> event code, registered on first use
+EVENT_CODES = {}
+
+
+def event_code(template):
+    code = EVENT_CODES.get(template)
+    if code is None:
+        code = EVENT_CODES[template] = register_event('leaps', logging.INFO, template)
+    return code
+
+
+def event_dates(bars):
+    # Portfolio events are keyed by date ordinal
+    return [datetime.fromordinal(int(b)).strftime('%Y-%m-%d') for b in bars]
 
 
 @dataclass
@@ -459,12 +482,14 @@ class OptionPosition:
         return self.current_price * self.contracts * self.contract_size
 
 class Portfolio:
-    def __init__(self, capital):
+    def __init__(self, capital, verbose=VERBOSE, events_path=None):
         self.cash = capital
+        self.verbose = verbose
+        # Kept only when they are to be written to events_path
+        self.events = EventRecorder(level=logging.INFO if events_path else logging.WARNING, dump_path=events_path)
         self.positions = [] # List of OptionPosition
         self.initial_capital = capital
         self.total_cost_basis = 0.0 # To track "rolling cost to negative"
-        self.event_log = []
         self.trades = []
         self.daily = []
         self.last_bear_add_date = None
@@ -480,9 +505,11 @@ class Portfolio:
         if self.total_value == 0: return 0
         return self.cash / self.total_value
 
-    def log(self, date, message):
-        self.event_log.append({'date': date, 'message': message, 'value': self.total_value, 'cash': self.cash})
-        print(f"[{date.strftime('%Y-%m-%d')}] {message}")
+    def log(self, date, message, *args):
+        # message is a %-style template; it is only formatted when printed or dumped
+        self.events.record(date.toordinal(), event_code(message), args)
+        if self.verbose:
+            print(f"[{date.strftime('%Y-%m-%d')}] {message % args}")
 
     def record_trade(self, trade: TradeRecord):
         self.trades.append(trade)
@@ -509,7 +536,7 @@ class Portfolio:
             if self.cash >= cost_per_contract:
                 num_contracts = 1
             else:
-                self.log(date, f"Not enough cash to buy 1 contract. Cost: {cost_per_contract:.2f}, Cash: {self.cash:.2f}")
+                self.log(date, "Not enough cash to buy 1 contract. Cost: %.2f, Cash: %.2f", cost_per_contract, self.cash)
                 return
 
         total_cost = num_contracts * cost_per_contract
@@ -523,7 +550,8 @@ class Portfolio:
         
         self.positions.append(pos)
         action_type = "ADD" if is_add else "OPEN"
-        self.log(date, f"{action_type}: Bought {num_contracts}x LEAPS (Delta {target_delta:.2f}, DTE {target_dte_days}, K={K:.2f}) @ {price:.2f}. Cost: {total_cost:.2f}. Cash: {self.cash:.2f}")
+        self.log(date, "%s: Bought %sx LEAPS (Delta %.2f, DTE %s, K=%.2f) @ %.2f. Cost: %.2f. Cash: %.2f",
+                 action_type, num_contracts, target_delta, target_dte_days, K, price, total_cost, self.cash)
         dte = (pos.expiry_date - date).days
         self.record_trade(
             TradeRecord(
@@ -554,7 +582,8 @@ class Portfolio:
         self.cash += proceeds
         self.total_cost_basis -= proceeds
         self.positions.remove(pos)
-        self.log(date, f"{action}: Sold {pos.contracts}x LEAPS (DTE {dte}, K={pos.K:.2f}) @ {option_price:.2f}. Proceeds: {proceeds:.2f}. Cash: {self.cash:.2f}")
+        self.log(date, "%s: Sold %sx LEAPS (DTE %s, K=%.2f) @ %.2f. Proceeds: %.2f. Cash: %.2f",
+                 action, pos.contracts, dte, pos.K, option_price, proceeds, self.cash)
         self.record_trade(
             TradeRecord(
                 date=date.strftime("%Y-%m-%d"),
@@ -579,7 +608,7 @@ class Portfolio:
 # ==========================================
 # 4. Main Backtest Logic
 # ==========================================
-def run_backtest():
+def run_backtest(verbose=VERBOSE, events_path=None):
     # Load Data
     print("Loading data...")
     df = pd.read_csv(CSV_PATH)
@@ -601,7 +630,7 @@ def run_backtest():
         print("No data found for the specified date range.")
         return
 
-    portfolio = Portfolio(INITIAL_CAPITAL)
+    portfolio = Portfolio(INITIAL_CAPITAL, verbose=verbose, events_path=events_path)
     entered = False
     entry_date_for_benchmark = None
     
@@ -635,7 +664,7 @@ def run_backtest():
                 # Expired (should typically roll before this)
                 portfolio.cash += pos.market_value
                 portfolio.total_cost_basis -= pos.market_value
-                portfolio.log(current_date, f"EXPIRED: Sold {pos.contracts}x LEAPS at Expiry. Proceeds: {pos.market_value:.2f}")
+                portfolio.log(current_date, "EXPIRED: Sold %sx LEAPS at Expiry. Proceeds: %.2f", pos.contracts, pos.market_value)
                 positions_to_remove.append(pos)
         
         for pos in positions_to_remove:
@@ -647,7 +676,7 @@ def run_backtest():
         if not entered:
             # Find a day QQQ drops 1%
             if daily_return <= ENTRY_DROP_THRESHOLD:
-                portfolio.log(current_date, f"Entry Signal: QQQ dropped {daily_return*100:.2f}%. Initializing Portfolio.")
+                portfolio.log(current_date, "Entry Signal: QQQ dropped %.2f%%. Initializing Portfolio.", daily_return*100)
                 
                 # 60% LEAPS, 40% Cash
                 allocation = INITIAL_CAPITAL * INITIAL_ALLOCATION_LEAPS
@@ -722,7 +751,8 @@ def run_backtest():
                     new_pos = OptionPosition(current_date, S, K_new, ROLL_UP_TARGET_DTE_MIN, r, sigma)
                     new_pos.contracts = pos.contracts
                     portfolio.positions.append(new_pos)
-                    portfolio.log(current_date, f"ROLL UP EXEC: Bought {new_pos.contracts}x (Delta {ROLL_UP_TARGET_DELTA}, K={K_new:.2f}). Generated Credit: {proceeds - cost_new:.2f}")
+                    portfolio.log(current_date, "ROLL UP EXEC: Bought %sx (Delta %s, K=%.2f). Generated Credit: %.2f",
+                                  new_pos.contracts, ROLL_UP_TARGET_DELTA, K_new, proceeds - cost_new)
                     portfolio.record_trade(
                         TradeRecord(
                             date=current_date.strftime("%Y-%m-%d"),
@@ -777,7 +807,8 @@ def run_backtest():
                     new_pos = OptionPosition(current_date, S, K_new, ROLL_OUT_TARGET_DTE_MIN, r, sigma)
                     new_pos.contracts = pos.contracts
                     portfolio.positions.append(new_pos)
-                    portfolio.log(current_date, f"ROLL OUT EXEC: Bought {new_pos.contracts}x (Delta {ROLL_OUT_TARGET_DELTA}, K={K_new:.2f}). Cost Debit: {cost_new - proceeds:.2f}")
+                    portfolio.log(current_date, "ROLL OUT EXEC: Bought %sx (Delta %s, K=%.2f). Cost Debit: %.2f",
+                                  new_pos.contracts, ROLL_OUT_TARGET_DELTA, K_new, cost_new - proceeds)
                     portfolio.record_trade(
                         TradeRecord(
                             date=current_date.strftime("%Y-%m-%d"),
@@ -838,7 +869,8 @@ def run_backtest():
                         amount_to_buy = portfolio.cash
                     
                     if amount_to_buy > 0:
-                         portfolio.log(current_date, f"BEAR ADD ({mode}): Cash Ratio {portfolio.cash_ratio:.2%}. Adding {amount_to_buy:.2f} worth of LEAPS.")
+                         portfolio.log(current_date, "BEAR ADD (%s): Cash Ratio %.2f%%. Adding %.2f worth of LEAPS.",
+                                       mode, portfolio.cash_ratio * 100, amount_to_buy)
                          portfolio.buy_option(current_date, S, r, sigma, BEAR_ADD_TARGET_DELTA, 700, amount_to_buy, is_add=True)
                          portfolio.last_bear_add_date = current_date
 
@@ -902,6 +934,7 @@ def run_backtest():
     trades_df.to_csv(OUTPUT_TRADES_CSV, index=False)
     daily_df.to_csv(OUTPUT_DAILY_CSV, index=False)
     trades_df.to_html(OUTPUT_TRADES_HTML, index=False)
+    portfolio.events.finish(event_dates)
 
     if not daily_df.empty:
         # Calculate Annual Returns
@@ -1100,6 +1133,12 @@ def run_backtest():
     print(f"  Trades HTML: {OUTPUT_TRADES_HTML}")
     print(f"  Daily CSV: {OUTPUT_DAILY_CSV}")
     print(f"  Report HTML: {OUTPUT_REPORT_HTML}")
+    if events_path:
+        print(f"  Events Log: {events_path}")
 
 if __name__ == "__main__":
-    run_backtest()
+    parser = argparse.ArgumentParser(description="QQQ LEAPS backtest")
+    parser.add_argument("--events", default=None, help="Write the portfolio events to this file at the end")
+    parser.add_argument("--quiet", action="store_true", help="Do not print each event as it happens")
+    args = parser.parse_args()
+    run_backtest(verbose=not args.quiet, events_path=args.events)
@@ -1,5 +1,23 @@
 # V22.0 完整修复版（含ATH初始化 + 内置MA函数 + 完整消息提醒）
 
+try:
+    highest
+except NameError:
+    # Live API has no highest() (the backtest mock injects one): the max of
+    # bar_high over the window (DataType.HIGH only), skipping missing bars.
+    def highest(symbol, period, bar_type, data_type=DataType.HIGH, select=1, session_type=THType.RTH):
+        max_price = None
+        for i in range(select, select + period):
+            h = bar_high(
+                symbol=symbol,
+                bar_type=bar_type,
+                select=i,
+                session_type=session_type
+            )
+            if h is not None and (max_price is None or h > max_price):
+                max_price = h
+        return max_price
+
 class Strategy(StrategyBase):
     def initialize(self):
         declare_strategy_type(AlgoStrategyType.SECURITY)
@@ -39,16 +57,16 @@ class Strategy(StrategyBase):
         self.min_risk_off_days = 2
 
     def _init_ath_price(self):
-        max_price = 0.0
-        for i in range(1, 253):
-            h = bar_high(
-                symbol=self.contract_QQQ,
-                bar_type=BarType.D1,
-                select=i,
-                session_type=THType.RTH
-            )
-            if h is not None and h > max_price:
-                max_price = h
+        max_price = highest(
+            symbol=self.contract_QQQ,
+            period=252,
+            bar_type=BarType.D1,
+            data_type=DataType.HIGH,
+            select=1,
+            session_type=THType.RTH
+        )
+        if max_price is None:
+            max_price = 0.0
         self.ath_price = max_price
         print("[INIT] ATH初始化完成: " + str(max_price))
 
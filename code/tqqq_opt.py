@@ -1,6 +1,44 @@
-
 from enum import Enum, auto
 
+try:
+    rebalance_to_weights
+except NameError:
+    # Live API has no batch rebalance (the backtest mock injects one). Same
+    # legs as the mock: int(NAV * weight / close) shares each, sells first,
+    # then buys. Buys are capped by the broker's own buying power
+    # (max_qty_to_buy_on_cash, as tqqq.py's execute_buy_only) rather than by
+    # the mock's fee model, so whether unsettled sell proceeds can be spent is
+    # up to the broker; the mock with fill_timing='close' always spends them.
+    # Returns the placed order ids.
+    def rebalance_to_weights(weights, min_trade=0.0):
+        nav = net_asset(Currency.USD)
+        legs = []
+        for contract, weight in weights.items():
+            price = bar_close(contract, BarType.D1, 1, THType.RTH)
+            if not price or price <= 0:
+                continue
+            diff = int(nav * weight / price) - position_holding_qty(contract)
+            if diff != 0 and abs(diff) * price >= min_trade:
+                legs.append((contract, diff, price))
+        order_ids = []
+        for contract, diff, price in legs:
+            if diff < 0:
+                qty = min(-diff, available_qty(contract))
+                if qty > 0:
+                    order_ids.append(place_market(contract, qty, OrderSide.SELL, TimeInForce.DAY))
+        for contract, diff, price in legs:
+            if diff > 0:
+                cash_qty = max_qty_to_buy_on_cash(
+                    symbol=contract,
+                    order_type=OrdType.MKT,
+                    price=0,
+                    order_trade_session_type=TSType.RTH
+                )
+                qty = min(diff, int(cash_qty or 0))
+                if qty > 0:
+                    order_ids.append(place_market(contract, qty, OrderSide.BUY, TimeInForce.DAY))
+        return [oid for oid in order_ids if oid is not None]
+
 class Strategy(StrategyBase):
     def initialize(self):
         declare_strategy_type(AlgoStrategyType.SECURITY)
@@ -26,6 +64,35 @@ class Strategy(StrategyBase):
         
         self.days_since_rebal = 0
         self.rebal_interval = 1 # Daily rebalance (or check daily)
+        self.min_trade = 0.0  # Skip legs whose trade is worth less (USD)
+
+    def target_weights(self, data):
+        # Backtest fast path: same regime/vol/RSI rules as handle_data, evaluated
+        # for every bar at once. Returns {contract: weight array} in handle_data's
+        # leg order; NaN = handle_data would return early.
+        price_qqq = data.close(self.contract_QQQ)
+        ma200 = data.ma(self.contract_QQQ, self.ma_long)
+        ma20 = data.ma(self.contract_QQQ, self.ma_short)
+        current_rsi = data.rsi(self.contract_QQQ, self.rsi_period)
+        current_vol = data.vol(self.contract_QQQ, self.vol_period)
+
+        # Bull: 2x base scaled by vol target (clamped 0.5~1.5) and RSI filter
+        safe_vol = np.where(current_vol > 0, current_vol, 1.0)
+        vol_scalar = np.where(current_vol > 0, np.clip(self.target_vol / safe_vol, 0.5, 1.5), 1.0)
+        rsi_scalar = np.where(current_rsi > 75, 0.7, np.where(current_rsi < 30, 1.2, 1.0))
+        bull_leverage = np.clip(2.0 * vol_scalar * rsi_scalar, 0.0, 3.0)
+
+        # Bear: rally above MA20 -> 1x QQQ, otherwise cash
+        bear_leverage = np.where(price_qqq > ma20, 1.0, 0.0)
+        target_leverage = np.where(price_qqq < ma200, bear_leverage, bull_leverage)
+
+        w_t = np.where(target_leverage >= 1.0, np.minimum((target_leverage - 1) / 2, 1.0), 0.0)
+        w_q = np.where(target_leverage >= 1.0, 1.0 - w_t, target_leverage)
+
+        skip = np.isnan(ma200) | np.isnan(ma20)
+        w_t = np.where(skip, np.nan, w_t)
+        w_q = np.where(skip, np.nan, w_q)
+        return {self.contract_TQQQ: w_t, self.contract_QQQ: w_q}
 
     def handle_data(self):
         # 1. Get Data
@@ -105,39 +172,8 @@ class Strategy(StrategyBase):
             w_q = target_leverage
             w_c = 1.0 - w_q
             
-        # 5. Execution (Simple Rebalance)
-        # Check current holdings to avoid churning
-        # For simulation, we just set target weights effectively
-        # The engine mock uses 'place_market' to adjust qty.
-        # We need to calculate target qty.
-        
-        # Get Net Asset Value
-        nav = net_asset(Currency.USD)
-        
-        target_val_t = nav * w_t
-        target_val_q = nav * w_q
-        
-        # Calculate Qty
-        price_tqqq = bar_close(self.contract_TQQQ, BarType.D1, 1, THType.RTH)
-        if not price_tqqq: price_tqqq = price_qqq # Should not happen if data aligned
-        
-        current_qty_t = position_holding_qty(self.contract_TQQQ)
-        current_qty_q = position_holding_qty(self.contract_QQQ)
-        
-        target_qty_t = int(target_val_t / price_tqqq) if price_tqqq > 0 else 0
-        target_qty_q = int(target_val_q / price_qqq) if price_qqq > 0 else 0
-        
-        # Execute TQQQ
-        diff_t = target_qty_t - current_qty_t
-        if diff_t != 0:
-            side = OrderSide.BUY if diff_t > 0 else OrderSide.SELL
-            place_market(self.contract_TQQQ, abs(diff_t), side, TimeInForce.DAY)
-            
-        # Execute QQQ
-        diff_q = target_qty_q - current_qty_q
-        if diff_q != 0:
-            side = OrderSide.BUY if diff_q > 0 else OrderSide.SELL
-            place_market(self.contract_QQQ, abs(diff_q), side, TimeInForce.DAY)
+        # 5. Execution: both legs sized from one NAV snapshot, sells before buys
+        rebalance_to_weights({self.contract_TQQQ: w_t, self.contract_QQQ: w_q}, min_trade=self.min_trade)
             
         # Logging (Optional, avoid spam)
         # print(f"Date: {ctx.current_date} | Mode: {mode} | Lev: {target_leverage:.2f} | Vol: {current_vol:.1%} | RSI: {current_rsi:.1f}")